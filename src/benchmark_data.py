@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Seeded synthetic citation networks for the benchmarks.
+
+A SyntheticNetwork has `num_publications` CSIndex publications (node ids
+0..num_publications-1, each with a sub-area and a year) and external works (the
+remaining node ids). Every edge touches at least one publication, as in the
+OpenCitations network the pipeline collects, and cited works are drawn with a skewed
+distribution so a few works collect most citations.
+
+From it the benchmarks get:
+
+    - CSIndex-shaped area CSVs (<area>-out-papers.csv, no header, year in column 0 and
+      DOI in column 5, with prefixed, upper-case and "null" DOIs mixed in)
+    - OpenCitations /references and /citations JSON responses for any DOI
+    - OpenAlex /works records
+    - an edge list CSV shaped like open_citations_edge_list.csv
+
+The network is saved as a single .npz (edge arrays plus publication tables); responses
+are rendered on demand from it, so 5e7-edge networks do not need 5e7 JSON files.
+
+Usage:
+    python benchmark_data.py OUTPUT_DIR [--edges 100000] [--publications N] [--seed 0]
+        [--edge-list]
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from csindex_areas import AREAS
+
+NETWORK_FILE = "network.npz"
+CSINDEX_DIR = "csindex"
+EDGE_LIST_FILE = "open_citations_edge_list.csv"
+
+FIRST_YEAR = 2000
+LAST_YEAR = 2024
+
+
+def doi(node: int) -> str:
+    """Synthetic DOI of a node id (the registrant varies so DOIs do not share one prefix)."""
+    return f"10.{5000 + node % 97}/synth.{node}"
+
+
+def node_id(value: str):
+    """Node id of a synthetic DOI, or None if it is not one."""
+    _, _, suffix = value.rpartition("/synth.")
+    return int(suffix) if suffix.isdigit() else None
+
+
+def _csr(rows: np.ndarray, cols: np.ndarray, num_nodes: int) -> tuple:
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_nodes), out=indptr[1:])
+    return indptr, cols[order]
+
+
+class SyntheticNetwork:
+    """Synthetic citation network with CSIndex publications and external works."""
+
+    def __init__(self, src, dst, num_nodes, publication_area, publication_year, seed=0):
+        self.src = np.asarray(src, dtype=np.int32)
+        self.dst = np.asarray(dst, dtype=np.int32)
+        self.num_nodes = int(num_nodes)
+        self.publication_area = np.asarray(publication_area, dtype=np.uint8)
+        self.publication_year = np.asarray(publication_year, dtype=np.int16)
+        self.seed = seed
+        self._out = None
+        self._in = None
+
+    @property
+    def num_publications(self) -> int:
+        return len(self.publication_area)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.src)
+
+    @classmethod
+    def generate(
+        cls,
+        num_edges: int,
+        num_publications: int = None,
+        external_ratio: float = 2.0,
+        seed: int = 0,
+    ):
+        """
+        Generate a network with about `num_edges` distinct edges.
+
+        Args:
+            num_edges (int): Edges drawn (duplicates and self-loops are removed).
+            num_publications (int): CSIndex publications (default: num_edges // 10).
+            external_ratio (float): External works per publication.
+            seed (int): Random seed; the same arguments always give the same network.
+        """
+        rng = np.random.default_rng(seed)
+        num_publications = num_publications or max(len(AREAS), num_edges // 10)
+        num_nodes = num_publications + int(num_publications * external_ratio)
+
+        # Sub-area sizes follow a Zipf-like distribution, as in CSIndex.
+        weights = 1.0 / np.arange(1, len(AREAS) + 1)
+        publication_area = rng.choice(len(AREAS), num_publications, p=weights / weights.sum())
+        publication_year = rng.integers(FIRST_YEAR, LAST_YEAR + 1, num_publications)
+
+        src = rng.integers(0, num_nodes, num_edges, dtype=np.int64)
+        # External works only appear as citing works of publications; publications cite
+        # any work. Targets are skewed towards low ids (u**3), i.e. highly cited works.
+        skew = rng.random(num_edges) ** 3
+        external = src >= num_publications
+        dst = np.where(
+            external,
+            (skew * num_publications).astype(np.int64),
+            (skew * num_nodes).astype(np.int64),
+        )
+        keys = np.unique(src[src != dst] * num_nodes + dst[src != dst])
+        return cls(
+            keys // num_nodes,
+            keys % num_nodes,
+            num_nodes,
+            publication_area,
+            publication_year,
+            seed,
+        )
+
+    def save(self, directory: str) -> str:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, NETWORK_FILE)
+        meta = json.dumps({"num_nodes": self.num_nodes, "seed": self.seed, "areas": AREAS})
+        np.savez(
+            path,
+            src=self.src,
+            dst=self.dst,
+            publication_area=self.publication_area,
+            publication_year=self.publication_year,
+            meta=np.frombuffer(meta.encode("utf-8"), dtype=np.uint8),
+        )
+        return path
+
+    @classmethod
+    def load(cls, directory: str):
+        with np.load(os.path.join(directory, NETWORK_FILE)) as archive:
+            meta = json.loads(archive["meta"].tobytes().decode("utf-8"))
+            return cls(
+                archive["src"],
+                archive["dst"],
+                meta["num_nodes"],
+                archive["publication_area"],
+                archive["publication_year"],
+                meta["seed"],
+            )
+
+    def area(self, node: int) -> str:
+        """Sub-area of a node ("" for external works)."""
+        return AREAS[self.publication_area[node]] if node < self.num_publications else ""
+
+    def references(self, node: int) -> np.ndarray:
+        if self._out is None:
+            self._out = _csr(self.src, self.dst, self.num_nodes)
+        indptr, indices = self._out
+        return indices[indptr[node] : indptr[node + 1]]
+
+    def citations(self, node: int) -> np.ndarray:
+        if self._in is None:
+            self._in = _csr(self.dst, self.src, self.num_nodes)
+        indptr, indices = self._in
+        return indices[indptr[node] : indptr[node + 1]]
+
+    def write_csindex(self, directory: str, seed: int = None) -> list:
+        """
+        Write one <area>-out-papers.csv per sub-area and return their paths.
+
+        About 15% of the DOIs get a "https://doi.org/" prefix, 10% are upper-case and 5%
+        are "null", as in the real files.
+        """
+        os.makedirs(directory, exist_ok=True)
+        # A separate stream, so the DOI shapes are independent of the generated sub-areas.
+        rng = np.random.default_rng([self.seed if seed is None else seed, 1])
+        nodes = np.arange(self.num_publications)
+        dois = pd.Series([doi(node) for node in nodes.tolist()], dtype=object)
+        shape = rng.random(self.num_publications)
+        dois[shape < 0.15] = "https://doi.org/" + dois[shape < 0.15]
+        upper = (shape >= 0.15) & (shape < 0.25)
+        dois[upper] = dois[upper].str.upper()
+        dois[shape >= 0.95] = "null"
+        frame = pd.DataFrame(
+            {
+                "year": self.publication_year,
+                "venue": "SYNTH",
+                "title": "Synthetic publication " + pd.Series(nodes).astype(str),
+                "authors": "Author A; Author B",
+                "pages": "1-10",
+                "doi": dois,
+                "area": self.publication_area,
+            }
+        )
+        paths = []
+        for code, area in enumerate(AREAS):
+            path = os.path.join(directory, f"{area}-out-papers.csv")
+            rows = frame[frame["area"] == code].drop(columns="area")
+            rows.to_csv(path, header=False, index=False)
+            paths.append(path)
+        return paths
+
+    def write_edge_list(self, path: str, chunk_size: int = 1_000_000) -> None:
+        """Write all edges as an open_citations_edge_list.csv-shaped file."""
+        lookup = np.array(AREAS + [""], dtype=object)
+        area_of = np.full(self.num_nodes, len(AREAS), dtype=np.int64)
+        area_of[: self.num_publications] = self.publication_area
+        for start in range(0, max(self.num_edges, 1), chunk_size):
+            src = self.src[start : start + chunk_size]
+            dst = self.dst[start : start + chunk_size]
+            pd.DataFrame(
+                {
+                    "origin_doi": [doi(node) for node in src.tolist()],
+                    "target_doi": [doi(node) for node in dst.tolist()],
+                    "origin_sub_area": lookup[area_of[src]],
+                    "target_sub_area": lookup[area_of[dst]],
+                }
+            ).to_csv(path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+
+    def opencitations_references(self, node: int) -> list:
+        """Body of an OpenCitations /references/doi:<doi> response."""
+        citing = doi(node)
+        return [
+            {
+                "oci": f"0{node}-0{cited}",
+                "citing": f"omid:br/0{node} doi:{citing}",
+                "cited": f"omid:br/0{cited} doi:{doi(cited)} openalex:W{cited}",
+                "creation": "2020-01-01",
+                "timespan": "P1Y",
+                "journal_sc": "no",
+                "author_sc": "no",
+            }
+            for cited in self.references(node).tolist()
+        ]
+
+    def opencitations_citations(self, node: int) -> list:
+        """Body of an OpenCitations /citations/doi:<doi> response."""
+        cited = doi(node)
+        return [
+            {
+                "oci": f"0{citing}-0{node}",
+                "citing": f"omid:br/0{citing} doi:{doi(citing)} openalex:W{citing}",
+                "cited": f"omid:br/0{node} doi:{cited}",
+                "creation": "2020-01-01",
+                "timespan": "P1Y",
+                "journal_sc": "no",
+                "author_sc": "no",
+            }
+            for citing in self.citations(node).tolist()
+        ]
+
+    def openalex_work(self, node: int) -> dict:
+        """An OpenAlex /works record (the fields requested by openalex_client.WORK_FIELDS)."""
+        references = self.references(node)
+        return {
+            "id": f"https://openalex.org/W{node}",
+            "doi": f"https://doi.org/{doi(node)}",
+            "title": f"Synthetic work {node}",
+            "primary_topic": {"subfield": {"display_name": self.area(node) or "Other"}},
+            "referenced_works_count": len(references),
+            "referenced_works": [f"https://openalex.org/W{cited}" for cited in references.tolist()],
+            "cited_by_count": len(self.citations(node)),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic citation network.")
+    parser.add_argument("output_dir", help="Directory for network.npz and the CSIndex CSVs.")
+    parser.add_argument("--edges", type=int, default=100_000, help="Number of edges to draw.")
+    parser.add_argument(
+        "--publications", type=int, default=None, help="CSIndex publications (default: edges / 10)."
+    )
+    parser.add_argument("--external-ratio", type=float, default=2.0, help="External works per publication.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+    parser.add_argument(
+        "--edge-list", action="store_true", help=f"Also write {EDGE_LIST_FILE}."
+    )
+    args = parser.parse_args()
+
+    network = SyntheticNetwork.generate(args.edges, args.publications, args.external_ratio, args.seed)
+    network.save(args.output_dir)
+    network.write_csindex(os.path.join(args.output_dir, CSINDEX_DIR))
+    if args.edge_list:
+        network.write_edge_list(os.path.join(args.output_dir, EDGE_LIST_FILE))
+    print(
+        f"[COMPLETE] {network.num_publications} publication(s), {network.num_nodes} node(s) and "
+        f"{network.num_edges} edge(s) written to '{args.output_dir}'."
+    )
+
+
+if __name__ == "__main__":
+    main()
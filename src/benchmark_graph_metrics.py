@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Check graph_metrics against NetworkX on the sub-area graphs in data/sub_areas.
+
+For every GEXF file the graph is read once with NetworkX, converted to a sparse
+adjacency matrix, and PageRank and HITS are computed both with networkx and with
+graph_metrics. The script prints the time of each implementation and the largest
+absolute difference between their scores, and exits with status 1 if any difference
+is above --tolerance.
+
+Usage:
+    python benchmark_graph_metrics.py [--input-dir ../data/sub_areas] [--alpha 0.85]
+        [--tolerance 1e-6]
+"""
+
+import argparse
+import glob
+import os
+import sys
+from time import perf_counter
+
+import networkx as nx
+import numpy as np
+
+from graph_metrics import DEFAULT_ALPHA, adjacency, hits, pagerank, reciprocity
+
+
+def timed(function, *args, **kwargs):
+    start = perf_counter()
+    result = function(*args, **kwargs)
+    return result, perf_counter() - start
+
+
+def compare(path: str, alpha: float) -> dict:
+    """Run both implementations on one GEXF file and return timings and differences."""
+    graph = nx.read_gexf(path)
+    nodes = list(graph)
+    position = {node: i for i, node in enumerate(nodes)}
+    src = np.fromiter((position[u] for u, _ in graph.edges()), dtype=np.int64, count=graph.number_of_edges())
+    dst = np.fromiter((position[v] for _, v in graph.edges()), dtype=np.int64, count=graph.number_of_edges())
+    matrix = adjacency(src, dst, len(nodes))
+
+    expected, nx_pagerank_time = timed(nx.pagerank, graph, alpha=alpha)
+    actual, pagerank_time = timed(pagerank, matrix, alpha)
+    (nx_hubs, nx_authorities), nx_hits_time = timed(nx.hits, graph)
+    (hubs, authorities), hits_time = timed(hits, matrix)
+    return {
+        "nodes": len(nodes),
+        "edges": graph.number_of_edges(),
+        "nx_pagerank": nx_pagerank_time,
+        "pagerank": pagerank_time,
+        "nx_hits": nx_hits_time,
+        "hits": hits_time,
+        "pagerank_diff": float(np.abs(actual - np.array([expected[n] for n in nodes])).max()),
+        "hits_diff": float(
+            max(
+                np.abs(hubs - np.array([nx_hubs[n] for n in nodes])).max(),
+                np.abs(authorities - np.array([nx_authorities[n] for n in nodes])).max(),
+            )
+        ),
+        "reciprocity_diff": abs(reciprocity(matrix) - nx.overall_reciprocity(graph)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare graph_metrics with NetworkX on GEXF files.")
+    parser.add_argument("--input-dir", default="../data/sub_areas", help="Directory with *.gexf files.")
+    parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA, help="PageRank damping factor.")
+    parser.add_argument("--tolerance", type=float, default=1e-6, help="Largest accepted score difference.")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.input_dir, "*.gexf")))
+    if not paths:
+        print(f"[ERROR] No GEXF files found in {args.input_dir}")
+        return 1
+    print(
+        f"{'graph':<12}{'nodes':>8}{'edges':>8}{'nx pr':>10}{'pr':>10}{'nx hits':>10}{'hits':>10}"
+        f"{'pr diff':>11}{'hits diff':>11}"
+    )
+    failed = []
+    totals = np.zeros(4)
+    for path in paths:
+        name = os.path.basename(path).split("_")[0]
+        result = compare(path, args.alpha)
+        totals += [result["nx_pagerank"], result["pagerank"], result["nx_hits"], result["hits"]]
+        print(
+            f"{name:<12}{result['nodes']:>8}{result['edges']:>8}"
+            f"{result['nx_pagerank']:>9.4f}s{result['pagerank']:>9.4f}s"
+            f"{result['nx_hits']:>9.4f}s{result['hits']:>9.4f}s"
+            f"{result['pagerank_diff']:>11.2e}{result['hits_diff']:>11.2e}"
+        )
+        if max(result["pagerank_diff"], result["hits_diff"], result["reciprocity_diff"]) > args.tolerance:
+            failed.append(name)
+    print(
+        f"{'total':<28}{totals[0]:>9.4f}s{totals[1]:>9.4f}s{totals[2]:>9.4f}s{totals[3]:>9.4f}s"
+    )
+    if failed:
+        print(f"[ERROR] Scores differ by more than {args.tolerance} for: {', '.join(failed)}")
+        return 1
+    print(f"All scores match NetworkX within {args.tolerance}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
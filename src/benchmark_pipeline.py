@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+End-to-end pipeline benchmark on a synthetic network.
+
+Generates (or reuses) a seeded synthetic network with benchmark_data.py, serves it with
+the mock server of benchmark_server.py (with configurable latency and 429 rate), and
+times each pipeline stage with its peak memory:
+
+    load_publications   CSIndexLoader for the 20 CSIndex areas over HTTP, into an empty
+                        mirror (also reports the time to revalidate the mirror)
+    process_doi         process_doi for a sample of publications, one after the other
+    main                extraction_open_citations.py end to end (subprocess; peak RSS)
+    create_subarea_graphs / save_graphs
+                        generate_citation_graph on the synthetic edge list
+    save_graphs_parallel
+                        the parallel streaming GEXF export of generate_citation_graph
+    verify              the verify_data.py integrity checks
+
+In-process stages report the tracemalloc peak (Python and NumPy allocations); the main
+stage reports the peak RSS of the subprocess. Results are written as JSON together with
+the commit they were measured on, and --compare prints the change against an earlier
+result file (exit status 1 if a stage got slower than --threshold).
+
+Usage:
+    python benchmark_pipeline.py [--edges 100000] [--steps load_publications,main,...]
+        [--latency 0.01] [--rate-429 0.0] [--output results.json] [--compare old.json]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+import extraction_open_citations
+from csindex_loader import CSIndexLoader, publication_pairs
+from benchmark_data import CSINDEX_DIR, EDGE_LIST_FILE, NETWORK_FILE, SyntheticNetwork
+from benchmark_server import DEFAULT_PORT
+from generate_citation_graph import (
+    create_subarea_graphs,
+    partition_edges,
+    save_graphs,
+    save_graphs_parallel,
+)
+from citation_graph import CitationGraph
+from csindex_areas import AREAS
+from verify_data import check_edges, load_edge_keys
+
+STEPS = [
+    "load_publications",
+    "process_doi",
+    "main",
+    "create_subarea_graphs",
+    "save_graphs",
+    "save_graphs_parallel",
+    "verify",
+]
+RESULTS_DIR = "../benchmark_results"
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def git_revision() -> dict:
+    """Commit (and whether the tree has local changes) the benchmark runs on."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SRC_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=SRC_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        return {"commit": commit, "dirty": bool(dirty)}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def measure(function, trace_memory: bool = True) -> dict:
+    """Run function() with its output silenced; return seconds, peak memory and its result."""
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        extra = function() or {}
+    seconds = time.perf_counter() - start
+    result = {"seconds": round(seconds, 4)}
+    if trace_memory:
+        result["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        tracemalloc.stop()
+    result.update(extra)
+    return result
+
+
+@contextlib.contextmanager
+def mock_server(data_dir: str, port: int, latency: float, rate_429: float, seed: int, counts: dict):
+    """
+    Run benchmark_server.py in a subprocess for the duration of the block.
+
+    When the block exits, `counts` is filled with the server's request counters.
+    """
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(SRC_DIR, "benchmark_server.py"),
+            data_dir,
+            "--port", str(port),
+            "--latency", str(latency),
+            "--rate-429", str(rate_429),
+            "--seed", str(seed),
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        # The server prints its first line once the network is loaded and it listens.
+        line = process.stdout.readline()
+        if not line.startswith("[INFO] Serving"):
+            raise RuntimeError(f"Mock server did not start: {line!r}")
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        output, _ = process.communicate()
+        for line in output.splitlines():
+            if line.startswith("[SUMMARY] "):
+                counts.update(json.loads(line.removeprefix("[SUMMARY] ")))
+
+
+def prepare_data(work_dir: str, edges: int, publications: int, seed: int) -> SyntheticNetwork:
+    """Generate the synthetic network unless work_dir already holds one with these settings."""
+    settings_path = os.path.join(work_dir, "settings.json")
+    settings = {"edges": edges, "publications": publications, "seed": seed}
+    if os.path.exists(settings_path) and os.path.exists(os.path.join(work_dir, NETWORK_FILE)):
+        with open(settings_path) as f:
+            if json.load(f) == settings:
+                return SyntheticNetwork.load(work_dir)
+    network = SyntheticNetwork.generate(edges, publications, seed=seed)
+    network.save(work_dir)
+    network.write_csindex(os.path.join(work_dir, CSINDEX_DIR))
+    network.write_edge_list(os.path.join(work_dir, EDGE_LIST_FILE))
+    with open(settings_path, "w") as f:
+        json.dump(settings, f)
+    return network
+
+
+def run_steps(args, network: SyntheticNetwork, base_url: str) -> dict:
+    work_dir = args.work_dir
+    edge_list = os.path.join(work_dir, EDGE_LIST_FILE)
+    csindex_url = f"{base_url}/{CSINDEX_DIR}/"
+    api_url = f"{base_url}/opencitations"
+    results = {}
+    publications = []
+
+    def load_publications():
+        mirror_dir = os.path.join(work_dir, "csindex_mirror")
+        shutil.rmtree(mirror_dir, ignore_errors=True)
+        publications.extend(publication_pairs(CSIndexLoader(csindex_url, mirror_dir).load(AREAS)))
+        # A second load only revalidates the mirrored files (304 responses).
+        start = time.perf_counter()
+        CSIndexLoader(csindex_url, mirror_dir).load(AREAS)
+        return {
+            "publications": len(publications),
+            "revalidated_seconds": round(time.perf_counter() - start, 4),
+        }
+
+    def process_doi():
+        extraction_open_citations.API_BASE_URL = api_url
+        extraction_open_citations.rate_limiter = None
+        extraction_open_citations.response_cache = None
+        rng = np.random.default_rng(args.seed)
+        sample = rng.choice(len(publications), min(args.sample, len(publications)), replace=False)
+        edges = 0
+        for i in sample.tolist():
+            doi, sub_area = publications[i]
+            edges += len(extraction_open_citations.process_doi(doi, sub_area))
+        return {"dois": len(sample), "edges": edges}
+
+    def main():
+        run_dir = os.path.join(work_dir, "run")
+        shutil.rmtree(run_dir, ignore_errors=True)
+        os.makedirs(run_dir)
+        before = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        completed = subprocess.run(
+            [
+                sys.executable,
+                os.path.join(SRC_DIR, "extraction_open_citations.py"),
+                "--api-base", api_url,
+                "--csindex-base", csindex_url,
+                "--csindex-mirror", os.path.join(run_dir, "csindex"),
+                "--engine", args.engine,
+                "--concurrency", str(args.concurrency),
+                "--workers", str(args.concurrency),
+                "--rate", "0",
+                "--no-cache",
+            ],
+            cwd=run_dir,
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        with open(os.path.join(run_dir, "open_citations_edge_list.csv")) as f:
+            edges = sum(1 for _ in f) - 1
+        with open(os.path.join(run_dir, "pipeline_metrics.json")) as f:
+            metrics = json.load(f)
+        return {
+            "returncode": completed.returncode,
+            "edges": edges,
+            "requests": metrics["requests"]["by_endpoint"],
+            "request_p90_seconds": {
+                endpoint: latency["p90"] for endpoint, latency in metrics["latency_seconds"].items()
+            },
+            # ru_maxrss is in KiB on Linux; it only grows, so an unchanged value is a lower bound.
+            "peak_rss_mb": round(max(peak, before) / 1024, 2),
+        }
+
+    graphs = {}
+
+    def create_graphs():
+        graphs["sub_areas"] = create_subarea_graphs(edge_list, AREAS)
+        return {}
+
+    def save():
+        output_dir = os.path.join(work_dir, "sub_areas")
+        os.makedirs(output_dir, exist_ok=True)
+        save_graphs(graphs["sub_areas"], output_dir)
+        return {"files": len(os.listdir(output_dir))}
+
+    def save_parallel():
+        output_dir = os.path.join(work_dir, "sub_areas_parallel")
+        os.makedirs(output_dir, exist_ok=True)
+        graph = CitationGraph.from_file(edge_list, AREAS)
+        save_graphs_parallel(graph, partition_edges(graph, AREAS), output_dir)
+        return {"files": len(os.listdir(output_dir))}
+
+    def verify():
+        keys, table = load_edge_keys(edge_list)
+        report = check_edges(keys, table)
+        return {"edges": report["edges"], "counts": report["counts"]}
+
+    functions = {
+        "load_publications": load_publications,
+        "process_doi": process_doi,
+        "main": main,
+        "create_subarea_graphs": create_graphs,
+        "save_graphs": save,
+        "save_graphs_parallel": save_parallel,
+        "verify": verify,
+    }
+    for step in args.steps:
+        if step == "process_doi" and not publications:
+            # process_doi needs the loaded publications.
+            measure(load_publications, trace_memory=False)
+        if step == "save_graphs" and "sub_areas" not in graphs:
+            measure(create_graphs, trace_memory=False)
+        print(f"[INFO] Running {step}...", flush=True)
+        results[step] = measure(functions[step], trace_memory=args.trace_memory and step != "main")
+        print(f"[INFO] {step}: {results[step]}", flush=True)
+    return results
+
+
+def compare(results: dict, baseline_path: str, threshold: float) -> list:
+    """Print the change of each stage against a baseline file; return the stages that regressed."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('git', {}).get('commit')}):")
+    print(f"{'step':<24}{'before':>10}{'after':>10}{'change':>10}")
+    regressions = []
+    for step, result in results["steps"].items():
+        before = baseline.get("steps", {}).get(step)
+        if before is None:
+            continue
+        change = result["seconds"] / before["seconds"] - 1 if before["seconds"] else 0.0
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{step:<24}{before['seconds']:>9.3f}s{result['seconds']:>9.3f}s{change:>+10.1%}{flag}")
+        if flag:
+            regressions.append(step)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on a synthetic network.")
+    parser.add_argument("--edges", type=int, default=100_000, help="Edges of the synthetic network (1e4 to 5e7).")
+    parser.add_argument("--publications", type=int, default=None, help="CSIndex publications (default: edges / 10).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+    parser.add_argument(
+        "--work-dir", default=None, help="Directory for the data and outputs (reused if it matches)."
+    )
+    parser.add_argument(
+        "--steps",
+        default=",".join(STEPS),
+        help=f"Comma-separated stages to run (default: all of {','.join(STEPS)}).",
+    )
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Mock server port.")
+    parser.add_argument("--latency", type=float, default=0.01, help="Mock API latency in seconds.")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Share of mock API requests answered with 429.")
+    parser.add_argument("--sample", type=int, default=200, help="Publications used by the process_doi stage.")
+    parser.add_argument("--engine", choices=["async", "threads"], default="async", help="Engine of the main stage.")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrency of the main stage.")
+    parser.add_argument(
+        "--no-trace-memory",
+        dest="trace_memory",
+        action="store_false",
+        help="Skip tracemalloc (it slows allocation-heavy stages down).",
+    )
+    parser.add_argument("--output", default=None, help="Result JSON file (default: ../benchmark_results/...).")
+    parser.add_argument("--compare", default=None, help="Earlier result JSON to compare with.")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="Slowdown (0.2 = 20%%) reported as a regression."
+    )
+    args = parser.parse_args()
+    args.steps = [step.strip() for step in args.steps.split(",") if step.strip()]
+    unknown = set(args.steps) - set(STEPS)
+    if unknown:
+        parser.error(f"unknown step(s): {', '.join(sorted(unknown))}")
+
+    server_counts = {}
+    cleanup = args.work_dir is None
+    args.work_dir = os.path.abspath(args.work_dir or tempfile.mkdtemp(prefix="citation_benchmark_"))
+    try:
+        start = time.perf_counter()
+        network = prepare_data(args.work_dir, args.edges, args.publications, args.seed)
+        print(
+            f"[INFO] Synthetic network: {network.num_publications} publication(s), "
+            f"{network.num_nodes} node(s), {network.num_edges} edge(s) "
+            f"({time.perf_counter() - start:.1f}s)",
+            flush=True,
+        )
+        with mock_server(
+            args.work_dir, args.port, args.latency, args.rate_429, args.seed, server_counts
+        ) as base_url:
+            steps = run_steps(args, network, base_url)
+    finally:
+        if cleanup:
+            shutil.rmtree(args.work_dir, ignore_errors=True)
+
+    revision = git_revision()
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {
+            "edges": args.edges,
+            "publications": network.num_publications,
+            "nodes": network.num_nodes,
+            "unique_edges": network.num_edges,
+            "seed": args.seed,
+            "latency": args.latency,
+            "rate_429": args.rate_429,
+            "sample": args.sample,
+            "engine": args.engine,
+            "concurrency": args.concurrency,
+            "trace_memory": args.trace_memory,
+        },
+        "steps": steps,
+        "server": server_counts,
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{revision['commit'] or 'unknown'}-{args.edges}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"[COMPLETE] Results saved to '{output}'.")
+
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
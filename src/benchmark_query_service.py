@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Load test of the citation query service.
+
+Starts `query_service.py serve` on a snapshot as a subprocess (reporting the time until
+it answers its first request), or targets an already running service with --url, and
+sends --queries requests from --clients processes, each over one keep-alive
+http.client connection (a requests session in one shared process tops out at well
+under a thousand requests per second, below what the service answers).
+Queries are drawn from a mix of cited-by, references, neighbors, top and area-counts;
+the DOIs come from --distinct random nodes of the snapshot, picked with a Zipf-like
+skew so that popular DOIs repeat (as in interactive use) and the LRU cache is exercised.
+
+Prints the throughput (queries per second), latency percentiles per query type, the
+share of failed requests and the cache hit rate reported by /stats. With --direct the
+same queries are also run in-process against CitationQueries, without HTTP.
+
+Usage:
+    python benchmark_query_service.py [--snapshot ../data/citation_graph] [--url URL]
+        [--queries 20000] [--clients 4] [--distinct 2000] [--port 8901] [--direct]
+"""
+
+import argparse
+import concurrent.futures
+import http.client
+import subprocess
+import sys
+import time
+from urllib.parse import urlencode, urlparse
+
+import numpy as np
+import requests
+
+from citation_graph import CitationGraph
+from query_service import CSINDEX, DEFAULT_SNAPSHOT_DIR, CitationQueries
+
+MIX = ["cited-by", "references", "neighbors", "top", "area-counts"]
+STARTUP_TIMEOUT = 30.0
+
+
+def make_queries(snapshot_dir: str, count: int, distinct: int, seed: int = 0) -> list:
+    """Return `count` (query, params) pairs over `distinct` DOIs of the snapshot."""
+    graph = CitationGraph.load(snapshot_dir)
+    rng = np.random.default_rng(seed)
+    nodes = rng.choice(graph.num_nodes, size=min(distinct, graph.num_nodes), replace=False)
+    dois = graph.dois(nodes)
+    # Zipf-like popularity: the i-th DOI is picked with probability ~ 1 / (i + 1).
+    weights = 1.0 / np.arange(1, len(dois) + 1)
+    picks = rng.choice(len(dois), size=count, p=weights / weights.sum())
+    areas = graph.areas + [None]
+    queries = []
+    for pick, kind in zip(picks.tolist(), rng.choice(MIX, size=count).tolist()):
+        if kind == "top":
+            params = {"area": areas[pick % len(areas)], "limit": 10}
+        elif kind == "area-counts":
+            params = {"area": graph.areas[pick % len(graph.areas)]}
+        else:
+            params = {"doi": dois[pick], "area": CSINDEX if pick % 2 else None, "limit": 100}
+        queries.append((kind, {name: value for name, value in params.items() if value is not None}))
+    return queries
+
+
+def start_service(snapshot_dir: str, port: int) -> tuple:
+    """Start the service as a subprocess; return (process, base URL, seconds until it answered)."""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "query_service.py", "serve", "--snapshot", snapshot_dir, "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    while time.perf_counter() - start < STARTUP_TIMEOUT:
+        if process.poll() is not None:
+            raise RuntimeError(f"query_service.py exited with status {process.returncode}")
+        try:
+            requests.get(f"{url}/stats", timeout=1).raise_for_status()
+            return process, url, time.perf_counter() - start
+        except requests.ConnectionError:
+            time.sleep(0.02)
+    process.terminate()
+    raise RuntimeError(f"query_service.py did not answer within {STARTUP_TIMEOUT:.0f}s")
+
+
+def run_client(url: str, queries: list) -> list:
+    """Send the queries over one connection; return (query, status, seconds) per request."""
+    address = urlparse(url)
+    connection = http.client.HTTPConnection(address.hostname, address.port, timeout=30)
+    results = []
+    for kind, params in queries:
+        start = time.perf_counter()
+        try:
+            connection.request("GET", f"/{kind}?{urlencode(params)}")
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            status = None
+        results.append((kind, status, time.perf_counter() - start))
+    connection.close()
+    return results
+
+
+def load_test(url: str, queries: list, clients: int) -> tuple:
+    """Run the queries split over `clients` processes; return (results, wall seconds)."""
+    shares = [queries[i::clients] for i in range(clients)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=clients) as executor:
+        # Start the workers before the clock does.
+        list(executor.map(time.sleep, [0] * clients))
+        start = time.perf_counter()
+        results = [result for part in executor.map(run_client, [url] * clients, shares) for result in part]
+    return results, time.perf_counter() - start
+
+
+def report(results: list, seconds: float) -> None:
+    failed = sum(status is None or status >= 500 for _, status, _ in results)
+    print(f"[SUMMARY] {len(results)} queries in {seconds:.2f}s: {len(results) / seconds:,.0f} queries/s, {failed} failed")
+    print(f"  {'query':<14}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for kind in MIX + ["all"]:
+        latencies = np.array([s for k, _, s in results if kind in ("all", k)]) * 1000
+        if len(latencies):
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            print(f"  {kind:<14}{len(latencies):>8}{p50:>10.2f}{p95:>10.2f}{p99:>10.2f}")
+
+
+def direct_test(snapshot_dir: str, queries: list) -> None:
+    """Run the queries in-process (cold cache, then warm) and print the throughput."""
+    start = time.perf_counter()
+    engine = CitationQueries(snapshot_dir)
+    print(f"[INFO] In-process engine loaded in {time.perf_counter() - start:.3f}s")
+    for label in ("cold cache", "warm cache"):
+        start = time.perf_counter()
+        for kind, params in queries:
+            try:
+                engine.run(kind, **params)
+            except KeyError:
+                pass
+        seconds = time.perf_counter() - start
+        print(f"[SUMMARY] Direct, {label}: {len(queries) / seconds:,.0f} queries/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the citation query service.")
+    parser.add_argument("--snapshot", default=DEFAULT_SNAPSHOT_DIR, help="Snapshot directory.")
+    parser.add_argument("--url", help="Base URL of a running service (default: start one).")
+    parser.add_argument("--port", type=int, default=8901, help="Port of the started service.")
+    parser.add_argument("--queries", type=int, default=20_000, help="Number of requests.")
+    parser.add_argument("--clients", type=int, default=4, help="Concurrent client processes.")
+    parser.add_argument("--distinct", type=int, default=2_000, help="Number of distinct DOIs queried.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the query mix.")
+    parser.add_argument("--direct", action="store_true", help="Also run the queries in-process.")
+    args = parser.parse_args()
+
+    queries = make_queries(args.snapshot, args.queries, args.distinct, args.seed)
+    process = None
+    url = args.url
+    if url is None:
+        process, url, startup = start_service(args.snapshot, args.port)
+        print(f"[INFO] Service started and answered in {startup:.3f}s")
+    try:
+        results, seconds = load_test(url, queries, args.clients)
+        report(results, seconds)
+        cache = requests.get(f"{url}/stats", timeout=5).json()["cache"]
+        lookups = cache["hits"] + cache["misses"]
+        print(f"[INFO] Cache: {cache['hits']}/{lookups} hits ({cache['hits'] / max(lookups, 1):.1%}), {cache['size']} entries")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    if args.direct:
+        direct_test(args.snapshot, queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Local mock of the CSIndex, OpenCitations and OpenAlex endpoints for the benchmarks.
+
+Serves a SyntheticNetwork (see benchmark_data.py):
+
+    GET /csindex/<area>-out-papers.csv        CSIndex area files (conditional GETs with
+                                              If-None-Match are answered with 304)
+    GET /opencitations/references/doi:<doi>   OpenCitations v2 /references
+    GET /opencitations/citations/doi:<doi>    OpenCitations v2 /citations
+    GET /openalex/works?filter=...            OpenAlex /works (page or cursor paging;
+                                              "cites:W1|W2" filters return the citing
+                                              works, "openalex:W1|W2" the listed works,
+                                              any other filter the publications)
+
+API responses are delayed by --latency seconds (plus uniform --jitter), and a
+--rate-429 share of them is answered with "429 Too Many Requests" and a Retry-After
+header, to reproduce a throttling API.
+
+Usage:
+    python benchmark_server.py DATA_DIR [--port 8800] [--latency 0.05] [--jitter 0.0]
+        [--rate-429 0.0] [--seed 0]
+"""
+
+import argparse
+import json
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from benchmark_data import CSINDEX_DIR, SyntheticNetwork, node_id
+
+DEFAULT_PORT = 8800
+MAX_PER_PAGE = 200
+
+
+class MockServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the network and the latency/throttling settings."""
+
+    daemon_threads = True
+    # The default backlog (5) drops connections under high client concurrency.
+    request_queue_size = 1024
+
+    def __init__(self, address, data_dir, latency=0.0, jitter=0.0, rate_429=0.0, seed=0):
+        super().__init__(address, MockHandler)
+        self.data_dir = data_dir
+        self.network = SyntheticNetwork.load(data_dir)
+        # Build both adjacency indexes before the first request.
+        self.network.references(0)
+        self.network.citations(0)
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "throttled": 0}
+
+    def handle_error(self, request, client_address):
+        # Clients closing keep-alive connections are expected during the benchmarks.
+        pass
+
+    def admit(self) -> bool:
+        """Count a request and decide whether it is throttled."""
+        with self.lock:
+            self.counts["requests"] += 1
+            throttled = self.random.random() < self.rate_429
+            if throttled:
+                self.counts["throttled"] += 1
+            delay = self.latency + self.random.random() * self.jitter
+        if delay > 0:
+            time.sleep(delay)
+        return not throttled
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status: int, body: bytes, content_type: str, headers: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, data):
+        self.send_body(200, json.dumps(data).encode("utf-8"), "application/json")
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        # DOIs contain "/", so the path is split into at most three parts.
+        parts = url.path.strip("/").split("/", 2)
+        if parts[:1] == ["csindex"] and len(parts) == 2:
+            return self.send_file(os.path.join(self.server.data_dir, CSINDEX_DIR, parts[1]))
+        if parts[:1] not in (["opencitations"], ["openalex"]):
+            return self.send_body(404, b"Not found", "text/plain")
+        if not self.server.admit():
+            return self.send_body(
+                429, b"Too Many Requests", "text/plain", {"Retry-After": "1"}
+            )
+        if parts[0] == "opencitations" and len(parts) == 3 and parts[1] in ("references", "citations"):
+            return self.opencitations(parts[1], unquote(parts[2]))
+        if parts == ["openalex", "works"]:
+            return self.openalex({k: v[0] for k, v in parse_qs(url.query).items()})
+        return self.send_body(404, b"Not found", "text/plain")
+
+    def send_file(self, path: str):
+        """Serve a file with ETag/Last-Modified validators, answering 304 to a matching conditional GET."""
+        if not os.path.isfile(path):
+            return self.send_body(404, b"Not found", "text/plain")
+        stat = os.stat(path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        validators = {"ETag": etag, "Last-Modified": formatdate(stat.st_mtime, usegmt=True)}
+        with self.server.lock:
+            self.server.counts["files"] = self.server.counts.get("files", 0) + 1
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            for name, value in validators.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+        with open(path, "rb") as f:
+            self.send_body(200, f.read(), "text/csv", validators)
+
+    def opencitations(self, endpoint: str, identifier: str):
+        network = self.server.network
+        node = node_id(identifier.removeprefix("doi:").lower())
+        if node is None or node >= network.num_nodes:
+            return self.send_json([])
+        if endpoint == "references":
+            return self.send_json(network.opencitations_references(node))
+        return self.send_json(network.opencitations_citations(node))
+
+    def openalex(self, query: dict):
+        network = self.server.network
+        filter_ = query.get("filter", "")
+        if filter_.startswith("cites:"):
+            cited = [
+                int(value.rpartition("/")[2].removeprefix("W"))
+                for value in filter_.removeprefix("cites:").split("|")
+            ]
+            nodes = sorted({int(n) for node in cited for n in network.citations(node).tolist()})
+        elif filter_.startswith("openalex:"):
+            requested = (
+                value.rpartition("/")[2].removeprefix("W") for value in filter_.removeprefix("openalex:").split("|")
+            )
+            nodes = sorted({int(node) for node in requested if node.isdigit() and int(node) < network.num_nodes})
+        else:
+            nodes = range(network.num_publications)
+        per_page = min(int(query.get("per_page", 25)), MAX_PER_PAGE)
+        if "cursor" in query:
+            start = 0 if query["cursor"] == "*" else int(query["cursor"])
+            next_cursor = str(start + per_page) if start + per_page < len(nodes) else None
+        else:
+            start = (int(query.get("page", 1)) - 1) * per_page
+            next_cursor = None
+        select = query.get("select", "").split(",") if query.get("select") else None
+        results = []
+        for node in nodes[start : start + per_page]:
+            work = network.openalex_work(node)
+            results.append({k: work[k] for k in select if k in work} if select else work)
+        self.send_json(
+            {"meta": {"count": len(nodes), "next_cursor": next_cursor}, "results": results}
+        )
+
+
+def start_server(data_dir: str, port: int = DEFAULT_PORT, **settings) -> MockServer:
+    """Start a MockServer in a background thread and return it (call shutdown() to stop)."""
+    server = MockServer(("127.0.0.1", port), data_dir, **settings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a synthetic network as mock APIs.")
+    parser.add_argument("data_dir", help="Directory written by benchmark_data.py.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every API response.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency (0..jitter seconds).")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Share of API requests answered with 429.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency jitter and throttling.")
+    args = parser.parse_args()
+
+    server = MockServer(
+        ("127.0.0.1", args.port),
+        args.data_dir,
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_429=args.rate_429,
+        seed=args.seed,
+    )
+    # Stop cleanly (and print the summary) when terminated by the benchmark runner.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"[INFO] Serving '{args.data_dir}' on http://127.0.0.1:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"[SUMMARY] {json.dumps(server.counts)}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
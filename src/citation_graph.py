@@ -0,0 +1,284 @@
+"""
+Compact integer-indexed citation graph.
+
+NetworkX keeps every node as a string key and every edge as nested dicts, which costs
+hundreds of bytes per edge. CitationGraph instead stores:
+
+    - a node table: DOIs interned to int32 ids, kept as one UTF-8 byte buffer plus offsets
+    - out-adjacency and in-adjacency as CSR arrays (int64 indptr, int32 indices)
+    - one uint8 sub-area code per node (UNKNOWN_CODE when the sub-area is not known)
+
+All arrays are plain NumPy arrays saved as .npy files, so a saved graph can be loaded
+with mmap (zero-copy). Conversion to NetworkX happens only on demand, for the whole
+graph or for a subset of its edges.
+"""
+
+import json
+import os
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+from columnar_io import is_parquet, read_edge_list
+from doi_utils import canonicalize_series
+
+UNKNOWN = "unknown"
+UNKNOWN_CODE = 255
+
+_ARRAYS = [
+    "doi_bytes",
+    "doi_offsets",
+    "node_area",
+    "out_indptr",
+    "out_indices",
+    "in_indptr",
+    "in_indices",
+]
+
+
+def _csr(rows: np.ndarray, cols: np.ndarray, num_nodes: int) -> tuple:
+    """Build (indptr, indices) for the given (row, col) pairs."""
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_nodes), out=indptr[1:])
+    return indptr, cols[order].astype(np.int32)
+
+
+def canonical_dois(values) -> pd.Series:
+    """Canonicalize a DOI column; values that are not valid DOIs are kept (stripped)."""
+    canonical, _ = canonicalize_series(pd.Series(values, dtype=object), keep_invalid=True)
+    return canonical
+
+
+def encode_areas(values, areas: list) -> np.ndarray:
+    """Map sub-area strings to uint8 codes (position in `areas`, UNKNOWN_CODE otherwise)."""
+    codes = pd.Categorical(values, categories=areas).codes
+    return np.where(codes < 0, UNKNOWN_CODE, codes).astype(np.uint8)
+
+
+class CitationGraph:
+    """Directed citation graph over interned DOIs with CSR adjacency in both directions."""
+
+    def __init__(self, areas: list, **arrays):
+        """
+        Args:
+            areas (list): Sub-area names; node_area holds positions in this list.
+            **arrays: The arrays listed in _ARRAYS (see from_edges for their layout).
+        """
+        self.areas = list(areas)
+        for name in _ARRAYS:
+            setattr(self, name, arrays[name])
+        self._doi_index = None
+
+    @classmethod
+    def from_edges(
+        cls, origin, target, origin_sub_area=None, target_sub_area=None, areas=()
+    ):
+        """
+        Build a graph from parallel DOI (and optional sub-area) sequences.
+
+        Duplicate edges are collapsed, as in nx.DiGraph. A node's sub-area is the first
+        known sub-area it carries on any edge (origin columns first, then target columns);
+        sub-areas not listed in `areas` are treated as unknown.
+        """
+        origin = np.asarray(origin, dtype=object)
+        target = np.asarray(target, dtype=object)
+        codes, uniques = pd.factorize(np.concatenate([origin, target]))
+        num_nodes = len(uniques)
+        src = codes[: len(origin)].astype(np.int64)
+        dst = codes[len(origin) :].astype(np.int64)
+
+        # Collapse duplicate edges.
+        keys = np.unique(src * num_nodes + dst)
+        src, dst = keys // num_nodes, keys % num_nodes
+
+        node_area = np.full(num_nodes, UNKNOWN_CODE, dtype=np.uint8)
+        if origin_sub_area is not None and target_sub_area is not None:
+            edge_areas = encode_areas(
+                np.concatenate(
+                    [np.asarray(origin_sub_area, dtype=object), np.asarray(target_sub_area, dtype=object)]
+                ),
+                areas,
+            )
+            known = edge_areas != UNKNOWN_CODE
+            # Assign in reverse so the first occurrence of each node wins.
+            node_area[codes[known][::-1]] = edge_areas[known][::-1]
+
+        encoded = [str(doi).encode("utf-8") for doi in uniques]
+        doi_offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=doi_offsets[1:])
+        doi_bytes = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+        out_indptr, out_indices = _csr(src, dst, num_nodes)
+        in_indptr, in_indices = _csr(dst, src, num_nodes)
+        return cls(
+            areas,
+            doi_bytes=doi_bytes,
+            doi_offsets=doi_offsets,
+            node_area=node_area,
+            out_indptr=out_indptr,
+            out_indices=out_indices,
+            in_indptr=in_indptr,
+            in_indices=in_indices,
+        )
+
+    @classmethod
+    def from_csv(cls, file_path: str, areas: list):
+        """
+        Load an edge list CSV (origin_doi, target_doi, origin_sub_area, target_sub_area).
+
+        Values are stripped, DOIs are canonicalized (doi_utils) and empty sub-areas
+        become unknown, as in create_subarea_graphs.
+        """
+        df = pd.read_csv(
+            file_path,
+            usecols=["origin_doi", "target_doi", "origin_sub_area", "target_sub_area"],
+            dtype=str,
+            keep_default_na=False,
+        )
+        df = df.apply(lambda column: column.str.strip())
+        return cls.from_edges(
+            canonical_dois(df["origin_doi"]),
+            canonical_dois(df["target_doi"]),
+            df["origin_sub_area"],
+            df["target_sub_area"],
+            areas,
+        )
+
+    @classmethod
+    def from_file(cls, file_path: str, areas: list):
+        """Load an edge list from CSV or Parquet (chosen by the file extension)."""
+        if not is_parquet(file_path):
+            return cls.from_csv(file_path, areas)
+        df = read_edge_list(file_path)
+        return cls.from_edges(
+            canonical_dois(df["origin_doi"]),
+            canonical_dois(df["target_doi"]),
+            df["origin_sub_area"],
+            df["target_sub_area"],
+            areas,
+        )
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_area)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.out_indices)
+
+    def doi(self, node: int) -> str:
+        """Return the DOI of a node id."""
+        start, end = self.doi_offsets[node], self.doi_offsets[node + 1]
+        return bytes(self.doi_bytes[start:end]).decode("utf-8")
+
+    def dois(self, nodes=None) -> list:
+        """Return the DOIs of the given node ids (all nodes by default)."""
+        if nodes is None:
+            nodes = range(self.num_nodes)
+        return [self.doi(node) for node in nodes]
+
+    def node_id(self, doi: str) -> int:
+        """Return the id of a DOI (the DOI -> id table is built on first use)."""
+        if self._doi_index is None:
+            self._doi_index = {doi: i for i, doi in enumerate(self.dois())}
+        return self._doi_index[doi]
+
+    def area_name(self, code: int) -> str:
+        return self.areas[code] if code != UNKNOWN_CODE else UNKNOWN
+
+    def area_code(self, area: str) -> int:
+        return self.areas.index(area) if area in self.areas else UNKNOWN_CODE
+
+    def successors(self, node: int) -> np.ndarray:
+        return self.out_indices[self.out_indptr[node] : self.out_indptr[node + 1]]
+
+    def predecessors(self, node: int) -> np.ndarray:
+        return self.in_indices[self.in_indptr[node] : self.in_indptr[node + 1]]
+
+    def out_degree(self) -> np.ndarray:
+        return np.diff(self.out_indptr)
+
+    def in_degree(self) -> np.ndarray:
+        return np.diff(self.in_indptr)
+
+    def edges(self) -> tuple:
+        """Return (src, dst) int32 arrays in out-CSR order."""
+        src = np.repeat(np.arange(self.num_nodes, dtype=np.int32), self.out_degree())
+        return src, np.asarray(self.out_indices)
+
+    def area_edge_mask(self, area: str) -> np.ndarray:
+        """Boolean mask (out-CSR order) of the edges with at least one endpoint in `area`."""
+        code = self.area_code(area)
+        src, dst = self.edges()
+        return (self.node_area[src] == code) | (self.node_area[dst] == code)
+
+    def to_networkx(self, edge_mask: np.ndarray = None) -> "nx.DiGraph":
+        """
+        Convert the graph (or the edges selected by edge_mask) to an nx.DiGraph.
+
+        Nodes carry their "sub_area" attribute; only nodes touching a selected edge are added.
+        """
+        # Imported here so that the harvesting scripts do not load networkx.
+        import networkx as nx
+
+        src, dst = self.edges()
+        if edge_mask is not None:
+            src, dst = src[edge_mask], dst[edge_mask]
+        nodes = np.unique(np.concatenate([src, dst]))
+        names = self.dois(nodes)
+        label = dict(zip(nodes.tolist(), names))
+        graph = nx.DiGraph()
+        graph.add_nodes_from(
+            (name, {"sub_area": self.area_name(code)})
+            for name, code in zip(names, self.node_area[nodes].tolist())
+        )
+        graph.add_edges_from(zip(map(label.get, src.tolist()), map(label.get, dst.tolist())))
+        return graph
+
+    def area_graphs(self, areas: list = None) -> "AreaGraphs":
+        """Return a mapping area -> nx.DiGraph whose graphs are converted on access."""
+        return AreaGraphs(self, areas if areas is not None else self.areas)
+
+    def save(self, directory: str) -> None:
+        """Save every array as <directory>/<name>.npy plus a meta.json."""
+        os.makedirs(directory, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(
+                {"areas": self.areas, "num_nodes": self.num_nodes, "num_edges": self.num_edges},
+                f,
+            )
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True):
+        """Load a saved graph; with mmap=True the arrays are memory-mapped read-only."""
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        mode = "r" if mmap else None
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode)
+            for name in _ARRAYS
+        }
+        return cls(meta["areas"], **arrays)
+
+
+class AreaGraphs(Mapping):
+    """Read-only mapping area -> per-area nx.DiGraph, converted one area at a time."""
+
+    def __init__(self, graph: CitationGraph, areas: list):
+        self.graph = graph
+        self.areas = list(areas)
+
+    def __getitem__(self, area: str) -> "nx.DiGraph":
+        if area not in self.areas:
+            raise KeyError(area)
+        return self.graph.to_networkx(self.graph.area_edge_mask(area))
+
+    def __iter__(self):
+        return iter(self.areas)
+
+    def __len__(self) -> int:
+        return len(self.areas)
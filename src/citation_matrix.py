@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Sub-area citation matrix, kept as a NumPy count array.
+
+The exploratory notebook computed the area-to-area matrix by re-reading the whole edge
+list and grouping by (origin_sub_area, target_sub_area) for every heatmap. CitationMatrix
+instead holds the counts as an int64 array of shape (years + 1, areas + 1, areas + 1):
+
+    - one slice per publication year of the citing (origin) publication, plus slice 0
+      for edges whose year is unknown (e.g. citing works outside CSIndex)
+    - one row/column per sub-area, plus a last "unknown" row/column for empty sub-areas
+
+New edge blocks are added with update() (one np.bincount per block), so the matrix can
+be maintained while edges are produced. Queries only sum a few small slices, so heatmap
+frames and the weighted area graph are built in milliseconds. The matrix is saved as an
+.npz next to the edge list it was built from, with the size and mtime of that file, so
+load_matrix() rebuilds it when the edge list changed.
+
+Usage:
+    python citation_matrix.py edges.csv [more_edges.csv ...] [--years publication_years.csv]
+        [--output matrix.npz] [--append] [--from-year Y] [--to-year Y]
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from citation_graph import UNKNOWN, UNKNOWN_CODE, encode_areas
+from columnar_io import is_parquet
+from csindex_areas import AREAS
+from doi_utils import canonicalize_series
+
+YEARS_FILE = "publication_years.csv"
+
+
+def matrix_path(edge_file: str) -> str:
+    """Return the matrix file kept next to an edge list ("x/edges.csv" -> "x/edges.matrix.npz")."""
+    stem, _ = os.path.splitext(edge_file)
+    return stem + ".matrix.npz"
+
+
+def file_fingerprint(path: str) -> list:
+    """[size, mtime_ns] of a file, used to tell whether it changed after being counted."""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def build_publication_years(publications: list) -> pd.Series:
+    """Build a DOI -> publication year Series from (doi, year) pairs (last year wins)."""
+    df = pd.DataFrame(publications, columns=["doi", "year"]).drop_duplicates("doi", keep="last")
+    years = pd.to_numeric(df["year"], errors="coerce").astype("Int64")
+    return pd.Series(years.to_numpy(), index=pd.Index(df["doi"]), name="year")
+
+
+def save_publication_years(years: pd.Series, path: str = YEARS_FILE) -> None:
+    years.rename_axis("doi").reset_index().to_csv(path, index=False)
+
+
+def load_publication_years(path: str = YEARS_FILE) -> pd.Series:
+    df = pd.read_csv(path, dtype={"doi": str}, keep_default_na=False)
+    return build_publication_years(zip(df["doi"], df["year"]))
+
+
+def lookup_years(dois, years: pd.Series) -> np.ndarray:
+    """Return the publication year of each DOI as float64 (NaN when unknown)."""
+    positions = years.index.get_indexer(dois)
+    values = np.append(years.to_numpy(dtype=np.float64, na_value=np.nan), np.nan)
+    return values[positions]
+
+
+class CitationMatrix:
+    """Area-to-area citation counts, sliced by publication year."""
+
+    def __init__(self, areas: list = AREAS, years=(), counts=None, sources=(), fingerprints=None):
+        """
+        Args:
+            areas (list): Sub-area names (the matrix adds a trailing "unknown" area).
+            years (array-like): Sorted years of slices 1..N (slice 0 is "year unknown").
+            counts (np.ndarray): Existing counts of shape (len(years) + 1, n, n).
+            sources (iterable): Names of the edge files already added (see add_file).
+            fingerprints (dict): Source name -> [size, mtime_ns] of the file when it was
+                added (see is_current).
+        """
+        self.areas = list(areas)
+        self.labels = self.areas + [UNKNOWN]
+        self.years = np.asarray(years, dtype=np.int64)
+        size = len(self.labels)
+        if counts is None:
+            counts = np.zeros((len(self.years) + 1, size, size), dtype=np.int64)
+        self.counts = counts
+        self.sources = list(sources)
+        self.fingerprints = dict(fingerprints or {})
+
+    def add_source(self, path: str) -> None:
+        """Record an edge file as counted, with its size and modification time."""
+        name = os.path.basename(path)
+        if name not in self.sources:
+            self.sources.append(name)
+        self.fingerprints[name] = file_fingerprint(path)
+
+    def is_current(self, path: str) -> bool:
+        """True if the edge file was counted and has not changed since (same size and mtime)."""
+        name = os.path.basename(path)
+        return name in self.sources and self.fingerprints.get(name) == file_fingerprint(path)
+
+    def _codes(self, values) -> np.ndarray:
+        codes = encode_areas(pd.Series(values, dtype=object).fillna("").to_numpy(), self.areas)
+        return np.where(codes == UNKNOWN_CODE, len(self.areas), codes).astype(np.int64)
+
+    def _add_years(self, years: np.ndarray) -> None:
+        """Insert empty slices for years not seen before, keeping self.years sorted."""
+        merged = np.union1d(self.years, years)
+        if len(merged) == len(self.years):
+            return
+        counts = np.zeros((len(merged) + 1,) + self.counts.shape[1:], dtype=np.int64)
+        counts[0] = self.counts[0]
+        counts[np.searchsorted(merged, self.years) + 1] = self.counts[1:]
+        self.years, self.counts = merged, counts
+
+    def update(self, origin_sub_area, target_sub_area, years=None) -> None:
+        """
+        Add a block of edges.
+
+        Args:
+            origin_sub_area, target_sub_area: Parallel sequences of sub-area names
+                (empty, missing or unlisted values count as "unknown").
+            years: Optional parallel sequence of citing publication years (NaN when unknown).
+        """
+        origin = self._codes(origin_sub_area)
+        target = self._codes(target_sub_area)
+        slots = np.zeros(len(origin), dtype=np.int64)
+        if years is not None:
+            years = np.asarray(pd.to_numeric(pd.Series(years), errors="coerce"), dtype=np.float64)
+            known = ~np.isnan(years)
+            known_years = years[known].astype(np.int64)
+            self._add_years(np.unique(known_years))
+            slots[known] = np.searchsorted(self.years, known_years) + 1
+        size = len(self.labels)
+        flat = (slots * size + origin) * size + target
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape)
+
+    def update_frame(self, edges: pd.DataFrame, years: pd.Series = None) -> None:
+        """Add an edge DataFrame; years (DOI -> year) dates each edge by its origin DOI."""
+        self.update(
+            edges["origin_sub_area"],
+            edges["target_sub_area"],
+            lookup_years(edges["origin_doi"], years) if years is not None else None,
+        )
+
+    def add_file(self, path: str, years: pd.Series = None, chunksize: int = 500_000) -> bool:
+        """
+        Stream an edge list (CSV or Parquet) into the matrix.
+
+        Returns False (and adds nothing) if a file with the same name was already added.
+        """
+        name = os.path.basename(path)
+        if name in self.sources:
+            return False
+        columns = ["origin_doi", "origin_sub_area", "target_sub_area"]
+        if is_parquet(path):
+            blocks = (
+                batch.to_pandas()
+                for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns)
+            )
+        else:
+            blocks = pd.read_csv(
+                path, usecols=columns, dtype=str, keep_default_na=False, chunksize=chunksize
+            )
+        for block in blocks:
+            if years is not None:
+                block["origin_doi"], _ = canonicalize_series(block["origin_doi"], keep_invalid=True)
+            self.update_frame(block, years)
+        self.add_source(path)
+        return True
+
+    def matrix(self, start: int = None, end: int = None) -> np.ndarray:
+        """
+        Return the (n, n) counts summed over years.
+
+        With no bounds every edge is counted (including those with an unknown year);
+        with a start and/or end year only edges dated within [start, end] are counted.
+        """
+        if start is None and end is None:
+            return self.counts.sum(axis=0)
+        low = 0 if start is None else np.searchsorted(self.years, start, side="left")
+        high = len(self.years) if end is None else np.searchsorted(self.years, end, side="right")
+        return self.counts[low + 1 : high + 1].sum(axis=0)
+
+    def to_frame(
+        self,
+        start: int = None,
+        end: int = None,
+        include_unknown: bool = False,
+        zero_diagonal: bool = False,
+        drop_empty: bool = True,
+    ) -> pd.DataFrame:
+        """
+        Return the matrix as a DataFrame (rows: citing sub-area, columns: cited sub-area).
+
+        By default, as in the notebook's create_citation_matrix, the "unknown" area is
+        left out and areas without any citation in either direction are dropped.
+        """
+        counts = self.matrix(start, end)
+        keep = np.ones(len(self.labels), dtype=bool)
+        if not include_unknown:
+            keep[-1] = False
+        if drop_empty:
+            keep &= (counts.sum(axis=0) + counts.sum(axis=1)) > 0
+        counts = counts[np.ix_(keep, keep)].copy()
+        if zero_diagonal:
+            np.fill_diagonal(counts, 0)
+        labels = [label for label, kept in zip(self.labels, keep) if kept]
+        return pd.DataFrame(
+            counts,
+            index=pd.Index(labels, name="origin_sub_area"),
+            columns=pd.Index(labels, name="target_sub_area"),
+        )
+
+    def weighted_graph(
+        self, start: int = None, end: int = None, include_unknown: bool = False
+    ) -> "nx.DiGraph":
+        """Directed area graph with an edge (weight = citation count) for every non-zero cell."""
+        # Imported here so that the harvesting scripts do not load networkx.
+        import networkx as nx
+
+        frame = self.to_frame(start, end, include_unknown)
+        counts = frame.to_numpy()
+        graph = nx.DiGraph()
+        graph.add_nodes_from(frame.index)
+        rows, cols = np.nonzero(counts)
+        graph.add_weighted_edges_from(
+            zip(frame.index[rows], frame.columns[cols], counts[rows, cols].tolist())
+        )
+        return graph
+
+    def save(self, path: str) -> None:
+        """Save the matrix as an .npz archive (written to a temporary file, then renamed)."""
+        meta = json.dumps(
+            {"areas": self.areas, "sources": self.sources, "fingerprints": self.fingerprints}
+        )
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(
+                f,
+                counts=self.counts,
+                years=self.years,
+                meta=np.frombuffer(meta.encode("utf-8"), dtype=np.uint8),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as archive:
+            meta = json.loads(archive["meta"].tobytes().decode("utf-8"))
+            return cls(
+                meta["areas"],
+                archive["years"],
+                archive["counts"],
+                meta["sources"],
+                meta.get("fingerprints"),
+            )
+
+
+def load_matrix(edge_file: str, years: pd.Series = None) -> CitationMatrix:
+    """
+    Return the citation matrix of an edge list, from the file kept next to it when that
+    matrix was built from the current edge list; otherwise rebuild and save it.
+
+    An edge list rewritten by another tool (e.g. merge_sources.py or
+    convert_to_parquet.py) has a new size or mtime, so its stale matrix is not reused.
+    """
+    path = matrix_path(edge_file)
+    if os.path.exists(path):
+        matrix = CitationMatrix.load(path)
+        if len(matrix.sources) == 1 and matrix.is_current(edge_file):
+            return matrix
+    matrix = CitationMatrix()
+    matrix.add_file(edge_file, years)
+    matrix.save(path)
+    return matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the sub-area citation matrix of edge lists.")
+    parser.add_argument("edges", nargs="+", help="Edge lists (.csv or .parquet) to add.")
+    parser.add_argument(
+        "--years",
+        default=None,
+        help=f"Publication years CSV (doi,year), e.g. the {YEARS_FILE} written by the extractor.",
+    )
+    parser.add_argument(
+        "--output", default=None, help="Matrix file (default: next to the first edge list)."
+    )
+    parser.add_argument(
+        "--append",
+        action="store_true",
+        help="Add to an existing matrix file instead of starting over (files already added are skipped).",
+    )
+    parser.add_argument("--from-year", type=int, default=None, help="First year of the printed matrix.")
+    parser.add_argument("--to-year", type=int, default=None, help="Last year of the printed matrix.")
+    args = parser.parse_args()
+
+    output = args.output or matrix_path(args.edges[0])
+    years = load_publication_years(args.years) if args.years else None
+    matrix = (
+        CitationMatrix.load(output) if args.append and os.path.exists(output) else CitationMatrix()
+    )
+    for path in args.edges:
+        if matrix.add_file(path, years):
+            print(f"[INFO] Added '{path}'")
+        else:
+            print(f"[INFO] Skipping '{path}' (already in the matrix)")
+    matrix.save(output)
+    print(f"[COMPLETE] Citation matrix saved to '{output}' ({int(matrix.counts.sum())} edge(s)).")
+    print(matrix.to_frame(args.from_year, args.to_year).to_string())
+
+
+if __name__ == "__main__":
+    main()
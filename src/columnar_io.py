@@ -0,0 +1,150 @@
+"""
+Columnar (Parquet/Arrow) storage for edge lists and OpenAlex records.
+
+Every stage of the pipeline can read and write either CSV or Parquet; the format is
+chosen by the file extension (".parquet" for Parquet, anything else for CSV).
+
+In the Parquet files:
+    - DOIs are dictionary-encoded strings
+    - sub-areas are categoricals (dictionary-encoded, restored as pandas categoricals)
+    - OpenAlex "referenced_works" and "cited_by" are native list<string> columns,
+      instead of Python list reprs that must be ast.literal_eval'd row by row
+    - edge rows are sorted by origin sub-area and written in row groups, so the
+      row-group min/max statistics let a single area be read without scanning the file
+"""
+
+import ast
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+EDGE_COLUMNS = ["origin_doi", "target_doi", "origin_sub_area", "target_sub_area"]
+ROW_GROUP_SIZE = 100_000
+
+_DICT_STRING = pa.dictionary(pa.int32(), pa.string())
+
+EDGE_SCHEMA = pa.schema([(name, _DICT_STRING) for name in EDGE_COLUMNS])
+
+OPENALEX_SCHEMA = pa.schema(
+    [
+        ("id", pa.string()),
+        ("doi", pa.string()),
+        ("title", pa.string()),
+        ("subfield_display_name", _DICT_STRING),
+        ("referenced_works_count", pa.int64()),
+        ("referenced_works", pa.list_(pa.string())),
+        ("cited_by", pa.list_(pa.string())),
+    ]
+)
+
+_LIST_COLUMNS = ["referenced_works", "cited_by"]
+
+
+def is_parquet(path: str) -> bool:
+    return str(path).endswith(".parquet")
+
+
+def edges_to_table(df: pd.DataFrame, sort: bool = True) -> pa.Table:
+    """Convert an edge DataFrame to an Arrow table with dictionary-encoded columns."""
+    df = df[EDGE_COLUMNS].fillna("").astype(str)
+    if sort:
+        df = df.sort_values(["origin_sub_area", "target_sub_area"], kind="stable")
+    return pa.Table.from_pandas(df, schema=EDGE_SCHEMA, preserve_index=False)
+
+
+def write_edge_list(df: pd.DataFrame, path: str) -> None:
+    """Write an edge DataFrame to CSV or Parquet (by extension)."""
+    if is_parquet(path):
+        pq.write_table(
+            edges_to_table(df), path, row_group_size=ROW_GROUP_SIZE, write_statistics=True
+        )
+    else:
+        df.to_csv(path, index=False)
+
+
+def read_edge_list(path: str, area: str = None, columns: list = None) -> pd.DataFrame:
+    """
+    Read an edge list from CSV or Parquet.
+
+    Missing sub-areas are returned as empty strings, and sub-area columns are categoricals.
+    If `area` is given, only edges with that origin or target sub-area are returned; for
+    Parquet files, row groups whose statistics exclude the area are skipped entirely.
+    """
+    if is_parquet(path):
+        filters = None
+        if area is not None:
+            filters = [[("origin_sub_area", "=", area)], [("target_sub_area", "=", area)]]
+        df = pq.read_table(path, columns=columns, filters=filters).to_pandas()
+        for name in ("origin_doi", "target_doi"):
+            if name in df:
+                df[name] = df[name].astype(str)
+        return df
+
+    df = pd.read_csv(path, dtype=str, keep_default_na=False, usecols=columns)
+    for name in ("origin_sub_area", "target_sub_area"):
+        if name in df:
+            df[name] = df[name].astype("category")
+    if area is not None:
+        df = df[(df["origin_sub_area"] == area) | (df["target_sub_area"] == area)]
+    return df
+
+
+def csv_to_parquet(csv_path: str, parquet_path: str, chunksize: int = 1_000_000) -> int:
+    """
+    Convert an edge list CSV to Parquet without loading it all at once.
+
+    Each CSV block is sorted by sub-area and written as its own row groups. Returns the
+    number of rows written.
+    """
+    rows = 0
+    with pq.ParquetWriter(parquet_path, EDGE_SCHEMA, write_statistics=True) as writer:
+        for block in pd.read_csv(
+            csv_path, dtype=str, keep_default_na=False, chunksize=chunksize
+        ):
+            writer.write_table(edges_to_table(block), row_group_size=ROW_GROUP_SIZE)
+            rows += len(block)
+    return rows
+
+
+def parquet_to_csv(parquet_path: str, csv_path: str, batch_size: int = 1_000_000) -> int:
+    """Convert a Parquet edge list back to CSV, one record batch at a time; return the row count."""
+    rows = 0
+    for batch in pq.ParquetFile(parquet_path).iter_batches(batch_size=batch_size):
+        block = batch.to_pandas()
+        block.to_csv(csv_path, mode="w" if rows == 0 else "a", header=rows == 0, index=False)
+        rows += len(block)
+    if rows == 0:
+        pd.DataFrame(columns=EDGE_COLUMNS).to_csv(csv_path, index=False)
+    return rows
+
+
+def write_openalex(df: pd.DataFrame, path: str) -> None:
+    """Write parsed OpenAlex records (as built by parse_results) to CSV or Parquet."""
+    if is_parquet(path):
+        pq.write_table(
+            pa.Table.from_pandas(
+                df[OPENALEX_SCHEMA.names], schema=OPENALEX_SCHEMA, preserve_index=False
+            ),
+            path,
+        )
+    else:
+        df.to_csv(path, index=False)
+
+
+def read_openalex(path: str) -> pd.DataFrame:
+    """
+    Read OpenAlex records from CSV or Parquet.
+
+    Either way, "referenced_works" and "cited_by" come back as Python lists. For CSV
+    files they are decoded from their list reprs.
+    """
+    if is_parquet(path):
+        df = pq.read_table(path).to_pandas()
+        for name in _LIST_COLUMNS:
+            df[name] = df[name].map(list)
+        return df
+    df = pd.read_csv(path, dtype={"id": str, "doi": str, "title": str}, keep_default_na=False)
+    for name in _LIST_COLUMNS:
+        df[name] = df[name].map(ast.literal_eval)
+    return df
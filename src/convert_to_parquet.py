@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Convert the CSV files in data/ to Parquet and report file sizes and load times.
+
+Edge lists (any CSV with origin_doi/target_doi columns) are converted with
+columnar_io.csv_to_parquet; openalex_data.csv is converted with its reference lists
+decoded into native list columns. For each file the script prints the CSV and Parquet
+sizes and the time needed to load each one into pandas, plus the time to load a
+single sub-area from the Parquet edge lists.
+
+Usage:
+    python convert_to_parquet.py [data_dir] [--area ai]
+"""
+
+import argparse
+import glob
+import os
+import time
+
+import pandas as pd
+
+from columnar_io import csv_to_parquet, read_edge_list, read_openalex, write_openalex
+
+
+def timed(func, *args, **kwargs):
+    """Return (result, seconds) for one call of func."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def convert(csv_path: str, area: str) -> dict:
+    """Convert one CSV file and measure it; returns a dictionary of measurements."""
+    parquet_path = csv_path.removesuffix(".csv") + ".parquet"
+    header = pd.read_csv(csv_path, nrows=0).columns
+    if "origin_doi" in header:
+        csv_to_parquet(csv_path, parquet_path)
+        _, csv_seconds = timed(read_edge_list, csv_path)
+        _, parquet_seconds = timed(read_edge_list, parquet_path)
+        area_frame, area_seconds = timed(read_edge_list, parquet_path, area=area)
+        area_result = (len(area_frame), area_seconds)
+    elif "referenced_works" in header:
+        df, csv_seconds = timed(read_openalex, csv_path)
+        write_openalex(df, parquet_path)
+        _, parquet_seconds = timed(read_openalex, parquet_path)
+        area_result = None
+    else:
+        return None
+    return {
+        "file": os.path.basename(csv_path),
+        "csv_bytes": os.path.getsize(csv_path),
+        "parquet_bytes": os.path.getsize(parquet_path),
+        "csv_load_s": csv_seconds,
+        "parquet_load_s": parquet_seconds,
+        "area": area_result,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert data/ CSV files to Parquet.")
+    parser.add_argument("data_dir", nargs="?", default="../data", help="Directory with CSV files.")
+    parser.add_argument(
+        "--area", default="ai", help="Sub-area used to time a filtered Parquet read."
+    )
+    args = parser.parse_args()
+
+    for csv_path in sorted(glob.glob(os.path.join(args.data_dir, "*.csv"))):
+        result = convert(csv_path, args.area)
+        if result is None:
+            print(f"[INFO] Skipping {csv_path}: not an edge list or OpenAlex export")
+            continue
+        print(
+            f"[COMPLETE] {result['file']}: "
+            f"{result['csv_bytes'] / 1024:.1f} KB CSV -> {result['parquet_bytes'] / 1024:.1f} KB Parquet "
+            f"({result['parquet_bytes'] / result['csv_bytes']:.0%}); "
+            f"load {result['csv_load_s'] * 1000:.1f} ms CSV vs {result['parquet_load_s'] * 1000:.1f} ms Parquet"
+        )
+        if result["area"] is not None:
+            rows, seconds = result["area"]
+            print(f"           sub-area '{args.area}': {rows} edge(s) read in {seconds * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+CSIndex sub-areas and the default edge list file.
+
+Shared by the harvesting scripts and the graph tools. The module has no imports, so
+the area list can be used without loading networkx or the graph export modules.
+"""
+
+# Edge list read by the graph tools by default.
+INPUT_FILE = "../data/open_citations_edge_list.csv"
+
+# CSIndex sub-areas; a separate graph is generated for each of them.
+AREAS = [
+    "ai",
+    "arch",
+    "bio",
+    "chi",
+    "cse",
+    "data",
+    "dbis",
+    "ds",
+    "formal",
+    "graphics",
+    "hardware",
+    "ir",
+    "net",
+    "or",
+    "pl",
+    "robotics",
+    "se",
+    "security",
+    "theory",
+    "vision",
+]
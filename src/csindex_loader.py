@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+CSIndex area loader with a local mirror.
+
+The extractor and the exploratory notebook both read the 20 CSIndex
+<area>-out-papers.csv files (no header; publication year in column 0, DOI in column 5).
+CSIndexLoader downloads them once into a mirror directory and afterwards only
+revalidates them with conditional GETs (If-None-Match / If-Modified-Since), so an
+unchanged file costs a 304 response. Areas are fetched and parsed concurrently, only
+the two needed columns are parsed (with explicit types, by the Arrow CSV reader), and
+the result is one typed table:
+
+    sub_area   categorical (the requested areas, in order)
+    year       Int16
+    doi        canonical DOI (see doi_utils), None when missing or invalid
+
+Every row of the files is kept, so per-year publication counts match the raw files.
+The base URL may also be a local directory, in which case the files are read in place.
+
+Usage:
+    python csindex_loader.py [--base URL_OR_DIR] [--mirror DIR] [--workers 8] [--offline]
+"""
+
+import argparse
+import concurrent.futures
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import requests
+from requests.adapters import HTTPAdapter
+
+from citation_matrix import build_publication_years
+from csindex_areas import AREAS
+from doi_utils import BatchStats, canonicalize_array
+
+CSINDEX_BASE_URL = "https://raw.githubusercontent.com/aserg-ufmg/CSIndex/refs/heads/master/data/"
+DEFAULT_MIRROR_DIR = "../cache/csindex"
+
+YEAR_COLUMN = 0
+DOI_COLUMN = 5
+
+_READ_OPTIONS = pacsv.ReadOptions(autogenerate_column_names=True)
+# Titles are quoted and may contain line breaks.
+_PARSE_OPTIONS = pacsv.ParseOptions(newlines_in_values=True)
+_CONVERT_OPTIONS = pacsv.ConvertOptions(
+    include_columns=[f"f{YEAR_COLUMN}", f"f{DOI_COLUMN}"],
+    column_types={f"f{YEAR_COLUMN}": pa.int16(), f"f{DOI_COLUMN}": pa.string()},
+    null_values=["", "null", "NULL"],
+    strings_can_be_null=True,
+)
+
+
+def area_file(area: str) -> str:
+    return f"{area}-out-papers.csv"
+
+
+def is_remote(base_url: str) -> bool:
+    return base_url.startswith(("http://", "https://"))
+
+
+def empty_area_frame() -> pd.DataFrame:
+    """Typed frame of an area without rows (see read_area_file)."""
+    return pd.DataFrame({"year": pd.array([], dtype="Int16"), "doi": pd.Series([], dtype=object)})
+
+
+def read_area_file(path: str) -> tuple:
+    """
+    Parse the year and DOI columns of one CSIndex file.
+
+    Returns:
+        tuple: (DataFrame with "year" (Int16) and canonical "doi" columns, BatchStats).
+    """
+    if os.path.getsize(path) == 0:
+        return empty_area_frame(), BatchStats()
+    table = pacsv.read_csv(
+        path,
+        read_options=_READ_OPTIONS,
+        parse_options=_PARSE_OPTIONS,
+        convert_options=_CONVERT_OPTIONS,
+    )
+    doi, stats = canonicalize_array(table.column(f"f{DOI_COLUMN}"))
+    frame = pd.DataFrame(
+        {
+            "year": table.column(f"f{YEAR_COLUMN}").to_pandas().astype("Int16"),
+            "doi": pd.Series(doi.to_pandas(), dtype=object),
+        }
+    )
+    return frame, stats
+
+
+class CSIndexLoader:
+    """Mirror and parse the CSIndex area files."""
+
+    def __init__(
+        self,
+        base_url: str = CSINDEX_BASE_URL,
+        mirror_dir: str = DEFAULT_MIRROR_DIR,
+        max_workers: int = 8,
+        timeout: float = 30,
+        offline: bool = False,
+    ):
+        """
+        Args:
+            base_url (str): URL (or local directory) holding the <area>-out-papers.csv files.
+            mirror_dir (str): Directory for the downloaded files and their validators.
+            max_workers (int): Areas fetched and parsed concurrently.
+            timeout (float): Per-request timeout in seconds.
+            offline (bool): Use the mirrored files without contacting the server.
+        """
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.mirror_dir = mirror_dir
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.offline = offline
+        # Per-area outcome of the last fetch ("local", "downloaded", "not_modified",
+        # "mirror", "stale" or "failed"), DOI statistics of the last parse and the
+        # error of each failed area.
+        self.status = {}
+        self.stats = {}
+        self.errors = {}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def fetch(self, area: str) -> str:
+        """
+        Return a local path to the area file, downloading or revalidating it if needed.
+
+        A mirrored copy is used (status "stale") when the server cannot be reached.
+
+        Raises:
+            FileNotFoundError: If a local or offline file is missing.
+            requests.RequestException: If the download fails and there is no mirrored copy.
+        """
+        path, self.status[area] = self.fetch_file(area_file(area))
+        return path
+
+    def fetch_file(self, name: str) -> tuple:
+        """
+        Mirror any file of the CSIndex data directory (see fetch).
+
+        Returns:
+            tuple: (local path, status).
+        """
+        if not is_remote(self.base_url):
+            path = os.path.join(self.base_url, name)
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+            return path, "local"
+
+        path = os.path.join(self.mirror_dir, name)
+        meta_path = path + ".meta.json"
+        mirrored = os.path.exists(path)
+        if self.offline:
+            if not mirrored:
+                raise FileNotFoundError(f"Offline mode: {path} is not mirrored")
+            return path, "mirror"
+
+        headers = {}
+        if mirrored and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        try:
+            response = self.session.get(self.base_url + name, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and mirrored:
+                return path, "not_modified"
+            response.raise_for_status()
+        except requests.RequestException:
+            if mirrored:
+                return path, "stale"
+            raise
+
+        os.makedirs(self.mirror_dir, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(response.content)
+        os.replace(tmp_path, path)
+        meta = {
+            "url": self.base_url + name,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+        return path, "downloaded"
+
+    def read(self, area: str) -> pd.DataFrame:
+        """
+        Fetch and parse one area (see read_area_file); its DOI stats go to self.stats.
+
+        An area that cannot be fetched (and has no mirrored copy) gets status "failed",
+        its error in self.errors and an empty frame, so the other areas still load.
+        """
+        try:
+            path = self.fetch(area)
+        except (requests.RequestException, FileNotFoundError) as e:
+            self.status[area] = "failed"
+            self.errors[area] = str(e)
+            self.stats[area] = BatchStats()
+            return empty_area_frame()
+        self.errors.pop(area, None)
+        frame, self.stats[area] = read_area_file(path)
+        return frame
+
+    def sync(self, areas: list = AREAS) -> dict:
+        """Fetch (or revalidate) the files of all areas concurrently; return area -> status."""
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(self.fetch, areas))
+        return {area: self.status[area] for area in areas}
+
+    def load(self, areas: list = AREAS) -> pd.DataFrame:
+        """
+        Return the publication table of the given areas (see the module docstring).
+
+        Areas are fetched and parsed concurrently; rows keep the file order, area by area.
+        Areas that fail to download contribute no rows (see read).
+        """
+        areas = list(areas)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            frames = list(executor.map(self.read, areas))
+        sizes = [len(frame) for frame in frames]
+        table = pd.concat(frames, ignore_index=True)
+        table.insert(
+            0,
+            "sub_area",
+            pd.Categorical.from_codes(np.repeat(np.arange(len(areas)), sizes), categories=areas),
+        )
+        return table
+
+
+def publication_pairs(table: pd.DataFrame) -> list:
+    """Unique (doi, sub_area) pairs of the publications with a valid DOI, in table order."""
+    valid = table[table["doi"].notna()].drop_duplicates(["doi", "sub_area"])
+    return list(zip(valid["doi"], valid["sub_area"].astype(str)))
+
+
+def publication_years(table: pd.DataFrame) -> pd.Series:
+    """DOI -> publication year Series (see citation_matrix.build_publication_years)."""
+    valid = table[table["doi"].notna()]
+    return build_publication_years(list(zip(valid["doi"], valid["year"])))
+
+
+def publications_by_year(table: pd.DataFrame) -> pd.DataFrame:
+    """Number of publications (all rows, with or without a DOI) per sub-area and year."""
+    counts = (
+        table.groupby(["sub_area", "year"], observed=True, sort=False)
+        .size()
+        .reset_index(name="num_publications")
+    )
+    return counts.astype({"sub_area": str})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mirror the CSIndex area files and summarize them.")
+    parser.add_argument("--base", default=CSINDEX_BASE_URL, help="Base URL (or directory) of the files.")
+    parser.add_argument("--mirror", default=DEFAULT_MIRROR_DIR, help="Mirror directory.")
+    parser.add_argument("--workers", type=int, default=8, help="Areas fetched concurrently.")
+    parser.add_argument("--offline", action="store_true", help="Only use the mirrored files.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    loader = CSIndexLoader(args.base, args.mirror, args.workers, offline=args.offline)
+    table = loader.load(AREAS)
+    for area in AREAS:
+        print(f"[INFO] Sub-area '{area}' ({loader.status[area]}): {loader.stats[area]}")
+        if area in loader.errors:
+            print(f"[ERROR] Sub-area '{area}' could not be loaded: {loader.errors[area]}")
+    print(
+        f"[COMPLETE] {len(table)} publication(s), {table['doi'].nunique()} unique DOI(s) "
+        f"loaded in {time.perf_counter() - start:.2f}s."
+    )
+
+
+if __name__ == "__main__":
+    main()
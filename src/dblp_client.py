@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+DBLP publication client for the CSIndexBR researchers.
+
+Extracted from data_collection_csindexbr.ipynb. For every DBLP person id (PID) in
+CSIndex's all-researchers.csv, the person's dblp.org/pid/<pid>.xml is downloaded once
+into a per-PID cache file (streamed to disk, never held in memory as a whole) and
+parsed with iterparse: every <r> record is dropped as soon as it has been read, so
+memory does not grow with an author's publication count. Venues are matched to
+CSIndex sub-areas through a VenueIndex built once from the CSIndex venue files.
+
+PIDs are fetched concurrently over a pooled session that shares one rate limiter and
+the retry/circuit-breaker policy of the other harvesters. The publications of each PID
+are appended to the output CSV as soon as it completes and the finished PIDs are
+recorded next to it (<output>.done), so an interrupted run resumes where it stopped.
+
+Usage:
+    python dblp_client.py [--output dblp_publications.csv] [--workers 4] [--rate 1]
+        [--csindex-base URL_OR_DIR] [--dblp-base URL_OR_DIR] [--xml-cache DIR] [--limit N]
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import os
+import re
+import unicodedata
+import xml.etree.ElementTree as ET
+from functools import lru_cache, partial
+from time import perf_counter
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from csindex_areas import AREAS
+from csindex_loader import CSINDEX_BASE_URL, DEFAULT_MIRROR_DIR, CSIndexLoader, is_remote
+from doi_utils import canonicalize_doi
+from pipeline_metrics import LOG_LEVELS, PipelineMetrics, get_logger, set_log_level
+from rate_limit import TokenBucket
+from retry_policy import OK, Breakers, Outcome, RequestFailed, RetryPolicy, classify, parse_retry_after
+
+DBLP_BASE_URL = "https://dblp.org/pid/"
+RESEARCHERS_FILE = "all-researchers.csv"
+DEFAULT_XML_CACHE_DIR = "../cache/dblp"
+DEFAULT_OUTPUT = "dblp_publications.csv"
+
+# CSIndex venue files per area (<area>-<kind>.csv); the venue name is in column 0.
+VENUE_FILE_KINDS = ["confs", "out-confs", "out-journals"]
+
+PUBLICATION_COLUMNS = ["pid", "key", "doi", "title", "venue", "year", "sub_area"]
+
+CHUNK_SIZE = 1 << 16
+
+log = get_logger("dblp")
+
+_SPACE_RE = re.compile(r"\s+")
+# DBLP appends the part of multi-volume proceedings to the booktitle: "SBRC (1)".
+_VOLUME_RE = re.compile(r"\s*\(\d+\)$")
+
+
+@lru_cache(maxsize=None)
+def normalize_venue(name: str) -> str:
+    """
+    Lookup key of a venue name: Unicode-normalized, casefolded, whitespace collapsed,
+    without a trailing volume number ("(1)") or trailing dots.
+    """
+    name = _SPACE_RE.sub(" ", unicodedata.normalize("NFKC", name)).strip().casefold()
+    return _VOLUME_RE.sub("", name).rstrip(" .")
+
+
+class VenueIndex:
+    """Normalized venue name -> CSIndex sub-areas, built once and shared by all workers."""
+
+    def __init__(self, venues: dict):
+        """
+        Args:
+            venues (dict): normalize_venue(name) -> tuple of sub-areas (in area order).
+        """
+        self.venues = venues
+
+    @classmethod
+    def from_csindex(cls, loader: CSIndexLoader, areas: list = AREAS) -> "VenueIndex":
+        """
+        Build the index from the <area>-confs/-out-confs/-out-journals.csv files.
+
+        The files are mirrored (and fetched concurrently) by the loader; a venue listed
+        under several areas maps to all of them. Missing files are logged and skipped.
+        """
+        names = [(area, f"{area}-{kind}.csv") for area in areas for kind in VENUE_FILE_KINDS]
+
+        def fetch(name):
+            try:
+                return loader.fetch_file(name)[0]
+            except (OSError, requests.RequestException) as e:
+                log.warning("Failed to load %s: %s", name, e)
+                return None
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=loader.max_workers) as executor:
+            paths = list(executor.map(fetch, [name for _, name in names]))
+
+        venues = {}
+        for (area, _), path in zip(names, paths):
+            if path is None:
+                continue
+            with open(path, newline="", encoding="utf-8") as f:
+                for row in csv.reader(f):
+                    if row and row[0].strip():
+                        sub_areas = venues.setdefault(normalize_venue(row[0]), [])
+                        if area not in sub_areas:
+                            sub_areas.append(area)
+        return cls({venue: tuple(sub_areas) for venue, sub_areas in venues.items()})
+
+    def __len__(self) -> int:
+        return len(self.venues)
+
+    def sub_areas(self, venue: str) -> tuple:
+        return self.venues.get(normalize_venue(venue), ()) if venue else ()
+
+    def sub_area(self, venue: str):
+        """First sub-area of a venue, or None when it is not a CSIndex venue."""
+        sub_areas = self.sub_areas(venue)
+        return sub_areas[0] if sub_areas else None
+
+
+def extract_publication(record: ET.Element, venue_index: VenueIndex):
+    """
+    Return the fields of one DBLP record (<article>, <inproceedings>, ...), or None
+    when it has no DOI or no venue.
+    """
+    venue_node = record.find("journal")
+    if venue_node is None:
+        venue_node = record.find("booktitle")
+    venue = venue_node.text if venue_node is not None else None
+
+    doi = None
+    for ee in record.iterfind("ee"):
+        if ee.text and "doi.org" in ee.text:
+            doi = canonicalize_doi(ee.text)
+            if doi:
+                break
+    if not doi or not venue:
+        return None
+
+    title_node = record.find("title")
+    year = record.findtext("year")
+    return {
+        "key": record.get("key"),
+        "doi": doi,
+        # Titles may contain markup (<i>, <sub>, ...).
+        "title": "".join(title_node.itertext()) if title_node is not None else None,
+        "venue": venue,
+        "year": int(year) if year and year.isdigit() else None,
+        "sub_area": venue_index.sub_area(venue),
+    }
+
+
+def parse_publications(source, pid: str, venue_index: VenueIndex):
+    """
+    Stream the publications of a DBLP person document.
+
+    Args:
+        source: Path or binary file object of a dblp.org/pid/<pid>.xml document.
+        pid (str): PID stored with each publication.
+        venue_index (VenueIndex): Venue -> sub-area lookup.
+
+    Yields:
+        dict: One publication (see PUBLICATION_COLUMNS) per record with a DOI and venue.
+    """
+    root = None
+    depth = 0
+    for event, element in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = element
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1:
+            continue
+        # A child of <dblpperson> (<person>, <r>, <coauthors>, ...) is complete.
+        if element.tag == "r" and len(element):
+            publication = extract_publication(element[0], venue_index)
+            if publication is not None:
+                yield {"pid": pid, **publication}
+        root.clear()
+
+
+class DBLPClient:
+    """Concurrent, cached DBLP person-document client."""
+
+    def __init__(
+        self,
+        venue_index: VenueIndex,
+        base_url: str = DBLP_BASE_URL,
+        cache_dir: str = DEFAULT_XML_CACHE_DIR,
+        max_workers: int = 4,
+        rate: float = 1.0,
+        timeout: float = 60,
+        refresh: bool = False,
+        retry_policy: RetryPolicy = None,
+        metrics: PipelineMetrics = None,
+    ):
+        """
+        Args:
+            venue_index (VenueIndex): Venue -> sub-area lookup.
+            base_url (str): URL (or local directory) holding the <pid>.xml documents.
+            cache_dir (str): Directory of the cached documents (<cache_dir>/<pid>.xml).
+            max_workers (int): PIDs fetched and parsed concurrently.
+            rate (float): Requests per second shared by all workers (<= 0 disables).
+            timeout (float): Per-request timeout in seconds.
+            refresh (bool): Download documents again even if they are cached.
+            retry_policy (RetryPolicy): Retry settings (defaults to RetryPolicy()).
+            metrics (PipelineMetrics): Metrics to record into (defaults to a new one).
+        """
+        self.venue_index = venue_index
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.refresh = refresh
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.metrics = metrics or PipelineMetrics(unit="PID")
+        self.rate_limiter = TokenBucket(rate)
+        self.breakers = Breakers(limiter=self.rate_limiter)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def xml_path(self, pid: str) -> str:
+        return os.path.join(self.cache_dir, f"{pid}.xml")
+
+    def fetch_xml(self, pid: str) -> str:
+        """
+        Return a local path to the PID's document, downloading it if it is not cached.
+
+        Raises:
+            RequestFailed: If the download fails after all retries (kind "not_found"
+                for an unknown PID).
+        """
+        if not is_remote(self.base_url):
+            return os.path.join(self.base_url, f"{pid}.xml")
+        path = self.xml_path(pid)
+        cached = not self.refresh and os.path.exists(path)
+        self.metrics.record_cache("dblp", cached)
+        if cached:
+            return path
+
+        url = f"{self.base_url}{pid}.xml"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+
+        def attempt() -> Outcome:
+            self.rate_limiter.acquire()
+            started = perf_counter()
+            nbytes = 0
+            try:
+                with self.session.get(url, timeout=self.timeout, stream=True) as response:
+                    kind = classify(response.status_code)
+                    if kind == OK:
+                        with open(tmp_path, "wb") as f:
+                            for chunk in response.iter_content(CHUNK_SIZE):
+                                f.write(chunk)
+                                nbytes += len(chunk)
+            except Exception as e:
+                self.metrics.record_request("dblp", "error", perf_counter() - started, nbytes)
+                return Outcome(classify(error=e), message=str(e) or type(e).__name__)
+            self.metrics.record_request("dblp", response.status_code, perf_counter() - started, nbytes)
+            if kind != OK:
+                return Outcome(
+                    kind,
+                    status=response.status_code,
+                    retry_after=parse_retry_after(response.headers.get("Retry-After")),
+                    message=f"HTTP {response.status_code}",
+                )
+            return Outcome(OK, status=response.status_code)
+
+        outcome = self.retry_policy.run(attempt, self.breakers.get(url), partial(self._on_retry, pid))
+        if outcome.kind != OK:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise RequestFailed(outcome, url)
+        os.replace(tmp_path, path)
+        return path
+
+    def _on_retry(self, pid: str, outcome: Outcome, attempt: int, delay: float) -> None:
+        self.metrics.record_retry("dblp")
+        log.debug("Retrying PID %s (%s, attempt %d) in %.1fs", pid, outcome.kind, attempt, delay)
+
+    def get_publications(self, pid: str) -> list:
+        """Fetch (or read from the cache) and parse the publications of one PID."""
+        try:
+            publications = list(parse_publications(self.fetch_xml(pid), pid, self.venue_index))
+        except ET.ParseError:
+            # A truncated or corrupt cached document: download it once more.
+            if not is_remote(self.base_url):
+                raise
+            os.remove(self.xml_path(pid))
+            publications = list(parse_publications(self.fetch_xml(pid), pid, self.venue_index))
+        log.debug("Processed %d publication(s) of PID %s", len(publications), pid)
+        return publications
+
+    def iter_publications(self, pids: list):
+        """
+        Fetch the publications of many PIDs concurrently.
+
+        Yields:
+            tuple: (pid, list of publications, error), in completion order; `error` is
+                None on success, otherwise the list is empty and `error` is the
+                exception (RequestFailed, ET.ParseError or OSError).
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.get_publications, pid): pid for pid in pids}
+            for future in concurrent.futures.as_completed(futures):
+                pid = futures[future]
+                try:
+                    publications = future.result()
+                except (RequestFailed, ET.ParseError, OSError) as e:
+                    self.metrics.record_item(failed=True)
+                    yield pid, [], e
+                    continue
+                self.metrics.record_item(edges=len(publications))
+                yield pid, publications, None
+
+
+class PublicationWriter:
+    """Resumable CSV output: publications are appended per PID, finished PIDs recorded."""
+
+    def __init__(self, path: str = DEFAULT_OUTPUT):
+        self.path = path
+        self.done_path = path + ".done"
+        self.done = set()
+        if os.path.exists(self.done_path):
+            with open(self.done_path, encoding="utf-8") as f:
+                self.done = {line.strip() for line in f if line.strip()}
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            self._drop_unfinished()
+        else:
+            with open(self.path, "w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerow(PUBLICATION_COLUMNS)
+
+    def _drop_unfinished(self) -> None:
+        """Remove the rows of a PID interrupted while it was being written."""
+        existing = pd.read_csv(self.path, dtype=str, keep_default_na=False)
+        finished = existing["pid"].isin(self.done)
+        if not finished.all():
+            log.info("Dropping %d row(s) of unfinished PIDs from %s", (~finished).sum(), self.path)
+            existing[finished].to_csv(self.path, index=False)
+
+    def write(self, pid: str, publications: list) -> None:
+        with open(self.path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, PUBLICATION_COLUMNS)
+            writer.writerows(publications)
+        with open(self.done_path, "a", encoding="utf-8") as f:
+            f.write(pid + "\n")
+        self.done.add(pid)
+
+
+def load_researchers(loader: CSIndexLoader) -> pd.DataFrame:
+    """Return CSIndex's all-researchers.csv (researcher, institution, pid), mirrored by the loader."""
+    path, _ = loader.fetch_file(RESEARCHERS_FILE)
+    researchers = pd.read_csv(path, names=["researcher", "institution", "pid"], dtype=str)
+    return researchers.dropna(subset=["pid"])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fetch the DBLP publications of the CSIndex researchers and assign sub-areas."
+    )
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Output CSV (resumed if it exists).")
+    parser.add_argument(
+        "--csindex-base", default=CSINDEX_BASE_URL, help="Base URL (or directory) of the CSIndex files."
+    )
+    parser.add_argument("--csindex-mirror", default=DEFAULT_MIRROR_DIR, help="Mirror of the CSIndex files.")
+    parser.add_argument("--dblp-base", default=DBLP_BASE_URL, help="Base URL (or directory) of <pid>.xml.")
+    parser.add_argument("--xml-cache", default=DEFAULT_XML_CACHE_DIR, help="Cache of the DBLP documents.")
+    parser.add_argument("--refresh", action="store_true", help="Download cached documents again.")
+    parser.add_argument("--workers", type=int, default=4, help="PIDs fetched concurrently.")
+    parser.add_argument(
+        "--rate", type=float, default=1.0, help="DBLP requests per second (0 disables the limit)."
+    )
+    parser.add_argument("--max-attempts", type=int, default=4, help="Attempts per document.")
+    parser.add_argument("--limit", type=int, default=None, help="Only process the first N PIDs.")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="info", help="Logging level.")
+    parser.add_argument(
+        "--progress-interval", type=float, default=10, help="Seconds between progress lines (0 disables)."
+    )
+    parser.add_argument("--metrics", default="dblp_metrics.json", help="File the run metrics are written to.")
+    args = parser.parse_args()
+    set_log_level(args.log_level)
+
+    start = perf_counter()
+    loader = CSIndexLoader(args.csindex_base, args.csindex_mirror)
+    venue_index = VenueIndex.from_csindex(loader)
+    log.info("Loaded %d CSIndex venue(s)", len(venue_index))
+
+    pids = list(dict.fromkeys(load_researchers(loader)["pid"]))[: args.limit]
+    writer = PublicationWriter(args.output)
+    todo = [pid for pid in pids if pid not in writer.done]
+    log.info("%d researcher(s), %d already done, %d to fetch", len(pids), len(pids) - len(todo), len(todo))
+
+    metrics = PipelineMetrics(total=len(todo), unit="PID")
+    client = DBLPClient(
+        venue_index,
+        base_url=args.dblp_base,
+        cache_dir=args.xml_cache,
+        max_workers=args.workers,
+        rate=args.rate,
+        refresh=args.refresh,
+        retry_policy=RetryPolicy(max_attempts=args.max_attempts),
+        metrics=metrics,
+    )
+    failed = 0
+    publications = 0
+    try:
+        with metrics.progress(args.progress_interval):
+            for pid, items, error in client.iter_publications(todo):
+                if error is not None and not (
+                    isinstance(error, RequestFailed) and error.outcome.kind == "not_found"
+                ):
+                    # Not marked as done: the next run tries the PID again.
+                    failed += 1
+                    log.error("PID %s failed: %s", pid, error)
+                    continue
+                if error is not None:
+                    log.warning("PID %s not found on DBLP", pid)
+                writer.write(pid, items)
+                publications += len(items)
+    finally:
+        metrics.save(args.metrics)
+
+    print(
+        f"[SUMMARY] {len(todo) - failed} PID(s) processed, {failed} failed (rerun to retry), "
+        f"{publications} publication(s) written to {args.output}"
+    )
+    print(f"[COMPLETE] Finished in {perf_counter() - start:.2f}s.")
+
+
+if __name__ == "__main__":
+    main()
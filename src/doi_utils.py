@@ -0,0 +1,135 @@
+"""
+DOI canonicalization shared by the extractors, the graph builder and the checker.
+
+A canonical DOI is the bare "10.<registrant>/<suffix>" form:
+
+    - surrounding whitespace removed
+    - "doi:", "https://doi.org/", "http://dx.doi.org/" (etc.) prefixes stripped
+    - percent-encoding decoded ("10.1000%2Fabc" -> "10.1000/abc")
+    - lowercased (DOIs are case-insensitive)
+    - validated against 10.NNNN/suffix
+
+Two paths produce identical results: canonicalize_doi for single values (precompiled
+patterns, memoized) and canonicalize_series / canonicalize_array for whole pandas or
+Arrow string columns, which also return per-batch statistics on rejected values.
+"""
+
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from urllib.parse import unquote
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+PREFIX_PATTERN = r"^(?:(?:https?://)?(?:dx\.)?doi\.org/|doi:\s*)"
+VALID_PATTERN = r"^10\.\d{4,9}/\S+$"
+
+_PREFIX_RE = re.compile(PREFIX_PATTERN, re.IGNORECASE)
+_VALID_RE = re.compile(VALID_PATTERN)
+# Same prefix pattern for Arrow (RE2 syntax, case-insensitive flag inline).
+_ARROW_PREFIX = "(?i)" + PREFIX_PATTERN
+
+SAMPLE_SIZE = 10
+
+
+@dataclass
+class BatchStats:
+    """Statistics for one canonicalization batch."""
+
+    total: int = 0
+    valid: int = 0
+    missing: int = 0
+    invalid: int = 0
+    changed: int = 0
+    rejected_samples: list = field(default_factory=list)
+
+    def __str__(self) -> str:
+        return (
+            f"{self.valid}/{self.total} valid DOI(s), {self.missing} missing, "
+            f"{self.invalid} rejected, {self.changed} normalized"
+        )
+
+
+@lru_cache(maxsize=1_000_000)
+def canonicalize_doi(value: str):
+    """Return the canonical form of a DOI string, or None if it is not a valid DOI."""
+    if value is None:
+        return None
+    doi = _PREFIX_RE.sub("", value.strip(), count=1)
+    if "%" in doi:
+        doi = unquote(doi)
+    doi = doi.strip().lower()
+    return doi if _VALID_RE.match(doi) else None
+
+
+def _normalize_array(values: pa.Array) -> tuple:
+    """Return (stripped, normalized) Arrow string arrays; normalized values are not validated."""
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    stripped = pc.utf8_trim_whitespace(values.cast(pa.string()))
+    doi = pc.replace_substring_regex(stripped, _ARROW_PREFIX, "", max_replacements=1)
+    # Only the (rare) values containing '%' go through the Python decoder.
+    encoded = pc.fill_null(pc.match_substring(doi, "%"), False)
+    if pc.any(encoded).as_py():
+        decoded = [unquote(value) for value in pc.filter(doi, encoded).to_pylist()]
+        doi = pc.replace_with_mask(doi, encoded, pa.array(decoded, type=pa.string()))
+    return stripped, pc.utf8_lower(pc.utf8_trim_whitespace(doi))
+
+
+def canonicalize_array(values: pa.Array, keep_invalid: bool = False) -> tuple:
+    """
+    Canonicalize an Arrow string array with Arrow compute kernels.
+
+    Args:
+        values (pa.Array): Raw DOI strings (nulls allowed).
+        keep_invalid (bool): Return the stripped original for rejected values instead of null.
+
+    Returns:
+        tuple: (canonical pa.StringArray, BatchStats).
+    """
+    stripped, doi = _normalize_array(values)
+    missing = pc.fill_null(pc.equal(stripped, ""), True)
+    valid = pc.fill_null(pc.match_substring_regex(doi, VALID_PATTERN), False)
+    invalid = pc.and_(pc.invert(valid), pc.invert(missing))
+    changed = pc.and_(valid, pc.fill_null(pc.not_equal(doi, stripped), False))
+    stats = BatchStats(
+        total=len(stripped),
+        valid=pc.sum(valid).as_py() or 0,
+        missing=pc.sum(missing).as_py() or 0,
+        invalid=pc.sum(invalid).as_py() or 0,
+        changed=pc.sum(changed).as_py() or 0,
+        rejected_samples=pc.filter(stripped, invalid).slice(0, SAMPLE_SIZE).to_pylist(),
+    )
+    fallback = stripped if keep_invalid else pa.scalar(None, pa.string())
+    return pc.if_else(valid, doi, fallback), stats
+
+
+def canonicalize_series(values: pd.Series, keep_invalid: bool = False) -> tuple:
+    """
+    Canonicalize a pandas string column (through the Arrow kernels of canonicalize_array).
+
+    Args:
+        values (pd.Series): Raw DOI strings (missing values allowed).
+        keep_invalid (bool): Return the stripped original for rejected values instead of None.
+
+    Returns:
+        tuple: (canonical pd.Series of str/None aligned with `values`, BatchStats).
+    """
+    canonical, stats = canonicalize_array(
+        pa.array(values.astype(object), type=pa.string(), from_pandas=True), keep_invalid
+    )
+    return pd.Series(canonical.to_pylist(), index=values.index, dtype=object), stats
+
+
+def canonical_keys(values) -> np.ndarray:
+    """
+    Normalized form used to group identifiers: prefix stripped, URL-decoded and lowercased.
+
+    Unlike canonicalize_series, values are not validated, so malformed identifiers that
+    only differ by case or encoding still share a key.
+    """
+    _, doi = _normalize_array(pa.array(list(values), type=pa.string(), from_pandas=True))
+    return np.array(doi.to_pylist(), dtype=object)
@@ -0,0 +1,172 @@
+"""
+Streaming, checkpointed edge output for the OpenCitations harvester.
+
+Edges are appended to numbered CSV chunk files in an output directory as soon as
+enough of them have been collected, and the (doi, sub_area) pairs whose edges are
+safely on disk are appended to a manifest. After a crash, the harvester can be
+restarted with --resume and only the publications missing from the manifest are
+fetched again.
+
+The final edge list is produced by an external hash-partitioned deduplication pass,
+so memory use stays bounded by the size of one partition rather than the whole
+edge set.
+"""
+
+import csv
+import glob
+import os
+
+import pandas as pd
+
+EDGE_COLUMNS = ["origin_doi", "target_doi", "origin_sub_area", "target_sub_area"]
+MANIFEST_FILE = "completed.tsv"
+CHUNK_PATTERN = "edges-*.csv"
+
+
+class EdgeStore:
+    """Append-only chunked edge writer with a completed-publication manifest."""
+
+    def __init__(self, directory: str, chunk_size: int = 100_000, resume: bool = False):
+        """
+        Args:
+            directory (str): Directory holding the chunk files and the manifest.
+            chunk_size (int): Number of buffered edges that triggers a chunk write.
+            resume (bool): Keep existing chunks and manifest instead of starting over.
+        """
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.manifest_path = os.path.join(directory, MANIFEST_FILE)
+        os.makedirs(directory, exist_ok=True)
+        if not resume:
+            for path in self.chunk_paths():
+                os.remove(path)
+            if os.path.exists(self.manifest_path):
+                os.remove(self.manifest_path)
+        self._next_chunk = len(self.chunk_paths()) + 1
+        self._edges = []
+        self._pending = []
+        self.edge_count = 0
+
+    def chunk_paths(self) -> list:
+        """Return the chunk files written so far, in order."""
+        return sorted(glob.glob(os.path.join(self.directory, CHUNK_PATTERN)))
+
+    def completed(self) -> set:
+        """Return the set of (doi, sub_area) pairs recorded in the manifest."""
+        done = set()
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                for line in f:
+                    doi, _, sub_area = line.rstrip("\n").partition("\t")
+                    if doi:
+                        done.add((doi, sub_area))
+        return done
+
+    def add(self, doi: str, sub_area: str, edges: list) -> None:
+        """Buffer the edges of one completed publication, writing a chunk when the buffer is full."""
+        self._edges.extend(edges)
+        self._pending.append((doi, sub_area))
+        self.edge_count += len(edges)
+        if len(self._edges) >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write buffered edges to a new chunk file, then record their publications as completed.
+
+        The chunk is written to a temporary name and renamed into place, so a crash never
+        leaves a half-written chunk behind. Publications are added to the manifest only
+        after their edges are on disk; a crash in between means they are fetched again
+        on resume and the duplicates are removed by deduplicate().
+        """
+        if self._edges:
+            path = os.path.join(self.directory, f"edges-{self._next_chunk:06d}.csv")
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=EDGE_COLUMNS)
+                writer.writeheader()
+                writer.writerows(self._edges)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            self._next_chunk += 1
+            self._edges = []
+        if self._pending:
+            with open(self.manifest_path, "a", encoding="utf-8") as f:
+                f.writelines(f"{doi}\t{sub_area}\n" for doi, sub_area in self._pending)
+                f.flush()
+                os.fsync(f.fileno())
+            self._pending = []
+
+    def close(self) -> None:
+        self.flush()
+
+
+def deduplicate(
+    chunk_paths: list,
+    output_file: str,
+    partitions: int = 64,
+    read_chunksize: int = 500_000,
+    transform=None,
+    columns: list = EDGE_COLUMNS,
+    on_unique=None,
+) -> tuple:
+    """
+    Merge chunk files into one duplicate-free edge list using an external hash pass.
+
+    Every row is hashed and appended to one of `partitions` temporary files, so all
+    copies of an edge land in the same partition. Each partition is then deduplicated
+    in memory and appended to the output. Peak memory is bounded by the largest
+    partition (plus one read block), not by the total number of edges.
+
+    Args:
+        chunk_paths (list): Chunk CSV files written by EdgeStore.
+        output_file (str): Destination CSV with the EDGE_COLUMNS header.
+        partitions (int): Number of hash partitions.
+        read_chunksize (int): Rows read at a time from each chunk file.
+        transform (callable): Optional function applied to every block before hashing
+            (e.g. sub-area resolution), so rows that become identical are merged.
+        columns (list): Column order of the output file.
+        on_unique (callable): Optional function called with every deduplicated partition
+            as it is written (e.g. to update the citation matrix).
+
+    Returns:
+        tuple: (rows read, unique rows written).
+    """
+    partition_dir = output_file + ".partitions"
+    os.makedirs(partition_dir, exist_ok=True)
+    partition_paths = [
+        os.path.join(partition_dir, f"part-{i:04d}.csv") for i in range(partitions)
+    ]
+    for path in partition_paths:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(",".join(EDGE_COLUMNS) + "\n")
+
+    total = 0
+    for chunk_path in chunk_paths:
+        for block in pd.read_csv(
+            chunk_path, dtype=str, keep_default_na=False, chunksize=read_chunksize
+        ):
+            total += len(block)
+            if transform is not None:
+                block = transform(block)
+            # Partition files use the EDGE_COLUMNS order, whatever the input order.
+            block = block[EDGE_COLUMNS]
+            buckets = pd.util.hash_pandas_object(block, index=False) % partitions
+            for bucket, rows in block.groupby(buckets.to_numpy()):
+                rows.to_csv(
+                    partition_paths[bucket], mode="a", header=False, index=False
+                )
+
+    unique = 0
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write(",".join(columns) + "\n")
+    for path in partition_paths:
+        rows = pd.read_csv(path, dtype=str, keep_default_na=False).drop_duplicates()
+        unique += len(rows)
+        rows[columns].to_csv(output_file, mode="a", header=False, index=False)
+        if on_unique is not None:
+            on_unique(rows)
+        os.remove(path)
+    os.rmdir(partition_dir)
+    return total, unique
@@ -1,82 +1,146 @@
 import time
 import json
 import logging
+import argparse
 import pandas as pd
 from math import ceil
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
 
-# Configure logging to write to debug.log with detailed formatting.
+from columnar_io import read_openalex, write_openalex
+from openalex_client import (
+    WORK_FIELDS,
+    OpenAlexClient,
+    failure_outcome,
+    load_email,
+    parse_results,
+)
+from pipeline_metrics import LOG_LEVELS, PipelineMetrics, set_log_level
+from retry_policy import (
+    OK,
+    DeadLetterQueue,
+    Outcome,
+    RequestFailed,
+    RetryPolicy,
+    classify,
+)
+from response_cache import (
+    DEFAULT_CACHE_PATH,
+    DEFAULT_MAX_MB,
+    DEFAULT_TTL_DAYS,
+    ResponseCache,
+)
+
+# Configure logging to write to debug.log with detailed formatting (level set by --log-level).
 logging.basicConfig(
     filename="debug.log",
-    level=logging.DEBUG,
+    level=logging.INFO,
     format="%(asctime)s - %(levelname)s - %(message)s",
 )
 
-# Set up the Selenium Chrome driver (update the chromedriver path as needed)
-chrome_options = webdriver.ChromeOptions()
-chrome_options.add_argument("--headless")  # run Chrome in headless mode
-service = Service()  # update this path if necessary
-driver = webdriver.Chrome(service=service, options=chrome_options)
+# Works collected by this script: Brazilian papers in computer graphics (2024).
+WORKS_FILTER = (
+    "authorships.countries:countries/br,publication_year:2024,"
+    "primary_topic.field.id:fields/17,primary_topic.subfield.id:subfields/1704"
+)
+WORKS_SORT = "publication_year:desc"
+
+# Selenium Chrome driver, started on first use so cached/offline runs never launch a browser.
+driver = None
+
+# On-disk response cache keyed by ("openalex", url); set in __main__.
+response_cache = None
+
+# Request metrics, shared with the HTTP client so both paths report the same fields.
+metrics = PipelineMetrics(unit="work")
+
+# Backoff for the HTTP requests and Selenium page loads, and the dead-letter file of
+# the works whose cited_by lookup still failed; configured in __main__.
+retry_policy = RetryPolicy()
+dead_letters = None
+
+
+def get_driver():
+    """Return the shared headless Chrome driver, starting it if necessary."""
+    global driver
+    if driver is None:
+        # Selenium is only needed for the --selenium fallback.
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+
+        # Set up the Selenium Chrome driver (update the chromedriver path as needed)
+        chrome_options = webdriver.ChromeOptions()
+        chrome_options.add_argument("--headless")  # run Chrome in headless mode
+        service = Service()  # update this path if necessary
+        driver = webdriver.Chrome(service=service, options=chrome_options)
+    return driver
+
 
 def fetch_api_data_with_selenium(url):
     """
     Fetch data from the API using Selenium with Chrome.
     Navigates to the given URL, waits for the page to load,
     and extracts the JSON from the page's body.
+
+    Responses are served from (and stored in) the response cache when one is configured.
+    In offline mode a cache miss raises a LookupError instead of opening the page.
+    Pages that fail to load or are not JSON are retried as set by retry_policy;
+    RequestFailed is raised once the attempts are exhausted.
     """
+    endpoint = "cites" if "filter=cites:" in url else "works"
+    if response_cache is not None:
+        data = response_cache.get("openalex", url)
+        metrics.record_cache(endpoint, data is not None)
+        if data is not None:
+            logging.debug("Cache hit for URL: %s", url)
+            return data
+        if response_cache.offline:
+            raise LookupError(f"Offline mode: no cached response for {url}")
+
     logging.debug("Fetching API data from URL: %s", url)
-    try:
-        driver.get(url)
-        # Wait for the page to load; adjust the sleep time if necessary.
-        time.sleep(2)
-        body_text = driver.find_element(By.TAG_NAME, "body").text
-        data = json.loads(body_text)
-        logging.debug("Successfully fetched and parsed API data.")
-        return data
-    except Exception as e:
-        logging.exception("Error fetching API data from %s: %s", url, e)
-        raise
 
-def parse_results(json_data):
-    """
-    Parses the JSON data to extract specific fields for each work.
-    Returns a list of dictionaries containing selected fields.
-    """
-    logging.debug("Parsing JSON results.")
-    results = []
-    works = json_data.get("results", []) if isinstance(json_data, dict) else []
-
-    for work in works:
-        # Remove the prefix from the id and doi strings
-        work_id = work.get("id", "").removeprefix("https://openalex.org/")
-        doi = (work.get("doi") or "").removeprefix("https://doi.org/")
-        title = work.get("title", "")
-        primary_topic = work.get("primary_topic", {})
-        subfield = primary_topic.get("subfield", {})
-        subfield_display_name = subfield.get("display_name", "")
-        referenced_works_count = work.get("referenced_works_count", 0)
-        referenced_works = work.get("referenced_works", [])
-        referenced_works = [
-            ref_work.removeprefix("https://openalex.org/")
-            for ref_work in referenced_works
-        ]
-
-        results.append(
-            {
-                "id": work_id,
-                "doi": doi,
-                "title": title,
-                "subfield_display_name": subfield_display_name,
-                "referenced_works_count": referenced_works_count,
-                "referenced_works": referenced_works,
-                # This field will be populated later.
-                "cited_by": []
-            }
+    def attempt() -> Outcome:
+        from selenium.webdriver.common.by import By
+
+        started = time.perf_counter()
+        try:
+            browser = get_driver()
+            browser.get(url)
+            # Wait for the page to load; adjust the sleep time if necessary.
+            time.sleep(2)
+            body_text = browser.find_element(By.TAG_NAME, "body").text
+            data = json.loads(body_text)
+        except ValueError as e:
+            # Not JSON: typically a rate-limit or error page.
+            metrics.record_request(endpoint, "error", time.perf_counter() - started)
+            return Outcome("parse", message=str(e))
+        except Exception as e:
+            # Page load timeouts and driver errors are worth another try.
+            metrics.record_request(endpoint, "error", time.perf_counter() - started)
+            return Outcome("connection", message=str(e))
+        # The browser does not expose the status code; a parsed JSON body counts as a 200.
+        metrics.record_request(
+            endpoint, 200, time.perf_counter() - started, len(body_text.encode("utf-8"))
+        )
+        return Outcome(OK, data, 200)
+
+    def on_retry(outcome, number, delay):
+        metrics.record_retry(endpoint)
+        logging.warning(
+            "Attempt %s for %s failed (%s: %s); retrying in %.1fs",
+            number,
+            url,
+            outcome.kind,
+            outcome.message,
+            delay,
         )
-    logging.debug("Parsed %s records from JSON data.", len(results))
-    return results
+
+    outcome = retry_policy.run(attempt, on_retry=on_retry)
+    if outcome.kind != OK:
+        logging.error("Error fetching API data from %s: %s", url, outcome.message)
+        raise RequestFailed(outcome, url)
+    logging.debug("Successfully fetched and parsed API data.")
+    if response_cache is not None:
+        response_cache.put("openalex", url, outcome.data)
+    return outcome.data
 
 def fetch_all_data(base_url, per_page=10):
     """
@@ -93,6 +157,8 @@ def fetch_all_data(base_url, per_page=10):
     first_page_url = f"{base_url}&page=1&per_page={per_page}"
     first_page_data = fetch_api_data_with_selenium(first_page_url)
     first_page_results = parse_results(first_page_data)
+    for work in first_page_results:
+        metrics.record_item(len(work["referenced_works"]))
     all_results.extend(first_page_results)
 
     # Determine total pages from the meta information
@@ -106,6 +172,8 @@ def fetch_all_data(base_url, per_page=10):
         logging.debug("Fetching page %s: %s", page, page_url)
         page_data = fetch_api_data_with_selenium(page_url)
         page_results = parse_results(page_data)
+        for work in page_results:
+            metrics.record_item(len(work["referenced_works"]))
         logging.debug("Fetched %s records from page %s.", len(page_results), page)
         all_results.extend(page_results)
 
@@ -116,7 +184,9 @@ def fetch_cited_by(work_id):
     """
     Fetches all 'cited_by' publication ids for a given work.
     The API endpoint returns 25 records per page so pagination is handled.
-    Returns a list of citing publication ids.
+    Returns a list of citing publication ids. If a page still fails after the
+    retries, the ids collected so far are returned and the work is recorded in the
+    dead-letter file.
     """
     cited_by_list = []
     per_page = 25
@@ -150,41 +220,238 @@ def fetch_cited_by(work_id):
         return cited_by_list
     except Exception as e:
         logging.exception("Error fetching cited_by data for work %s: %s", work_id, e)
-        return cited_by_list  # Return empty list in case of error
+        # Keep the work for a --replay instead of silently losing its citations.
+        if dead_letters is not None:
+            outcome = (
+                e.outcome
+                if isinstance(e, RequestFailed)
+                else Outcome(classify(error=e), message=str(e))
+            )
+            dead_letters.add("cited_by", work_id, outcome)
+        return cited_by_list  # Return what was collected before the error
+
+def replay_cited_by(path, client=None):
+    """
+    Re-run the dead-lettered cited_by lookups and merge them into the records in `path`.
+
+    Citing works found by the replay are appended to each work's existing cited_by list
+    (without duplicates). Lookups are done through the HTTP client when one is given,
+    otherwise with Selenium; lookups that fail again go to a fresh dead-letter file.
+
+    Returns the merged records, ready to be written back (then call
+    dead_letters.finish_replay()).
+    """
+    df = read_openalex(path)
+    entries = dead_letters.take(["cited_by"])
+    positions = {work_id: i for i, work_id in enumerate(df["id"])}
+    cited_by = df["cited_by"].tolist()
+    recovered = 0
+    for entry in entries:
+        work_id = entry["id"]
+        if work_id not in positions:
+            logging.warning("Dead-lettered work %s is not in %s; skipping it.", work_id, path)
+            continue
+        if client is None:
+            citing = fetch_cited_by(work_id)
+        else:
+            try:
+                citing = client.fetch_cited_by(work_id)
+            except Exception as e:
+                logging.exception("Error fetching cited_by data for work %s: %s", work_id, e)
+                dead_letters.add("cited_by", work_id, failure_outcome(e))
+                continue
+        current = cited_by[positions[work_id]]
+        merged = list(dict.fromkeys(current + citing))
+        recovered += len(merged) - len(current)
+        cited_by[positions[work_id]] = merged
+    df["cited_by"] = cited_by
+    logging.info(
+        "Replayed %s cited_by lookup(s): %s citing work(s) added.", len(entries), recovered
+    )
+    return df.to_dict("records")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Collect Brazilian CS works and their citations from OpenAlex."
+    )
+    parser.add_argument(
+        "--cache",
+        default=DEFAULT_CACHE_PATH,
+        help=f"SQLite response cache file (default: {DEFAULT_CACHE_PATH}).",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Disable the on-disk response cache."
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_TTL_DAYS,
+        help="Days before a cached response is refreshed.",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=DEFAULT_MAX_MB,
+        help="Size budget of the cache; least recently used entries are evicted beyond it.",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Serve responses only from the cache and never start the browser.",
+    )
+    parser.add_argument(
+        "--selenium",
+        action="store_true",
+        help="Scrape the API through headless Chrome instead of the HTTP client (fallback).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Pages fetched concurrently by the HTTP client.",
+    )
+    parser.add_argument(
+        "--output",
+        default="openalex_data.csv",
+        help="Output file; a .parquet extension stores the reference lists as list columns.",
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=LOG_LEVELS,
+        default="info",
+        help="Per-request and per-page messages are only logged at the debug level (default: info).",
+    )
+    parser.add_argument(
+        "--progress-interval",
+        type=float,
+        default=10.0,
+        help="Seconds between progress/throughput lines (0 disables them).",
+    )
+    parser.add_argument(
+        "--metrics",
+        default="openalex_metrics.json",
+        help="JSON file for the final request/latency/throughput metrics.",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=4,
+        help="Attempts per request (or Selenium page load) before a lookup is dead-lettered.",
+    )
+    parser.add_argument(
+        "--dead-letters",
+        default="openalex_dead_letters.jsonl",
+        help="JSONL file recording the works whose cited_by lookup failed.",
+    )
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="Only re-run the cited_by lookups in --dead-letters and merge them into --output.",
+    )
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
+    args = parse_args()
+    set_log_level(args.log_level, logging.getLogger())
+    if args.offline and args.no_cache:
+        raise SystemExit("--offline requires the response cache.")
+    if not args.no_cache:
+        response_cache = ResponseCache(
+            args.cache,
+            ttl=args.cache_ttl * 86400,
+            max_bytes=args.cache_max_mb * 1024 * 1024,
+            offline=args.offline,
+        )
     logging.debug("Program started.")
+    retry_policy = RetryPolicy(args.max_attempts)
+    dead_letters = DeadLetterQueue(args.dead_letters)
+    progress = metrics.progress(args.progress_interval).start()
     try:
-        # Define the API endpoint URL (without the page and per_page parameters)
-        api_url = (
-            "https://api.openalex.org/works?"
-            "select=id,doi,title,publication_year,primary_topic,"
-            "referenced_works_count,referenced_works,cited_by_api_url&"
-            "filter=authorships.countries:countries/br,publication_year:2024,"
-            "primary_topic.field.id:fields/17,primary_topic.subfield.id:subfields/1704&"
-            "sort=publication_year:desc"
-        )
-        logging.debug("Full API URL: %s", api_url)
+        if args.replay:
+            # Only re-run the failed cited_by lookups and merge them into the output.
+            client = None
+            if not args.selenium:
+                client = OpenAlexClient(
+                    mailto=load_email(),
+                    max_workers=args.workers,
+                    cache=response_cache,
+                    metrics=metrics,
+                    retry_policy=retry_policy,
+                )
+            all_results = replay_cited_by(args.output, client)
+        elif args.selenium:
+            # Define the API endpoint URL (without the page and per_page parameters)
+            api_url = (
+                "https://api.openalex.org/works?"
+                f"select={','.join(WORK_FIELDS)}&"
+                f"filter={WORKS_FILTER}&"
+                f"sort={WORKS_SORT}"
+            )
+            logging.debug("Full API URL: %s", api_url)
+
+            # Fetch all data (this returns a list of parsed records)
+            all_results = fetch_all_data(api_url, per_page=10)
+            logging.debug("Fetched %s main records.", len(all_results))
 
-        # Fetch all data (this returns a list of parsed records)
-        all_results = fetch_all_data(api_url, per_page=10)
-        logging.debug("Fetched %s main records.", len(all_results))
+            # For each record, fetch the 'cited_by' list and update the dictionary.
+            for work in all_results:
+                work_id = work.get("id")
+                if work_id:
+                    work["cited_by"] = fetch_cited_by(work_id)
+                    # Optional: pause between requests to avoid rate limits
+                    time.sleep(1)
+        else:
+            client = OpenAlexClient(
+                mailto=load_email(),
+                max_workers=args.workers,
+                cache=response_cache,
+                metrics=metrics,
+                retry_policy=retry_policy,
+            )
+            cited_by_counts = {}
+            all_results = client.fetch_works(
+                WORKS_FILTER, sort=WORKS_SORT, cited_by_counts=cited_by_counts
+            )
+            logging.debug("Fetched %s main records.", len(all_results))
 
-        # For each record, fetch the 'cited_by' list and update the dictionary.
-        for work in all_results:
-            work_id = work.get("id")
-            if work_id:
-                work["cited_by"] = fetch_cited_by(work_id)
-                # Optional: pause between requests to avoid rate limits
-                time.sleep(1)
+            # Fill 'cited_by' from the collected references first, then in batches of 50.
+            # Works of batches that still fail are dead-lettered for --replay.
+            stats = client.resolve_cited_by(
+                all_results, cited_by_counts, dead_letters=dead_letters
+            )
+            logging.info(
+                "cited_by: %s work(s) resolved locally, %s looked up in %s batch(es) "
+                "(%s failed).",
+                stats["resolved_locally"],
+                stats["looked_up"],
+                stats["batches"],
+                stats["failed_batches"],
+            )
 
-        # Load the results into a DataFrame and save to CSV.
+        # Load the results into a DataFrame and save to CSV (or Parquet).
         df = pd.DataFrame(all_results)
         logging.debug("Data loaded into DataFrame with %s records.", len(df))
-        df.to_csv("openalex_data.csv", index=False)
+        write_openalex(df, args.output)
+        if args.replay:
+            dead_letters.finish_replay()
         logging.debug("Program completed successfully.")
     except Exception as e:
         logging.exception("An error occurred during execution: %s", e)
         raise
     finally:
-        driver.quit()
+        progress.stop()
+        metrics.save(args.metrics)
+        logging.info("Request metrics saved to %s", args.metrics)
+        if dead_letters.count:
+            print(
+                f"{dead_letters.count} cited_by lookup(s) failed and were written to "
+                f"'{dead_letters.path}' (re-run them with --replay)."
+            )
+        if driver is not None:
+            driver.quit()
+        if response_cache is not None:
+            logging.info(response_cache.report())
+            print(response_cache.report())
+            response_cache.close()
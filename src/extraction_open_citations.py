@@ -1,13 +1,86 @@
-import re
+import os
 import json
+import asyncio
+import argparse
+import aiohttp
 import requests
-import pandas as pd
 import concurrent.futures
-from time import time
+from functools import partial
+from time import perf_counter, time
+
+from citation_matrix import (
+    YEARS_FILE,
+    CitationMatrix,
+    load_publication_years,
+    matrix_path,
+    save_publication_years,
+)
+from columnar_io import csv_to_parquet, parquet_to_csv
+from csindex_areas import AREAS
+from csindex_loader import (
+    CSINDEX_BASE_URL,
+    DEFAULT_MIRROR_DIR,
+    CSIndexLoader,
+    publication_pairs,
+    publication_years,
+)
+from doi_utils import canonicalize_doi
+from edge_store import EDGE_COLUMNS, EdgeStore, deduplicate
+from pipeline_metrics import LOG_LEVELS, PipelineMetrics, get_logger, set_log_level
+from rate_limit import TokenBucket
+from retry_policy import (
+    OK,
+    Breakers,
+    DeadLetterQueue,
+    Outcome,
+    RetryPolicy,
+    classify,
+    parse_retry_after,
+)
+from repository_index import (
+    REPOSITORY_COLUMNS,
+    build_repository_index,
+    load_repository_index,
+    resolve_sub_areas,
+    save_repository_index,
+)
+from response_cache import (
+    DEFAULT_CACHE_PATH,
+    DEFAULT_MAX_MB,
+    DEFAULT_TTL_DAYS,
+    ResponseCache,
+)
+from snowball_crawler import CHECKPOINT_FILE, NODES_FILE, SnowballCrawler
+
+DEFAULT_API_BASE_URL = "https://opencitations.net/index/api/v2"
+API_BASE_URL = DEFAULT_API_BASE_URL
+
+# Default request budget (requests per second) shared by all workers.
+# OpenCitations throttles aggressive clients; adjust with --rate to match your token's quota.
+DEFAULT_RATE = 3.0
+DEFAULT_BURST = 10
 
 # Global session to reuse HTTP connections.
 session = requests.Session()
 
+# Rate limiter shared by the worker threads; set in main().
+rate_limiter = None
+
+# On-disk response cache shared by both engines; set in main().
+response_cache = None
+
+# Request/throughput metrics of the current run; replaced in main().
+metrics = PipelineMetrics()
+
+# Retries with backoff, per-host throttling breakers and the dead-letter file of
+# requests that failed after all retries; configured in main().
+retry_policy = RetryPolicy()
+breakers = Breakers()
+dead_letters = None
+
+# Per-request and per-DOI messages are logged at DEBUG level (see --log-level).
+log = get_logger("opencitations")
+
 
 # Load API token from file and set up HTTP headers.
 def load_token(token_file: str = "../.config/token.json") -> dict:
@@ -35,33 +108,179 @@ def extract_doi(doi_str: str) -> str:
     """
     Extract a single DOI from a given string.
 
-    Handles URLs (e.g. "https://doi.org/10.xxx/yyy") or "doi:" prefixes.
+    Handles URLs (e.g. "https://doi.org/10.xxx/yyy") or "doi:" prefixes. The DOI is
+    returned in canonical form (see doi_utils); strings that are not valid DOIs are
+    returned stripped but otherwise unchanged.
     """
-    doi_str = doi_str.strip()
-    if doi_str.lower().startswith("https://doi.org/"):
-        return doi_str.split("https://doi.org/")[-1]
-    match = re.search(r"doi:(\S+)", doi_str, re.IGNORECASE)
-    if match:
-        return match.group(1)
-    return doi_str
+    return canonicalize_doi(doi_str) or doi_str.strip()
 
 
 def extract_dois(doi_field: str) -> list:
     """
     Extract all DOIs from a string containing one or more identifiers.
-    Only tokens starting with "doi:" or "https://doi.org/" are considered.
+    Only tokens starting with "doi:" or "https://doi.org/" are considered; they are
+    returned in canonical form, and tokens that are not valid DOIs are skipped.
     """
-    tokens = doi_field.split()
     dois = []
-    for token in tokens:
-        token = token.strip()
-        if token.lower().startswith("doi:"):
-            dois.append(token.split("doi:")[-1].strip())
-        elif token.lower().startswith("https://doi.org/"):
-            dois.append(token.split("https://doi.org/")[-1].strip())
+    for token in doi_field.split():
+        lowered = token.lower()
+        if lowered.startswith("doi:") or lowered.startswith("https://doi.org/"):
+            doi = canonicalize_doi(token)
+            if doi:
+                dois.append(doi)
     return dois
 
 
+def parse_references(data: list, doi: str) -> list:
+    """
+    Turn an OpenCitations /references response into edge dictionaries.
+
+    The publication is the origin (which cites others) and each extracted DOI
+    in the "cited" field becomes the target.
+    """
+    edges = []
+    # Each record might contain multiple DOIs in the "cited" field.
+    for record in data:
+        cited_raw = record.get("cited")
+        if cited_raw:
+            for candidate in extract_dois(cited_raw):
+                if candidate != doi:
+                    edges.append(
+                        {
+                            "origin_doi": doi,
+                            "target_doi": candidate,
+                            "origin_sub_area": None,  # to be set later
+                            "target_sub_area": None,
+                        }
+                    )
+                else:
+                    log.debug("Skipping self-reference for %s", doi)
+    return edges
+
+
+def parse_citations(data: list, doi: str) -> list:
+    """
+    Turn an OpenCitations /citations response into edge dictionaries.
+
+    The given DOI is the target and each extracted DOI from the "citing" field becomes the origin.
+    """
+    edges = []
+    # Each record might contain multiple DOIs in the "citing" field.
+    for record in data:
+        citing_raw = record.get("citing")
+        if citing_raw:
+            for candidate in extract_dois(citing_raw):
+                if candidate != doi:
+                    edges.append(
+                        {
+                            "origin_doi": candidate,
+                            "target_doi": doi,
+                            "origin_sub_area": None,
+                            "target_sub_area": None,
+                        }
+                    )
+                else:
+                    log.debug("Skipping self-citation for %s", doi)
+    return edges
+
+
+def log_retry(endpoint: str, doi: str, outcome: Outcome, attempt: int, delay: float) -> None:
+    metrics.record_retry(endpoint)
+    log.debug(
+        "Retrying %s of %s in %.2fs after attempt %s failed (%s: %s)",
+        endpoint,
+        doi,
+        delay,
+        attempt,
+        outcome.kind,
+        outcome.message,
+    )
+
+
+def cache_endpoint(endpoint: str) -> str:
+    """
+    Endpoint name under which responses are cached.
+
+    Responses of another API base (e.g. the benchmark mock server) are keyed under
+    that base, so they are never served to a run against the real OpenCitations API.
+    """
+    if API_BASE_URL == DEFAULT_API_BASE_URL:
+        return endpoint
+    return f"{API_BASE_URL} {endpoint}"
+
+
+def finish_fetch(endpoint: str, doi: str, outcome: Outcome):
+    """Cache a successful outcome, or log and dead-letter a failed one; return its data."""
+    if outcome.kind == OK:
+        if response_cache is not None:
+            response_cache.put(cache_endpoint(endpoint), doi, outcome.data)
+        return outcome.data
+    log.error(
+        "Giving up on %s for %s after %s attempt(s) (%s: %s)",
+        endpoint,
+        doi,
+        outcome.attempts,
+        outcome.kind,
+        outcome.message,
+    )
+    # A 404 means OpenCitations does not know the DOI; replaying it would not help.
+    if dead_letters is not None and outcome.kind != "not_found":
+        dead_letters.add(endpoint, doi, outcome)
+    return None
+
+
+def fetch_json(endpoint: str, doi: str, url: str):
+    """
+    Fetch one OpenCitations endpoint ("references" or "citations") for a DOI.
+
+    The response cache is consulted first; successful responses are stored in it.
+    Throttling, server, timeout, connection and parse errors are retried as set by
+    retry_policy; requests that still fail are written to the dead-letter file.
+    Returns the decoded JSON list, or None on a failed request or, in offline mode,
+    on a cache miss.
+    """
+    if response_cache is not None:
+        data = response_cache.get(cache_endpoint(endpoint), doi)
+        metrics.record_cache(endpoint, data is not None)
+        if data is not None:
+            log.debug("Cache hit for %s of %s", endpoint, doi)
+            return data
+        if response_cache.offline:
+            log.debug("Offline mode: no cached %s for %s", endpoint, doi)
+            return None
+
+    log.debug("Fetching %s for DOI %s\n URL: %s", endpoint, doi, url)
+
+    def attempt() -> Outcome:
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        started = perf_counter()
+        try:
+            response = session.get(url, timeout=10, headers=HTTP_HEADERS)
+        except Exception as e:
+            metrics.record_request(endpoint, "error", perf_counter() - started)
+            return Outcome(classify(error=e), message=str(e) or type(e).__name__)
+        metrics.record_request(
+            endpoint, response.status_code, perf_counter() - started, len(response.content)
+        )
+        log.debug("Received status %s for %s of %s", response.status_code, endpoint, doi)
+        kind = classify(response.status_code)
+        if kind != OK:
+            return Outcome(
+                kind,
+                status=response.status_code,
+                retry_after=parse_retry_after(response.headers.get("Retry-After")),
+                message=f"HTTP {response.status_code}",
+            )
+        try:
+            return Outcome(OK, response.json(), response.status_code)
+        except Exception as e:
+            return Outcome(classify(error=e), status=response.status_code, message=str(e))
+
+    outcome = retry_policy.run(attempt, breakers.get(url), partial(log_retry, endpoint, doi))
+    return finish_fetch(endpoint, doi, outcome)
+
+
 def get_references(doi: str) -> list:
     """
     Retrieve outgoing reference edges for the given DOI via the OpenCitations API.
@@ -70,43 +289,11 @@ def get_references(doi: str) -> list:
     For each reference, the publication is the origin (which cites others)
     and each extracted DOI in the "cited" field becomes the target.
     """
-    url = f"https://opencitations.net/index/api/v2/references/doi:{doi}?require=cited"
-    print(f"[DEBUG] Fetching references for DOI {doi}\n URL: {url}")
-    try:
-        response = session.get(url, timeout=10, headers=HTTP_HEADERS)
-        print(f"[DEBUG] Received status {response.status_code} for references of {doi}")
-    except Exception as e:
-        print(f"[ERROR] Request error (references) for {doi}: {e}")
+    url = f"{API_BASE_URL}/references/doi:{doi}?require=cited"
+    data = fetch_json("references", doi, url)
+    if data is None:
         return []
-
-    edges = []
-    if response.status_code == 200:
-        try:
-            data = response.json()
-        except Exception as e:
-            print(f"[ERROR] JSON parse error for references of {doi}: {e}")
-            return []
-        # Each record might contain multiple DOIs in the "cited" field.
-        for record in data:
-            cited_raw = record.get("cited")
-            if cited_raw:
-                for candidate in extract_dois(cited_raw):
-                    if candidate != doi:
-                        edges.append(
-                            {
-                                "origin_doi": doi,
-                                "target_doi": candidate,
-                                "origin_sub_area": None,  # to be set later
-                                "target_sub_area": None,
-                            }
-                        )
-                    else:
-                        print(f"[INFO] Skipping self-reference for {doi}")
-    else:
-        print(
-            f"[ERROR] Error {response.status_code} when fetching references for {doi}"
-        )
-    return edges
+    return parse_references(data, doi)
 
 
 def get_citations(doi: str) -> list:
@@ -116,175 +303,683 @@ def get_citations(doi: str) -> list:
     Uses the "require=citing" filter.
     For each citation, the given DOI is the target and each extracted DOI from the "citing" field becomes the origin.
     """
-    url = f"https://opencitations.net/index/api/v2/citations/doi:{doi}?require=citing"
-    print(f"[DEBUG] Fetching citations for DOI {doi}\n URL: {url}")
-    try:
-        response = session.get(url, timeout=10, headers=HTTP_HEADERS)
-        print(f"[DEBUG] Received status {response.status_code} for citations of {doi}")
-    except Exception as e:
-        print(f"[ERROR] Request error (citations) for {doi}: {e}")
+    url = f"{API_BASE_URL}/citations/doi:{doi}?require=citing"
+    data = fetch_json("citations", doi, url)
+    if data is None:
         return []
-
-    edges = []
-    if response.status_code == 200:
-        try:
-            data = response.json()
-        except Exception as e:
-            print(f"[ERROR] JSON parse error for citations of {doi}: {e}")
-            return []
-        # Each record might contain multiple DOIs in the "citing" field.
-        for record in data:
-            citing_raw = record.get("citing")
-            if citing_raw:
-                for candidate in extract_dois(citing_raw):
-                    if candidate != doi:
-                        edges.append(
-                            {
-                                "origin_doi": candidate,
-                                "target_doi": doi,
-                                "origin_sub_area": None,
-                                "target_sub_area": None,
-                            }
-                        )
-                    else:
-                        print(f"[INFO] Skipping self-citation for {doi}")
-    else:
-        print(f"[ERROR] Error {response.status_code} when fetching citations for {doi}")
-    return edges
+    return parse_citations(data, doi)
 
 
-def process_doi(doi: str, sub_area: str) -> list:
+def process_doi(doi: str, sub_area: str, include_citations: bool = True) -> list:
     """
     Process a single publication by retrieving its references and citations.
 
     For references: sets the publication as origin.
     For citations: sets the publication as target.
+
+    With include_citations=False only references are fetched. In the repository-only
+    network every edge A -> B between two CSIndex publications is already returned as
+    a reference of A, so the citations of B would only repeat it.
     """
-    print(f"[INFO] Processing DOI {doi} for sub-area {sub_area}")
+    log.debug("Processing DOI %s for sub-area %s", doi, sub_area)
     # Outgoing: publication is origin.
     refs = get_references(doi)
     for edge in refs:
         edge["origin_sub_area"] = sub_area  # known sub-area for the citing publication
         # target_sub_area remains None (will be filled later if available)
     # Incoming: publication is target.
-    cits = get_citations(doi)
+    cits = get_citations(doi) if include_citations else []
     for edge in cits:
         edge["target_sub_area"] = sub_area  # known sub-area for the cited publication
         # origin_sub_area remains None (will be filled later if available)
     total_edges = len(refs) + len(cits)
-    print(
-        f"[INFO] Completed DOI {doi}: {len(refs)} reference(s) and {len(cits)} citation(s) found (total {total_edges})"
+    metrics.record_item(total_edges)
+    log.debug(
+        "Completed DOI %s: %s reference(s) and %s citation(s) found (total %s)",
+        doi,
+        len(refs),
+        len(cits),
+        total_edges,
     )
     return refs + cits
 
 
-def load_publications_for_area(file_url: str, sub_area: str) -> list:
+async def fetch_json_async(
+    client: aiohttp.ClientSession,
+    endpoint: str,
+    doi: str,
+    url: str,
+    limiter: TokenBucket,
+):
     """
-    Load publication data from a CSV file at the given URL and tag each publication
-    with the provided sub-area. Assumes the CSV file (without headers) has the DOI in column index 5.
+    Asynchronous counterpart of fetch_json; does not block the event loop on the network.
+
+    Returns the decoded JSON list, or None on a failed request (or on a cache miss in
+    offline mode).
     """
-    print(f"[INFO] Loading publications for sub-area '{sub_area}' from {file_url}")
-    try:
-        df = pd.read_csv(file_url, header=None)
-    except Exception as e:
-        print(f"[ERROR] Error loading CSV from {file_url}: {e}")
-        return []
-    doi_series = df.iloc[:, 5].dropna().astype(str)
-    publications = []
-    for doi in doi_series:
-        if doi.strip().lower() != "null":
-            cleaned = extract_doi(doi)
-            publications.append((cleaned, sub_area))
-    unique_publications = list(set(publications))
-    print(
-        f"[INFO] Sub-area '{sub_area}': loaded {len(unique_publications)} unique publication(s)"
+    if response_cache is not None:
+        data = response_cache.get(cache_endpoint(endpoint), doi)
+        metrics.record_cache(endpoint, data is not None)
+        if data is not None:
+            log.debug("Cache hit for %s of %s", endpoint, doi)
+            return data
+        if response_cache.offline:
+            log.debug("Offline mode: no cached %s for %s", endpoint, doi)
+            return None
+
+    async def attempt() -> Outcome:
+        await limiter.acquire_async()
+        started = perf_counter()
+        try:
+            async with client.get(url) as response:
+                body = await response.read()
+        except Exception as e:
+            metrics.record_request(endpoint, "error", perf_counter() - started)
+            return Outcome(classify(error=e), message=str(e) or type(e).__name__)
+        metrics.record_request(endpoint, response.status, perf_counter() - started, len(body))
+        log.debug("Received status %s for %s of %s", response.status, endpoint, doi)
+        kind = classify(response.status)
+        if kind != OK:
+            return Outcome(
+                kind,
+                status=response.status,
+                retry_after=parse_retry_after(response.headers.get("Retry-After")),
+                message=f"HTTP {response.status}",
+            )
+        try:
+            return Outcome(OK, json.loads(body), response.status)
+        except Exception as e:
+            return Outcome(classify(error=e), status=response.status, message=str(e))
+
+    outcome = await retry_policy.run_async(
+        attempt, breakers.get(url), partial(log_retry, endpoint, doi)
     )
-    return unique_publications
+    return finish_fetch(endpoint, doi, outcome)
 
 
-def main():
-    base_url = (
-        "https://raw.githubusercontent.com/aserg-ufmg/CSIndex/refs/heads/master/data/"
-    )
-    areas = [
-        "ai",
-        "arch",
-        "bio",
-        "chi",
-        "cse",
-        "data",
-        "dbis",
-        "ds",
-        "formal",
-        "graphics",
-        "hardware",
-        "ir",
-        "net",
-        "or",
-        "pl",
-        "robotics",
-        "se",
-        "security",
-        "theory",
-        "vision",
-    ]
-
-    all_publications = []
-    print("[START] Loading publication data for each area...")
-    for area in areas:
-        file_url = f"{base_url}{area}-out-papers.csv"
-        pubs = load_publications_for_area(file_url, area)
-        all_publications.extend(pubs)
+async def get_references_async(
+    client: aiohttp.ClientSession, doi: str, limiter: TokenBucket
+) -> list:
+    """Asynchronous counterpart of get_references."""
+    url = f"{API_BASE_URL}/references/doi:{doi}?require=cited"
+    data = await fetch_json_async(client, "references", doi, url, limiter)
+    if data is None:
+        return []
+    return parse_references(data, doi)
 
-    # Log total number of publications from GitHub repository.
-    print(
-        f"[SUMMARY] Total unique publications loaded from repository: {len(all_publications)}"
-    )
 
-    # Build a dictionary mapping each publication DOI to its sub-area.
-    repo_dict = {doi: sub_area for doi, sub_area in all_publications}
-    print(
-        f"[INFO] Repository dictionary contains {len(repo_dict)} unique publication(s)"
+async def get_citations_async(
+    client: aiohttp.ClientSession, doi: str, limiter: TokenBucket
+) -> list:
+    """Asynchronous counterpart of get_citations."""
+    url = f"{API_BASE_URL}/citations/doi:{doi}?require=citing"
+    data = await fetch_json_async(client, "citations", doi, url, limiter)
+    if data is None:
+        return []
+    return parse_citations(data, doi)
+
+
+async def process_doi_async(
+    client: aiohttp.ClientSession,
+    doi: str,
+    sub_area: str,
+    limiter: TokenBucket,
+    include_citations: bool = True,
+) -> list:
+    """
+    Asynchronous counterpart of process_doi.
+
+    References and citations are requested in parallel instead of one after the other.
+    """
+    log.debug("Processing DOI %s for sub-area %s", doi, sub_area)
+    if include_citations:
+        refs, cits = await asyncio.gather(
+            get_references_async(client, doi, limiter),
+            get_citations_async(client, doi, limiter),
+        )
+    else:
+        refs, cits = await get_references_async(client, doi, limiter), []
+    for edge in refs:
+        edge["origin_sub_area"] = sub_area
+    for edge in cits:
+        edge["target_sub_area"] = sub_area
+    metrics.record_item(len(refs) + len(cits))
+    log.debug(
+        "Completed DOI %s: %s reference(s) and %s citation(s) found (total %s)",
+        doi,
+        len(refs),
+        len(cits),
+        len(refs) + len(cits),
     )
+    return refs + cits
 
-    all_edges = []
-    start_time = time()
 
-    print("[START] Processing citations and references concurrently...")
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
+def harvest_threads(
+    publications: list, on_result, max_workers: int = 10, include_citations: bool = True
+) -> None:
+    """
+    Harvest edges for every (doi, sub_area) pair with a pool of worker threads.
+
+    `on_result(doi, sub_area, edges)` is called from the main thread as each publication completes.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
         future_to_pub = {
-            executor.submit(process_doi, doi, sub_area): (doi, sub_area)
-            for doi, sub_area in all_publications
+            executor.submit(process_doi, doi, sub_area, include_citations): (doi, sub_area)
+            for doi, sub_area in publications
         }
         for future in concurrent.futures.as_completed(future_to_pub):
             doi, sub_area = future_to_pub[future]
             try:
-                edges = future.result()
-                all_edges.extend(edges)
+                on_result(doi, sub_area, future.result())
             except Exception as e:
-                print(f"[ERROR] Error processing {doi} ({sub_area}): {e}")
+                metrics.record_item(failed=True)
+                log.error("Error processing %s (%s): %s", doi, sub_area, e)
 
-    elapsed = time() - start_time
+
+async def harvest_async(
+    publications: list,
+    on_result,
+    concurrency: int = 50,
+    limiter: TokenBucket = None,
+    include_citations: bool = True,
+) -> None:
+    """
+    Harvest edges for every (doi, sub_area) pair on a single event loop.
+
+    A fixed pool of `concurrency` worker coroutines pulls publications from a queue,
+    so at most `concurrency` DOIs (2x as many requests) are in flight at any time and
+    memory does not grow with the number of publications.
+    `on_result(doi, sub_area, edges)` is called as each publication completes.
+    """
+    limiter = limiter or TokenBucket(0)
+    queue = asyncio.Queue()
+    for pub in publications:
+        queue.put_nowait(pub)
+
+    connector = aiohttp.TCPConnector(limit=2 * concurrency)
+    timeout = aiohttp.ClientTimeout(total=10)
+    async with aiohttp.ClientSession(
+        headers=HTTP_HEADERS, connector=connector, timeout=timeout
+    ) as client:
+
+        async def worker():
+            while True:
+                try:
+                    doi, sub_area = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    edges = await process_doi_async(
+                        client, doi, sub_area, limiter, include_citations
+                    )
+                    on_result(doi, sub_area, edges)
+                except Exception as e:
+                    metrics.record_item(failed=True)
+                    log.error("Error processing %s (%s): %s", doi, sub_area, e)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Collect OpenCitations references/citations for CSIndex publications."
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["async", "threads"],
+        default="threads",
+        help="Harvesting engine: asyncio event loop or thread pool (default: threads).",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=10, help="Worker threads for the threads engine."
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=50,
+        help="DOIs processed concurrently by the async engine.",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=DEFAULT_RATE,
+        help="Maximum requests per second across all workers (0 disables the limit).",
+    )
+    parser.add_argument(
+        "--burst", type=int, default=DEFAULT_BURST, help="Token bucket burst size."
+    )
+    parser.add_argument(
+        "--api-base",
+        default=DEFAULT_API_BASE_URL,
+        help="OpenCitations API base URL (point it at a local mock server for benchmarks).",
+    )
+    parser.add_argument(
+        "--csindex-base",
+        default=CSINDEX_BASE_URL,
+        help="Base URL (or directory) of the CSIndex <area>-out-papers.csv files.",
+    )
+    parser.add_argument(
+        "--csindex-mirror",
+        default=DEFAULT_MIRROR_DIR,
+        help="Local mirror of the CSIndex files (revalidated with conditional GETs).",
+    )
+    parser.add_argument(
+        "--csindex-workers",
+        type=int,
+        default=8,
+        help="CSIndex areas downloaded and parsed concurrently.",
+    )
+    parser.add_argument(
+        "--cache",
+        default=DEFAULT_CACHE_PATH,
+        help=f"SQLite response cache file (default: {DEFAULT_CACHE_PATH}).",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Disable the on-disk response cache."
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_TTL_DAYS,
+        help="Days before a cached response is refreshed.",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=DEFAULT_MAX_MB,
+        help="Size budget of the cache; least recently used entries are evicted beyond it.",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Serve responses only from the cache and never touch the network.",
+    )
+    parser.add_argument(
+        "--chunk-dir",
+        default="open_citations_chunks",
+        help="Directory for streamed edge chunks and the completed-DOI manifest.",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=100_000,
+        help="Number of edges buffered before a chunk is written.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Keep previous chunks and skip publications already in the manifest.",
+    )
+    parser.add_argument(
+        "--repository-only",
+        action="store_true",
+        help="Keep only edges between two CSIndex publications (fetches references only).",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["csv", "parquet"],
+        default="csv",
+        help="Format of the final edge list (default: csv).",
+    )
+    parser.add_argument(
+        "--depth",
+        type=int,
+        default=1,
+        help="Hops from the CSIndex publications; above 1, the DOIs found are expanded "
+        "again (snowball crawl, threads engine, written to snowball_edge_list.csv).",
+    )
+    parser.add_argument(
+        "--budget",
+        type=int,
+        default=None,
+        help="Maximum number of DOIs expanded by the snowball crawl (default: no limit).",
+    )
+    parser.add_argument(
+        "--far-bloom",
+        type=int,
+        default=0,
+        help="Count the last-hop DOIs of the crawl with a Bloom filter sized for this "
+        "many DOIs instead of keeping them in memory (0 keeps them).",
+    )
+    parser.add_argument(
+        "--checkpoint-interval",
+        type=float,
+        default=300.0,
+        help="Seconds between crawl checkpoints (resume an interrupted crawl with --resume).",
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=LOG_LEVELS,
+        default="info",
+        help="Per-request and per-DOI messages are only printed at the debug level (default: info).",
+    )
+    parser.add_argument(
+        "--progress-interval",
+        type=float,
+        default=10.0,
+        help="Seconds between progress/throughput lines (0 disables them).",
+    )
+    parser.add_argument(
+        "--metrics",
+        default="pipeline_metrics.json",
+        help="JSON file for the final request/latency/throughput metrics.",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=4,
+        help="Attempts per request for throttling, server, timeout and connection errors.",
+    )
+    parser.add_argument(
+        "--retry-base-delay",
+        type=float,
+        default=1.0,
+        help="Backoff in seconds before the first retry (doubled for each retry, with jitter).",
+    )
+    parser.add_argument(
+        "--dead-letters",
+        default="open_citations_dead_letters.jsonl",
+        help="JSONL file recording the requests that failed after all retries.",
+    )
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="Only re-fetch the requests in --dead-letters and merge them into the existing edge list.",
+    )
+    return parser.parse_args()
+
+
+def output_path(args) -> tuple:
+    """Return the final edge list file (as CSV) and its column order."""
+    if args.repository_only:
+        return "repository_edge_list.csv", REPOSITORY_COLUMNS
+    if args.depth > 1:
+        return "snowball_edge_list.csv", EDGE_COLUMNS
+    return "open_citations_edge_list.csv", EDGE_COLUMNS
+
+
+def write_edge_list_output(
+    chunk_paths: list, repository, years, args, areas: list = AREAS, existing: str = None
+) -> str:
+    """
+    Deduplicate edge chunks into the final edge list and save its citation matrix.
+
+    Both endpoints are resolved against the repository index before deduplicating, so
+    an edge seen once as a reference and once as a citation collapses into one row.
+    With `existing` (a previous CSV output), its edges are merged in and the output
+    replaces it only once it is complete.
+
+    Returns:
+        str: Path of the edge list written (CSV or Parquet, as set by --format).
+    """
+    output_file, columns = output_path(args)
+    target = output_file + ".tmp" if existing else output_file
+    # The sub-area citation matrix is counted from the unique edges as they are written.
+    matrix = CitationMatrix(areas)
+    total_edges, unique_edges = deduplicate(
+        ([existing] if existing else []) + chunk_paths,
+        target,
+        transform=partial(
+            resolve_sub_areas, index=repository, repository_only=args.repository_only
+        ),
+        columns=columns,
+        on_unique=partial(matrix.update_frame, years=years),
+    )
+    if existing:
+        os.replace(target, output_file)
+    print(f"[INFO] Dropped {total_edges - unique_edges} duplicate or filtered edge(s).")
+    if args.repository_only:
+        network = "repository-only"
+    elif args.depth > 1:
+        network = f"{args.depth}-hop snowball"
+    else:
+        network = "OpenCitations"
+    print(
+        f"[SUMMARY] Unique citation/reference edges in the {network} network: {unique_edges}"
+    )
+    if args.format == "parquet":
+        parquet_file = output_file.removesuffix(".csv") + ".parquet"
+        csv_to_parquet(output_file, parquet_file)
+        os.remove(output_file)
+        output_file = parquet_file
+    print(f"[COMPLETE] Filtered citation edge list saved to '{output_file}'.")
+    matrix.add_source(output_file)
+    matrix.save(matrix_path(output_file))
+    print(f"[COMPLETE] Sub-area citation matrix saved to '{matrix_path(output_file)}'.")
+    return output_file
+
+
+def report_failures() -> None:
+    """Print how many requests ended in the dead-letter file and how often breakers opened."""
+    trips = {host: count for host, count in breakers.trips().items() if count}
+    if trips:
+        print(f"[SUMMARY] Throttling breaker opened: {trips}")
+    if dead_letters is not None and dead_letters.count:
+        print(
+            f"[SUMMARY] {dead_letters.count} request(s) failed after all retries and were "
+            f"written to '{dead_letters.path}' (re-run them with --replay)."
+        )
+
+
+def replay(args) -> None:
+    """
+    Re-fetch only the dead-lettered (endpoint, DOI) pairs and merge their edges into
+    the existing edge list.
+
+    Sub-areas are resolved from the saved repository index and the citation matrix is
+    rebuilt from the merged edge list. Requests that fail again are written to a fresh
+    dead-letter file.
+    """
+    output_file, _ = output_path(args)
+    if args.format == "parquet":
+        existing = output_file.removesuffix(".csv") + ".parquet"
+    else:
+        existing = output_file
+    if not os.path.exists(existing):
+        raise SystemExit(f"[ERROR] No edge list to merge into: '{existing}' does not exist.")
+    fetchers = {"references": get_references, "citations": get_citations}
+    entries = dead_letters.take(fetchers)
+    if not entries:
+        print(f"[INFO] No failed request recorded in '{args.dead_letters}'.")
+        dead_letters.finish_replay()
+        return
+
+    global metrics
+    metrics = PipelineMetrics(total=len(entries), unit="request")
+    store = EdgeStore(os.path.join(args.chunk_dir, "replay"), chunk_size=args.chunk_size)
+    print(f"[START] Replaying {len(entries)} failed request(s) from '{args.dead_letters}'...")
+    try:
+        with metrics.progress(args.progress_interval):
+            with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as executor:
+                futures = {
+                    executor.submit(fetchers[entry["endpoint"]], entry["id"]): entry
+                    for entry in entries
+                }
+                for future in concurrent.futures.as_completed(futures):
+                    entry = futures[future]
+                    edges = future.result()
+                    metrics.record_item(len(edges))
+                    store.add(entry["id"], "", edges)
+    finally:
+        store.close()
+        metrics.save(args.metrics)
+    print(f"[INFO] Edges recovered by the replay (before filtering): {store.edge_count}")
+    report_failures()
+
+    if existing != output_file:
+        # deduplicate() reads CSV, so a Parquet output is merged through a CSV copy.
+        parquet_to_csv(existing, output_file)
+    years = load_publication_years() if os.path.exists(YEARS_FILE) else None
+    write_edge_list_output(
+        store.chunk_paths(), load_repository_index(), years, args, existing=output_file
+    )
+    dead_letters.finish_replay()
+
+
+def crawl(args, publications: list, repository, years, areas: list) -> None:
+    """
+    Snowball crawl (--depth > 1): expand the CSIndex publications, then the DOIs they
+    reference or are cited by, up to --depth hops and --budget expanded DOIs.
+
+    Edges are streamed to --chunk-dir like a one-hop harvest; the crawl state is
+    checkpointed there, and --resume continues from the last checkpoint.
+    """
+    global metrics
+    store = EdgeStore(args.chunk_dir, chunk_size=args.chunk_size, resume=args.resume)
+    crawler = SnowballCrawler(
+        partial(process_doi, sub_area=""),
+        store,
+        depth=args.depth,
+        budget=args.budget,
+        workers=args.workers,
+        far_bloom_capacity=args.far_bloom,
+        checkpoint_path=os.path.join(args.chunk_dir, CHECKPOINT_FILE),
+        checkpoint_interval=args.checkpoint_interval,
+    )
+    if args.resume and crawler.load_checkpoint():
+        print(
+            f"[INFO] Resuming crawl: {crawler.expanded} DOI(s) expanded, "
+            f"{crawler.pending} in the frontier"
+        )
+    else:
+        crawler.remove_checkpoint()
+        crawler.seed(doi for doi, _ in publications)
+
+    start_time = time()
+    metrics = PipelineMetrics(total=args.budget, unit="DOI")
     print(
-        f"[SUMMARY] Processed {len(all_publications)} publication(s) in {elapsed:.2f} seconds."
+        f"[START] Snowball crawl to depth {args.depth} "
+        f"(budget: {args.budget or 'none'}, {args.workers} worker(s))..."
     )
+    try:
+        with metrics.progress(args.progress_interval):
+            crawler.run()
+    finally:
+        store.close()
+        metrics.save(args.metrics)
+        print(f"[COMPLETE] Request metrics saved to '{args.metrics}'.")
+
+    print(f"[SUMMARY] Crawl finished in {time() - start_time:.2f} seconds: {crawler.summary()}")
+    crawler.write_nodes(NODES_FILE)
+    print(f"[COMPLETE] Crawled nodes saved to '{NODES_FILE}'.")
+    report_failures()
+    write_edge_list_output(store.chunk_paths(), repository, years, args, areas)
+
+
+def main():
+    global API_BASE_URL, rate_limiter, response_cache, metrics
+    global retry_policy, breakers, dead_letters
+    args = parse_args()
+    set_log_level(args.log_level)
+    API_BASE_URL = args.api_base.rstrip("/")
+    rate_limiter = TokenBucket(args.rate, args.burst)
+    if args.offline and args.no_cache:
+        raise SystemExit("[ERROR] --offline requires the response cache.")
+    if not args.no_cache:
+        response_cache = ResponseCache(
+            args.cache,
+            ttl=args.cache_ttl * 86400,
+            max_bytes=args.cache_max_mb * 1024 * 1024,
+            offline=args.offline,
+        )
+    if args.depth > 1 and args.repository_only:
+        raise SystemExit("[ERROR] --depth > 1 crawls beyond the repository; drop --repository-only.")
+    retry_policy = RetryPolicy(args.max_attempts, args.retry_base_delay)
+    breakers = Breakers(limiter=rate_limiter)
+    dead_letters = DeadLetterQueue(args.dead_letters)
+    if args.replay:
+        replay(args)
+        if response_cache is not None:
+            response_cache.close()
+        return
+
+    print("[START] Loading publication data for each area...")
+    loader = CSIndexLoader(
+        args.csindex_base, args.csindex_mirror, args.csindex_workers, offline=args.offline
+    )
+    table = loader.load(AREAS)
+    for area in AREAS:
+        stats = loader.stats[area]
+        print(f"[INFO] Sub-area '{area}' ({loader.status[area]}): {stats}")
+        if area in loader.errors:
+            print(f"[ERROR] Sub-area '{area}' could not be loaded: {loader.errors[area]}")
+        if stats.invalid:
+            print(f"[INFO] Sub-area '{area}': rejected DOI(s) (sample): {stats.rejected_samples}")
+    all_publications = publication_pairs(table)
+
+    # Log total number of publications from GitHub repository.
     print(
-        f"[INFO] Total citation/reference edges collected (before filtering): {len(all_edges)}"
+        f"[SUMMARY] Total unique publications loaded from repository: {len(all_publications)}"
     )
 
-    # Create final DataFrame with desired column order.
-    df_edges = pd.DataFrame(all_edges)
+    # Build the repository index mapping each publication DOI to its sub-area.
+    repository = build_repository_index(all_publications)
+    save_repository_index(repository)
+    years = publication_years(table)
+    save_publication_years(years)
+    print(
+        f"[INFO] Repository index contains {len(repository)} unique publication(s)"
+    )
 
-    before_drop = len(df_edges)
-    df_edges.drop_duplicates(inplace=True)
-    print(f"[INFO] Dropped {before_drop - len(df_edges)} duplicate edge(s).")
+    if args.depth > 1:
+        crawl(args, all_publications, repository, years, AREAS)
+        if response_cache is not None:
+            print(f"[SUMMARY] {response_cache.report()}")
+            response_cache.close()
+        return
+
+    # Edges are streamed to chunk files as each publication completes.
+    store = EdgeStore(args.chunk_dir, chunk_size=args.chunk_size, resume=args.resume)
+    pending_publications = all_publications
+    if args.resume:
+        done = store.completed()
+        pending_publications = [pub for pub in all_publications if pub not in done]
+        print(
+            f"[INFO] Resuming: {len(all_publications) - len(pending_publications)} publication(s) already completed, "
+            f"{len(pending_publications)} remaining"
+        )
+
+    start_time = time()
+    metrics = PipelineMetrics(total=len(pending_publications))
+    print(f"[START] Processing citations and references concurrently ({args.engine} engine)...")
+    try:
+        with metrics.progress(args.progress_interval):
+            if args.engine == "async":
+                asyncio.run(
+                    harvest_async(
+                        pending_publications,
+                        store.add,
+                        args.concurrency,
+                        rate_limiter,
+                        include_citations=not args.repository_only,
+                    )
+                )
+            else:
+                harvest_threads(
+                    pending_publications,
+                    store.add,
+                    args.workers,
+                    include_citations=not args.repository_only,
+                )
+    finally:
+        # Persist whatever was collected, even if the run is interrupted.
+        store.close()
+        metrics.save(args.metrics)
+        print(f"[COMPLETE] Request metrics saved to '{args.metrics}'.")
+
+    elapsed = time() - start_time
     print(
-        f"[SUMMARY] Unique citation/reference edges in the repository-only network: {len(df_edges)}"
+        f"[SUMMARY] Processed {len(pending_publications)} publication(s) in {elapsed:.2f} seconds."
+    )
+    print(
+        f"[INFO] Citation/reference edges collected in this run (before filtering): {store.edge_count}"
     )
 
-    output_file = "open_citations_edge_list.csv"
-    df_edges.to_csv(output_file, index=False)
-    print(f"[COMPLETE] Filtered citation edge list saved to '{output_file}'.")
+    report_failures()
+    write_edge_list_output(store.chunk_paths(), repository, years, args, AREAS)
+    if response_cache is not None:
+        print(f"[SUMMARY] {response_cache.report()}")
+        response_cache.close()
 
 
 if __name__ == "__main__":
@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 """
-Script to create separate NetworkX graphs for each specified sub-area from an edge list CSV file,
-and save each graph in GEXF format.
+Script to create separate graphs for each specified sub-area from an edge list CSV file,
+and save each graph in GEXF format (or GraphML / a compact binary format).
 
-The CSV is expected to have the following columns:
+The CSV (or Parquet) file is expected to have the following columns:
     origin_doi, target_doi, origin_sub_area, target_sub_area
 
 If either origin_sub_area or target_sub_area is empty, it is replaced with "unknown".
@@ -14,113 +14,396 @@ matches the sub-area, the corresponding nodes and edge will be added to that sub
 Graphs are saved with filenames like:
     "ai_open_citations.gexf", "se_open_citations.gexf", "arch_open_citations.gexf", etc.
 
+The edge list is loaded once into a single CitationGraph; each sub-area's edges are an
+index slice of it, and the sub-area files are written in parallel by worker processes.
+
+With --layout every sub-area graph gets node positions from graph_layout (GEXF
+viz:position elements), computed in the worker processes and cached by graph content,
+so re-exporting unchanged sub-areas reuses their layouts.
+
+Every run also stores the sorted 64-bit hashes of the edges (each hash covers both
+DOIs and both sub-areas) and a manifest with a content hash per sub-area in the output
+directory. With --incremental the new edge list is diffed against those hashes and
+only the sub-areas touched by an added or removed edge (or whose file is missing) are
+rebuilt; the other files are left untouched.
+
+With --snapshot DIR the global graph is also saved, with its query indexes, as the
+memory-mapped snapshot served by query_service.py.
+
 Usage:
-    python script_name.py input.csv
+    python generate_citation_graph.py [input.csv] [--output-dir DIR] [--workers N]
+        [--format gexf|graphml|binary] [--gzip] [--layout] [--layout-cache DIR]
+        [--snapshot DIR] [--incremental]
 """
 
-import csv
-import networkx as nx
+import os
+import json
+import time
+import hashlib
 import argparse
+import tempfile
+import concurrent.futures
+from functools import partial
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from citation_graph import UNKNOWN_CODE, CitationGraph
+from csindex_areas import AREAS, INPUT_FILE
+from graph_layout import DEFAULT_CACHE_DIR, DEFAULT_ITERATIONS, subgraph_layout
+from graph_writers import FORMATS, WRITERS, output_path
+from query_service import build_snapshot
+
+# Incremental state kept in the output directory.
+MANIFEST_FILE = "manifest.json"
+EDGE_SNAPSHOT_FILE = "edge_snapshot.npz"
+# Stored with the output options; bump it when edge_hashes changes.
+MANIFEST_VERSION = 1
 
-INPUT_FILE = "../data/open_citations_edge_list.csv"
-
-# List of sub-areas for which separate graphs will be generated.
-AREAS = [
-    "ai",
-    "arch",
-    "bio",
-    "chi",
-    "cse",
-    "data",
-    "dbis",
-    "ds",
-    "formal",
-    "graphics",
-    "hardware",
-    "ir",
-    "net",
-    "or",
-    "pl",
-    "robotics",
-    "se",
-    "security",
-    "theory",
-    "vision",
-]
 
 def create_subarea_graphs(file_path, areas):
     """
     Read the CSV file and create a dictionary of directed graphs for each sub-area.
     
-    Each row in the CSV is processed. If the row's origin_sub_area or target_sub_area
-    (after replacing empty values with "unknown") matches one of the provided sub-areas,
-    the nodes and edge from that row are added to the corresponding sub-area graph.
+    The edge list is loaded once into a compact CitationGraph. A row belongs to a
+    sub-area graph if its origin or target node has that sub-area (empty values are
+    replaced with "unknown"). The per-area NetworkX graphs are built from the
+    CitationGraph only when they are accessed, so at most one of them needs to be
+    in memory at a time.
     
     Args:
         file_path (str): Path to the CSV file.
         areas (list): List of sub-areas for which graphs will be generated.
     
     Returns:
-        dict: A dictionary mapping each sub-area (str) to its corresponding NetworkX DiGraph.
+        Mapping: A mapping from each sub-area (str) to its corresponding NetworkX DiGraph.
     """
-    # Initialize a directed graph for each sub-area.
-    graphs = { area: nx.DiGraph() for area in areas }
-    
-    # Open and read the CSV file.
-    with open(file_path, mode='r', newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            origin_doi = row['origin_doi'].strip()
-            target_doi = row['target_doi'].strip()
-            origin_sub_area = row['origin_sub_area'].strip() if row['origin_sub_area'].strip() else "unknown"
-            target_sub_area = row['target_sub_area'].strip() if row['target_sub_area'].strip() else "unknown"
-            
-            # Determine which sub-area graphs this row should be added to.
-            qualified_areas = set()
-            if origin_sub_area in areas:
-                qualified_areas.add(origin_sub_area)
-            if target_sub_area in areas:
-                qualified_areas.add(target_sub_area)
-            
-            # Add the nodes and edge to each qualified sub-area graph.
-            for area in qualified_areas:
-                # Add origin node with its sub_area attribute if not already present.
-                if origin_doi not in graphs[area]:
-                    graphs[area].add_node(origin_doi, sub_area=origin_sub_area)
-                # Add target node with its sub_area attribute if not already present.
-                if target_doi not in graphs[area]:
-                    graphs[area].add_node(target_doi, sub_area=target_sub_area)
-                # Add an edge from the origin DOI to the target DOI.
-                graphs[area].add_edge(origin_doi, target_doi)
-                
-    return graphs
-
-def save_graphs(graphs):
+    graph = CitationGraph.from_csv(file_path, areas)
+    return graph.area_graphs(areas)
+
+def save_graphs(graphs, output_dir="../data/sub_areas"):
     """
     Save each sub-area graph in the dictionary to a GEXF file.
     
     The output filename is generated using the pattern: "<sub_area>_open_citations.gexf".
     
     Args:
-        graphs (dict): A dictionary mapping sub-area (str) to its NetworkX graph.
+        graphs (Mapping): A mapping from sub-area (str) to its NetworkX graph.
+        output_dir (str): Directory for the output files.
     """
     for area, graph in graphs.items():
-        filename = f"../data/sub_areas/{area}_open_citations.gexf"
+        filename = f"{output_dir}/{area}_open_citations.gexf"
         nx.write_gexf(graph, filename)
         print(f"Graph for sub-area '{area}' saved as {filename}")
 
-def main():
-    """
-    Main function to parse command-line arguments, generate the sub-area graphs,
-    and save them in GEXF format.
+def partition_edges(graph, areas):
     """
+    Split the edges of a CitationGraph into per-sub-area index arrays in one pass.
+
+    Every edge is assigned to the sub-area of its origin node and, if different, to the
+    sub-area of its target node. A single stable sort over these assignments yields,
+    for each sub-area, the sorted edge indices (out-CSR order) of its graph.
     
+    Args:
+        graph (CitationGraph): The global citation graph.
+        areas (list): Sub-areas to partition.
+    
+    Returns:
+        dict: A dictionary mapping each sub-area (str) to an array of edge indices.
+    """
+    src, dst = graph.edges()
+    origin_codes = graph.node_area[src]
+    target_codes = graph.node_area[dst]
+    edge_ids = np.arange(graph.num_edges)
+    cross = origin_codes != target_codes
+    all_ids = np.concatenate([edge_ids, edge_ids[cross]])
+    all_codes = np.concatenate([origin_codes, target_codes[cross]])
+    order = np.lexsort((all_ids, all_codes))
+    sorted_codes = all_codes[order]
+    sorted_ids = all_ids[order]
+    partitions = {}
+    for area in areas:
+        code = graph.area_code(area)
+        lo, hi = np.searchsorted(sorted_codes, [code, code + 1])
+        partitions[area] = sorted_ids[lo:hi]
+    return partitions
+
+def node_keys(graph):
+    """
+    64-bit key of every node's DOI, computed on the UTF-8 buffer of the node table
+    without decoding it: a polynomial hash of the bytes, mixed with the length.
+    """
+    offsets = np.asarray(graph.doi_offsets, dtype=np.int64)
+    data = np.asarray(graph.doi_bytes).astype(np.uint64)
+    lengths = np.diff(offsets)
+    if not len(data):
+        return pd.util.hash_array(lengths.astype(np.uint64))
+    powers = np.ones(int(lengths.max()), dtype=np.uint64)
+    powers[1:] = np.cumprod(np.full(len(powers) - 1, 0x100000001B3, dtype=np.uint64))
+    position = np.arange(len(data)) - np.repeat(offsets[:-1], lengths)
+    sums = np.add.reduceat(data * powers[position], np.minimum(offsets[:-1], len(data) - 1))
+    sums[lengths == 0] = 0
+    return pd.util.hash_array(sums ^ lengths.astype(np.uint64))
+
+def edge_hashes(graph):
+    """
+    Hash every edge of a CitationGraph together with the sub-areas of its endpoints.
+
+    Returns:
+        tuple: (uint64 hashes, (num_edges, 2) uint8 origin/target area codes), in
+        out-CSR edge order.
+    """
+    keys = node_keys(graph) ^ pd.util.hash_array(np.asarray(graph.node_area, dtype=np.uint64))
+    src, dst = graph.edges()
+    combined = keys[src] * np.uint64(0x9E3779B97F4A7C15) + keys[dst]
+    codes = np.column_stack([graph.node_area[src], graph.node_area[dst]]).astype(np.uint8)
+    return pd.util.hash_array(combined), codes
+
+def area_hash(hashes, edge_ids):
+    """Content hash of one sub-area graph: a digest of its sorted edge hashes."""
+    return hashlib.blake2b(np.sort(hashes[edge_ids]).tobytes(), digest_size=16).hexdigest()
+
+def changed_areas(old_hashes, old_codes, new_hashes, new_codes, areas):
+    """
+    Diff two sorted edge-hash multisets and return the sub-areas they affect.
+
+    The two sorted arrays are merged; a hash whose count differs between them (an
+    added, removed or duplicated edge) affects the sub-areas of its two endpoints.
+
+    Returns:
+        tuple: (set of affected sub-areas, number of changed edge hashes).
+    """
+    if np.array_equal(old_hashes, new_hashes) and np.array_equal(old_codes, new_codes):
+        return set(), 0
+    values = np.concatenate([old_hashes, new_hashes])
+    # A stable sort of two sorted runs is a single merge.
+    order = np.argsort(values, kind="stable")
+    values = values[order]
+    sign = np.where(order < len(old_hashes), 1, -1)
+    starts = np.flatnonzero(np.concatenate([[True], values[1:] != values[:-1]]))
+    changed = np.add.reduceat(sign, starts) != 0
+    run = np.cumsum(np.concatenate([[True], values[1:] != values[:-1]])) - 1
+    codes = np.concatenate([old_codes, new_codes])[order[changed[run]]]
+    affected = {areas[code] for code in np.unique(codes).tolist() if code != UNKNOWN_CODE}
+    return affected, int(changed.sum())
+
+def load_incremental_state(output_dir, options):
+    """
+    Return (manifest, sorted hashes, codes) saved by the last run, or None when there is
+    none or it was written with different output options.
+    """
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    snapshot_path = os.path.join(output_dir, EDGE_SNAPSHOT_FILE)
+    if not (os.path.exists(manifest_path) and os.path.exists(snapshot_path)):
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get("options") != options:
+        return None
+    with np.load(snapshot_path) as snapshot:
+        return manifest, snapshot["hashes"], snapshot["codes"]
+
+def save_incremental_state(output_dir, manifest, hashes, codes):
+    """Atomically save the manifest and the sorted edge hashes (with their area codes)."""
+    snapshot_path = os.path.join(output_dir, EDGE_SNAPSHOT_FILE)
+    with open(snapshot_path + ".tmp", "wb") as f:
+        np.savez(f, hashes=hashes, codes=codes)
+    os.replace(snapshot_path + ".tmp", snapshot_path)
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+def _export_area(snapshot_dir, area, edge_ids, filename, fmt, compress, layout=None):
+    """Worker: load the memory-mapped snapshot and stream one area graph to disk."""
+    start = time.perf_counter()
+    graph = CitationGraph.load(snapshot_dir)
+    WRITERS[fmt](graph, filename, edge_ids, compress, layout)
+    return area, filename, time.perf_counter() - start
+
+def save_graphs_parallel(
+    graph,
+    partitions,
+    output_dir="../data/sub_areas",
+    workers=None,
+    fmt="gexf",
+    compress=False,
+    layout=None,
+):
+    """
+    Write each sub-area graph to "<output_dir>/<sub_area>_open_citations.<ext>" in parallel.
+
+    The global graph is saved once as a .npy snapshot that every worker process
+    memory-maps, so only the per-area edge indices are sent to the workers. Files are
+    written by the streaming writers in graph_writers.
     
-    # Create a dictionary of graphs, one per sub-area.
-    subarea_graphs = create_subarea_graphs(INPUT_FILE, AREAS)
+    Args:
+        graph (CitationGraph): The global citation graph.
+        partitions (dict): Sub-area -> edge indices, as returned by partition_edges.
+        output_dir (str): Directory for the output files.
+        workers (int): Number of worker processes (default: one per CPU).
+        fmt (str): Output format: "gexf", "graphml" or "binary".
+        compress (bool): Gzip the XML formats (or compress the binary archive).
+        layout (callable): Node position function passed to the writers (a picklable
+            partial of graph_layout.subgraph_layout), or None for no positions.
     
-    # Save each graph to its corresponding GEXF file.
-    save_graphs(subarea_graphs)
+    Returns:
+        dict: A dictionary mapping each sub-area (str) to its write time in seconds.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    timings = {}
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        graph.save(snapshot_dir)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    _export_area,
+                    snapshot_dir,
+                    area,
+                    edge_ids,
+                    output_path(output_dir, area, fmt, compress),
+                    fmt,
+                    compress,
+                    layout,
+                )
+                for area, edge_ids in partitions.items()
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                area, filename, seconds = future.result()
+                timings[area] = seconds
+                print(f"Graph for sub-area '{area}' saved as {filename}")
+    return timings
+
+def main():
+    """
+    Main function to parse command-line arguments, build the global citation graph once,
+    partition it by sub-area and save the sub-area graphs in GEXF format in parallel.
+    """
+    parser = argparse.ArgumentParser(
+        description="Generate one GEXF citation graph per CSIndex sub-area."
+    )
+    parser.add_argument(
+        "input", nargs="?", default=INPUT_FILE, help="Edge list file (.csv or .parquet)."
+    )
+    parser.add_argument(
+        "--output-dir", default="../data/sub_areas", help="Directory for the output files."
+    )
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default="gexf",
+        help="Output format: GEXF (Gephi), GraphML or binary .npz (default: gexf).",
+    )
+    parser.add_argument(
+        "--gzip", action="store_true", help="Compress the output files."
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Export processes (default: one per CPU)."
+    )
+    parser.add_argument(
+        "--layout", action="store_true", help="Write force-directed node positions."
+    )
+    parser.add_argument(
+        "--layout-cache",
+        default=DEFAULT_CACHE_DIR,
+        help=f"Layout cache directory, '' to disable it (default: {DEFAULT_CACHE_DIR}).",
+    )
+    parser.add_argument(
+        "--layout-iterations", type=int, default=DEFAULT_ITERATIONS, help="Layout iterations."
+    )
+    parser.add_argument(
+        "--snapshot", help="Also save the graph as a query_service.py snapshot in this directory."
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only rebuild the sub-areas whose edges changed since the last run.",
+    )
+    args = parser.parse_args()
+    layout = None
+    if args.layout:
+        layout = partial(
+            subgraph_layout, cache_dir=args.layout_cache, iterations=args.layout_iterations
+        )
+
+    timings = {}
+    start = time.perf_counter()
+    graph = CitationGraph.from_file(args.input, AREAS)
+    timings["load"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    hashes, codes = edge_hashes(graph)
+    order = np.argsort(hashes, kind="stable")
+    sorted_hashes, sorted_codes = hashes[order], codes[order]
+    options = {
+        "version": MANIFEST_VERSION,
+        "format": args.format,
+        "compress": args.gzip,
+        "layout": args.layout_iterations if args.layout else None,
+    }
+    state = load_incremental_state(args.output_dir, options) if args.incremental else None
+    areas = AREAS
+    if state is not None:
+        manifest, old_hashes, old_codes = state
+        affected, changed = changed_areas(old_hashes, old_codes, sorted_hashes, sorted_codes, AREAS)
+        missing = {
+            area
+            for area in AREAS
+            if area not in manifest["areas"]
+            or not os.path.exists(output_path(args.output_dir, area, args.format, args.gzip))
+        }
+        areas = [area for area in AREAS if area in affected | missing]
+        print(
+            f"[INFO] {changed} changed edge hash(es); rebuilding {len(areas)} of {len(AREAS)} "
+            f"sub-area(s): {', '.join(areas) or 'none'}"
+        )
+    else:
+        if args.incremental:
+            print("[INFO] No matching incremental state; rebuilding every sub-area")
+        manifest = {"options": options, "areas": {}}
+    timings["diff"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    partitions = partition_edges(graph, areas)
+    timings["partition"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    area_timings = {}
+    if partitions:
+        area_timings = save_graphs_parallel(
+            graph, partitions, args.output_dir, args.workers, args.format, args.gzip, layout
+        )
+    timings["export"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for area in areas:
+        manifest["areas"][area] = {
+            "file": os.path.basename(output_path(args.output_dir, area, args.format, args.gzip)),
+            "edges": len(partitions[area]),
+            "hash": area_hash(hashes, partitions[area]),
+        }
+    manifest["edges"] = graph.num_edges
+    save_incremental_state(args.output_dir, manifest, sorted_hashes, sorted_codes)
+    timings["manifest"] = time.perf_counter() - start
+
+    if args.snapshot:
+        start = time.perf_counter()
+        build_snapshot(graph, args.snapshot)
+        timings["snapshot"] = time.perf_counter() - start
+
+    print(
+        f"Loaded {graph.num_nodes} node(s) and {graph.num_edges} edge(s) from {args.input}"
+    )
+    print("Timing breakdown:")
+    for stage, seconds in timings.items():
+        print(f"  {stage:<12}{seconds:8.2f} s")
+    for area in AREAS:
+        if area in area_timings:
+            print(
+                f"    {area:<10}{area_timings[area]:8.2f} s  ({len(partitions[area])} edge(s))"
+            )
+        else:
+            print(f"    {area:<10}{'unchanged':>10}  ({manifest['areas'][area]['edges']} edge(s))")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Force-directed layout of citation graphs on integer edge arrays, with a layout cache.
+
+nx.spring_layout computes all node pairs in every iteration (O(n^2)), which does not
+scale to the repository graph. force_layout is a Fruchterman-Reingold layout in
+vectorized NumPy:
+
+    - repulsion is approximated Barnes-Hut style on a hierarchy of square grids: every
+      node is pushed by the centroids of the cells in its interaction list (the
+      children of its parent cell's neighbours that are not its own neighbours) at
+      each level, and exactly by the nodes in its own and adjacent finest cells
+    - attraction runs over the (undirected, deduplicated) edge arrays
+    - the graph is first coarsened by repeated handshake matching of neighbours; the
+      coarsest graph is laid out, then positions are prolonged and refined level by
+      level (multilevel), so the finest level needs few iterations
+
+A layout is keyed by a hash of the graph content (node labels, edges and layout
+parameters). The random seed is derived from that key, so the same graph always gets
+the same layout, and LayoutCache stores the result under the key: exporting an
+unchanged graph again reuses its positions instantly.
+
+Usage:
+    python graph_layout.py edges.csv output.gexf [--cache ../cache/layouts] [--iterations 100] [--gzip]
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = "../cache/layouts"
+DEFAULT_ITERATIONS = 100
+# Part of the cache key: bump it when the algorithm changes.
+LAYOUT_VERSION = 1
+
+# Linear pull towards the centroid. The repulsion of a uniform disc of total mass M
+# grows linearly with the radius (M r / R^2), so this pull keeps the layout a disc of
+# radius ~sqrt(M) and stops disconnected nodes from drifting away (which would also
+# stretch the grids of the repulsion).
+GRAVITY = 1.0
+# Coarsening stops at this many nodes (or when matching no longer shrinks the graph).
+COARSEST_SIZE = 500
+# The finest grid level is raised until the exact near-field pairs fit this budget.
+NEAR_PAIRS_PER_NODE = 64
+MAX_GRID_LEVEL = 10
+# Nodes per block of the vectorized far-field evaluation (bounds its temporaries).
+_CHUNK = 32_768
+
+# Interaction list of a cell: the children of the parent's 3x3 neighbourhood (a 6x6
+# block whose position depends on the cell's parity) minus the cell's own 3x3 neighbours.
+_FAR_OFFSETS = [(dx, dy) for dx in range(-3, 4) for dy in range(-3, 4) if max(abs(dx), abs(dy)) > 1]
+_FAR_DX = np.array([dx for dx, _ in _FAR_OFFSETS])
+_FAR_DY = np.array([dy for _, dy in _FAR_OFFSETS])
+# _FAR_VALID[2 * (x & 1) + (y & 1)]: which offsets are in the list of a cell of that parity.
+_FAR_VALID = np.array(
+    [
+        (_FAR_DX >= -2 - px) & (_FAR_DX <= 3 - px) & (_FAR_DY >= -2 - py) & (_FAR_DY <= 3 - py)
+        for px in (0, 1)
+        for py in (0, 1)
+    ],
+    dtype=float,
+)
+_NEAR_OFFSETS = [(dx, dy) for dx in range(-1, 2) for dy in range(-1, 2)]
+
+
+def _grid(unit: np.ndarray, level: int) -> tuple:
+    """Cell coordinates (n, 2) of unit-square positions on a 2^level grid, and its size."""
+    size = 1 << level
+    return np.minimum((unit * size).astype(np.int64), size - 1), size
+
+
+def _near_pairs(counts: np.ndarray) -> int:
+    """Number of (node, node) pairs in the same or adjacent cells of a count grid."""
+    padded = np.pad(counts, 1)
+    box = sum(
+        padded[1 + dx : 1 + dx + counts.shape[0], 1 + dy : 1 + dy + counts.shape[1]]
+        for dx, dy in _NEAR_OFFSETS
+    )
+    return int((counts * box).sum())
+
+
+def _finest_level(unit: np.ndarray, n: int) -> int:
+    level = max(2, math.ceil(math.log(max(n, 2) / 2, 4)))
+    while level < MAX_GRID_LEVEL:
+        cells, size = _grid(unit, level)
+        counts = np.bincount(cells[:, 0] * size + cells[:, 1], minlength=size * size)
+        if _near_pairs(counts.reshape(size, size)) <= NEAR_PAIRS_PER_NODE * n:
+            break
+        level += 1
+    return level
+
+
+def repulsion(pos: np.ndarray, mass: np.ndarray, k2: float) -> np.ndarray:
+    """
+    Approximate repulsive forces k2 * m_j / d (along p_i - p_j) on every node.
+
+    Returns:
+        np.ndarray: (n, 2) force vectors.
+    """
+    n = len(pos)
+    forces = np.zeros_like(pos)
+    low = pos.min(axis=0)
+    span = max(float((pos.max(axis=0) - low).max()), 1e-9) * (1 + 1e-9)
+    unit = (pos - low) / span
+    finest = _finest_level(unit, n)
+
+    for level in range(2, finest + 1):
+        cells, size = _grid(unit, level)
+        # Grids padded by 3 empty cells on every side, so no offset leaves them.
+        padded = size + 6
+        flat = (cells[:, 0] + 3) * padded + cells[:, 1] + 3
+        occupied, cell_of = np.unique(flat, return_inverse=True)
+        occupied_mass = np.bincount(cell_of, mass)
+        center_x = np.bincount(cell_of, mass * pos[:, 0]) / occupied_mass
+        center_y = np.bincount(cell_of, mass * pos[:, 1]) / occupied_mass
+        cell_mass = np.zeros(padded * padded)
+        centroid_x = np.zeros(padded * padded)
+        centroid_y = np.zeros(padded * padded)
+        cell_mass[occupied] = occupied_mass
+        centroid_x[occupied] = center_x
+        centroid_y[occupied] = center_y
+
+        # Field of the interaction list at every occupied cell centroid, and its
+        # Jacobian, so the nodes get a first-order (local expansion) approximation.
+        fx, fy, jxx, jxy, jyy = (np.empty(len(occupied)) for _ in range(5))
+        parity = ((occupied // padded - 3) & 1) * 2 + ((occupied % padded - 3) & 1)
+        shift = _FAR_DX * padded + _FAR_DY
+        for start in range(0, len(occupied), _CHUNK):
+            chunk = slice(start, start + _CHUNK)
+            target = occupied[chunk, None] + shift
+            weight = cell_mass[target] * _FAR_VALID[parity[chunk]]
+            delta_x = center_x[chunk, None] - centroid_x[target]
+            delta_y = center_y[chunk, None] - centroid_y[target]
+            inverse = 1.0 / np.maximum(delta_x**2 + delta_y**2, 1e-12)
+            factor = weight * inverse
+            fx[chunk] = (delta_x * factor).sum(axis=1)
+            fy[chunk] = (delta_y * factor).sum(axis=1)
+            factor *= 2 * inverse
+            jxx[chunk] = (weight * inverse - delta_x**2 * factor).sum(axis=1)
+            jyy[chunk] = (weight * inverse - delta_y**2 * factor).sum(axis=1)
+            jxy[chunk] = -(delta_x * delta_y * factor).sum(axis=1)
+        offset_x = pos[:, 0] - center_x[cell_of]
+        offset_y = pos[:, 1] - center_y[cell_of]
+        forces[:, 0] += k2 * (fx[cell_of] + jxx[cell_of] * offset_x + jxy[cell_of] * offset_y)
+        forces[:, 1] += k2 * (fy[cell_of] + jxy[cell_of] * offset_x + jyy[cell_of] * offset_y)
+
+    # Exact forces between nodes in the same or adjacent finest cells.
+    cells, size = _grid(unit, finest)
+    flat = cells[:, 0] * size + cells[:, 1]
+    order = np.argsort(flat, kind="stable")
+    counts = np.bincount(flat, minlength=size * size)
+    starts = np.cumsum(counts) - counts
+    for dx, dy in _NEAR_OFFSETS:
+        other_x = cells[:, 0] + dx
+        other_y = cells[:, 1] + dy
+        nodes = np.flatnonzero((other_x >= 0) & (other_x < size) & (other_y >= 0) & (other_y < size))
+        target = other_x[nodes] * size + other_y[nodes]
+        number = counts[target]
+        total = int(number.sum())
+        if not total:
+            continue
+        first = np.cumsum(number) - number
+        i = np.repeat(nodes, number)
+        j = order[np.repeat(starts[target], number) + np.arange(total) - np.repeat(first, number)]
+        distinct = i != j
+        i, j = i[distinct], j[distinct]
+        delta = pos[i] - pos[j]
+        factor = k2 * mass[j] / np.maximum((delta**2).sum(axis=1), 1e-12)
+        forces[:, 0] += np.bincount(i, delta[:, 0] * factor, n)
+        forces[:, 1] += np.bincount(i, delta[:, 1] * factor, n)
+    return forces
+
+
+def attraction(pos: np.ndarray, src: np.ndarray, dst: np.ndarray, weight: np.ndarray, k: float) -> np.ndarray:
+    """Attractive forces w * d^2 / k along every (undirected) edge."""
+    delta = pos[dst] - pos[src]
+    factor = weight * np.sqrt((delta**2).sum(axis=1)) / k
+    forces = np.zeros_like(pos)
+    for axis in range(2):
+        pull = delta[:, axis] * factor
+        forces[:, axis] = np.bincount(src, pull, len(pos)) - np.bincount(dst, pull, len(pos))
+    return forces
+
+
+def _run(pos, src, dst, weight, mass, iterations: int, start_temperature: float) -> np.ndarray:
+    """
+    Fruchterman-Reingold iterations with k = 1, central gravity and a linearly cooling
+    step limit.
+    """
+    for step in range(iterations):
+        forces = repulsion(pos, mass, 1.0) + attraction(pos, src, dst, weight, 1.0)
+        forces -= GRAVITY * (pos - np.average(pos, axis=0, weights=mass))
+        length = np.maximum(np.sqrt((forces**2).sum(axis=1)), 1e-12)
+        temperature = start_temperature * (1 - step / iterations)
+        pos = pos + forces * (np.minimum(length, temperature) / length)[:, None]
+    return pos
+
+
+def _best_neighbor(n: int, u: np.ndarray, v: np.ndarray, priority: np.ndarray) -> np.ndarray:
+    """Neighbour on the highest-priority edge of every node (the node itself if none)."""
+    order = np.lexsort((-priority, u))
+    first = np.unique(u[order], return_index=True)[1]
+    best = np.arange(n)
+    best[u[order][first]] = v[order][first]
+    return best
+
+
+def _coarsen(n: int, src: np.ndarray, dst: np.ndarray, weight: np.ndarray, rng, rounds: int = 3) -> tuple:
+    """
+    Group nodes for the next coarser level.
+
+    A few rounds of handshake matching (every unmatched node picks the unmatched
+    neighbour on its heaviest, randomly tie-broken edge; mutual picks are merged), then
+    every node left unmatched joins the group of its heaviest matched neighbour, which
+    folds the leaves of citation hubs into the hub.
+
+    Returns:
+        tuple: (parent of every node, number of coarse nodes).
+    """
+    u = np.concatenate([src, dst])
+    v = np.concatenate([dst, src])
+    priority = np.concatenate([weight, weight]) * (1 + rng.random(len(u)))
+    nodes = np.arange(n)
+    representative = nodes.copy()
+    matched = np.zeros(n, dtype=bool)
+    for _ in range(rounds):
+        live = ~matched[u] & ~matched[v]
+        if not live.any():
+            break
+        pick = _best_neighbor(n, u[live], v[live], priority[live])
+        merged = (pick[pick] == nodes) & (pick > nodes)
+        representative[pick[merged]] = nodes[merged]
+        matched[merged] = True
+        matched[pick[merged]] = True
+    best = _best_neighbor(n, u, v, priority)
+    lone = ~matched & matched[best]
+    representative[lone] = representative[best[lone]]
+    unique, parent = np.unique(representative, return_inverse=True)
+    return parent, len(unique)
+
+
+def _undirected(src: np.ndarray, dst: np.ndarray, n: int) -> tuple:
+    """Deduplicated undirected edges without self-loops, with their multiplicity as weight."""
+    low = np.minimum(src, dst).astype(np.int64)
+    high = np.maximum(src, dst).astype(np.int64)
+    keep = low != high
+    keys, weight = np.unique(low[keep] * n + high[keep], return_counts=True)
+    return keys // n, keys % n, weight.astype(float)
+
+
+def force_layout(
+    num_nodes: int, src: np.ndarray, dst: np.ndarray, iterations: int = DEFAULT_ITERATIONS, seed: int = 0
+) -> np.ndarray:
+    """
+    Multilevel force-directed layout.
+
+    Args:
+        num_nodes (int): Number of nodes (ids 0..num_nodes-1).
+        src, dst (np.ndarray): Edge endpoints; direction and duplicates are ignored.
+        iterations (int): Iterations on the coarsest graph (each finer level runs a
+            quarter of them, at least 10).
+        seed (int): Random seed of the initial positions and the matching.
+
+    Returns:
+        np.ndarray: (num_nodes, 2) float32 positions scaled to [-1, 1] around the origin.
+    """
+    if num_nodes <= 1:
+        return np.zeros((num_nodes, 2), dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    src, dst, weight = _undirected(np.asarray(src), np.asarray(dst), num_nodes)
+
+    levels = [(num_nodes, src, dst, weight, np.ones(num_nodes))]
+    parents = []
+    while levels[-1][0] > COARSEST_SIZE and len(levels) < 64:
+        n, s, d, w, m = levels[-1]
+        parent, coarse = _coarsen(n, s, d, w, rng)
+        if coarse > 0.9 * n:
+            break
+        cs, cd, cw = parent[s], parent[d], w
+        keep = cs != cd
+        low, high = np.minimum(cs[keep], cd[keep]), np.maximum(cs[keep], cd[keep])
+        keys, inverse = np.unique(low * coarse + high, return_inverse=True)
+        parents.append(parent)
+        levels.append(
+            (coarse, keys // coarse, keys % coarse, np.bincount(inverse, cw[keep]), np.bincount(parent, m))
+        )
+
+    n, s, d, w, m = levels[-1]
+    side = math.sqrt(m.sum())
+    pos = rng.random((n, 2)) * side
+    pos = _run(pos, s, d, w, m, iterations, 0.1 * side)
+    for (n, s, d, w, m), parent in zip(reversed(levels[:-1]), reversed(parents)):
+        # Spread the members of a group over a disc whose area grows with the group
+        # mass, so large folded groups (hubs and their leaves) do not start stacked up.
+        coarse_mass = np.bincount(parent, m)
+        radius = 0.5 * np.sqrt(coarse_mass[parent]) * np.sqrt(rng.random(n))
+        angle = rng.random(n) * 2 * np.pi
+        pos = pos[parent] + np.column_stack([radius * np.cos(angle), radius * np.sin(angle)])
+        pos = _run(pos, s, d, w, m, max(10, iterations // 4), 0.02 * side)
+
+    pos -= pos.mean(axis=0)
+    extent = np.abs(pos).max()
+    if extent > 0:
+        pos /= extent
+    return pos.astype(np.float32)
+
+
+def content_key(num_nodes: int, src: np.ndarray, dst: np.ndarray, labels: bytes = b"", **params) -> str:
+    """Hash of a graph (node labels and edges) and of the layout parameters."""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(json.dumps({"version": LAYOUT_VERSION, "nodes": num_nodes, **params}, sort_keys=True).encode())
+    digest.update(np.ascontiguousarray(src, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(dst, dtype=np.int64).tobytes())
+    digest.update(labels)
+    return digest.hexdigest()
+
+
+class LayoutCache:
+    """Directory of computed layouts, one <key>.npy file per graph content hash."""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def get(self, key: str):
+        """Return the cached positions, or None."""
+        path = self.path(key)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return np.load(path)
+
+    def put(self, key: str, positions: np.ndarray) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, positions)
+        os.replace(tmp_path, self.path(key))
+
+
+def cached_layout(
+    num_nodes: int,
+    src: np.ndarray,
+    dst: np.ndarray,
+    labels: bytes = b"",
+    cache: LayoutCache = None,
+    iterations: int = DEFAULT_ITERATIONS,
+) -> np.ndarray:
+    """force_layout seeded by the content key, served from (and stored in) the cache."""
+    key = content_key(num_nodes, src, dst, labels, iterations=iterations)
+    positions = cache.get(key) if cache is not None else None
+    if positions is None:
+        positions = force_layout(num_nodes, src, dst, iterations, seed=int(key[:16], 16))
+        if cache is not None:
+            cache.put(key, positions)
+    return positions
+
+
+def subgraph_layout(
+    graph, nodes: np.ndarray, src: np.ndarray, dst: np.ndarray,
+    cache_dir: str = DEFAULT_CACHE_DIR, iterations: int = DEFAULT_ITERATIONS,
+) -> np.ndarray:
+    """
+    Layout of a CitationGraph subset as returned by graph_writers.subgraph_arrays.
+
+    This is the `layout` callable of the graph writers; the DOIs of the nodes are part
+    of the cache key.
+    """
+    from graph_writers import gather_doi_bytes
+
+    doi_bytes, doi_offsets = gather_doi_bytes(graph, nodes)
+    labels = doi_bytes.tobytes() + doi_offsets.tobytes()
+    cache = LayoutCache(cache_dir) if cache_dir else None
+    return cached_layout(len(nodes), src, dst, labels, cache, iterations)
+
+
+def main():
+    from functools import partial
+
+    from citation_graph import CitationGraph
+    from csindex_areas import AREAS
+    from graph_writers import write_gexf
+
+    parser = argparse.ArgumentParser(description="Lay out an edge list and write it as GEXF with node positions.")
+    parser.add_argument("input", help="Edge list file (.csv or .parquet).")
+    parser.add_argument("output", help="GEXF file to write.")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_DIR, help="Layout cache directory ('' disables it).")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="Layout iterations.")
+    parser.add_argument("--gzip", action="store_true", help="Compress the output file.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    graph = CitationGraph.from_file(args.input, AREAS)
+    print(f"[INFO] Loaded {graph.num_nodes} node(s) and {graph.num_edges} edge(s) from {args.input}")
+    layout = partial(subgraph_layout, cache_dir=args.cache, iterations=args.iterations)
+    write_gexf(graph, args.output, compress=args.gzip, layout=layout)
+    print(f"[COMPLETE] Graph with positions saved to '{args.output}' in {time.perf_counter() - start:.2f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Graph metrics on sparse adjacency matrices.
+
+The metrics are computed on a scipy.sparse CSR adjacency matrix built directly from a
+CitationGraph (no NetworkX graph is ever created), so every iteration is a sparse
+matrix-vector product:
+
+    - in/out-degree
+    - PageRank (power iteration; same dangling-node and convergence rules as
+      networkx.pagerank, with a configurable damping factor)
+    - HITS hub/authority scores (leading singular vectors, as in networkx.hits)
+    - reciprocity (share of edges whose reverse edge also exists; self-loops excluded)
+
+Metrics are computed for the whole graph (one row per node, aggregated per sub-area of
+the nodes) and, optionally, for every sub-area graph as built by
+generate_citation_graph (edges with at least one endpoint in the area). Sub-area graphs
+are independent, so they are processed by a thread pool; the sparse kernels run in
+compiled code.
+
+Usage:
+    python graph_metrics.py [edges.csv|edges.parquet] [--alpha 0.85] [--per-area]
+        [--workers N] [--nodes node_metrics.csv] [--areas area_metrics.csv]
+"""
+
+import argparse
+import concurrent.futures
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+from citation_graph import CitationGraph
+from csindex_areas import AREAS, INPUT_FILE
+from generate_citation_graph import partition_edges
+from graph_writers import subgraph_arrays
+
+DEFAULT_ALPHA = 0.85
+
+
+def adjacency(src: np.ndarray, dst: np.ndarray, num_nodes: int) -> sp.csr_matrix:
+    """Return the (num_nodes x num_nodes) 0/1 adjacency matrix of the given edges."""
+    data = np.ones(len(src), dtype=np.float64)
+    matrix = sp.csr_matrix((data, (src, dst)), shape=(num_nodes, num_nodes))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1.0
+    return matrix
+
+
+def graph_adjacency(graph: CitationGraph) -> sp.csr_matrix:
+    """Adjacency matrix of a CitationGraph, sharing its out-CSR arrays."""
+    data = np.ones(graph.num_edges, dtype=np.float64)
+    return sp.csr_matrix(
+        (data, np.asarray(graph.out_indices), np.asarray(graph.out_indptr)),
+        shape=(graph.num_nodes, graph.num_nodes),
+    )
+
+
+def pagerank(
+    matrix: sp.csr_matrix,
+    alpha: float = DEFAULT_ALPHA,
+    max_iter: int = 100,
+    tol: float = 1.0e-6,
+) -> np.ndarray:
+    """
+    PageRank by power iteration.
+
+    As in networkx.pagerank: the rank of dangling nodes (no out-edges) is spread
+    uniformly, the teleport vector is uniform, and iteration stops when the L1 change
+    is below num_nodes * tol.
+
+    Raises:
+        RuntimeError: If the iteration does not converge within max_iter.
+    """
+    num_nodes = matrix.shape[0]
+    if num_nodes == 0:
+        return np.zeros(0)
+    out_degree = np.asarray(matrix.sum(axis=1)).ravel()
+    dangling = out_degree == 0
+    inverse = np.divide(1.0, out_degree, out=np.zeros_like(out_degree), where=~dangling)
+    # Transition matrix transposed, so one step is a single CSR product.
+    transition = (sp.diags(inverse) @ matrix).T.tocsr()
+    rank = np.full(num_nodes, 1.0 / num_nodes)
+    for _ in range(max_iter):
+        previous = rank
+        rank = alpha * (transition @ previous + previous[dangling].sum() / num_nodes)
+        rank += (1.0 - alpha) / num_nodes
+        if np.abs(rank - previous).sum() < num_nodes * tol:
+            return rank
+    raise RuntimeError(f"PageRank did not converge in {max_iter} iterations")
+
+
+def hits(matrix: sp.csr_matrix, max_iter: int = 100, tol: float = 1.0e-8) -> tuple:
+    """
+    HITS hub and authority scores.
+
+    As in networkx.hits, the authorities are the leading right singular vector of the
+    adjacency matrix (computed with ARPACK), the hubs are A @ authorities, and both are
+    normalized to sum to 1.
+
+    Returns:
+        tuple: (hubs, authorities) as float64 arrays.
+
+    Raises:
+        RuntimeError: If ARPACK does not converge within max_iter.
+    """
+    num_nodes = matrix.shape[0]
+    if num_nodes == 0 or matrix.nnz == 0:
+        uniform = np.full(num_nodes, 1.0 / num_nodes) if num_nodes else np.zeros(0)
+        return uniform, uniform.copy()
+    if min(matrix.shape) < 2:
+        # svds needs k < min(shape); a 1x1 graph with a self-loop is its own hub/authority.
+        return np.ones(1), np.ones(1)
+    try:
+        _, _, vt = spla.svds(matrix, k=1, maxiter=max_iter, tol=tol)
+    except spla.ArpackNoConvergence as error:
+        raise RuntimeError(f"HITS did not converge in {max_iter} iterations") from error
+    authorities = vt.ravel().real
+    hubs = matrix @ authorities
+    return hubs / hubs.sum(), authorities / authorities.sum()
+
+
+def reciprocity(matrix: sp.csr_matrix) -> float:
+    """Share of (non self-loop) edges A -> B for which B -> A is also an edge."""
+    off_diagonal = matrix - sp.diags(matrix.diagonal())
+    off_diagonal.eliminate_zeros()
+    if off_diagonal.nnz == 0:
+        return 0.0
+    return off_diagonal.multiply(off_diagonal.T).nnz / off_diagonal.nnz
+
+
+def node_metrics(
+    matrix: sp.csr_matrix, alpha: float = DEFAULT_ALPHA
+) -> pd.DataFrame:
+    """Return in/out-degree, PageRank and HITS scores for every node of an adjacency matrix."""
+    hubs, authorities = hits(matrix)
+    return pd.DataFrame(
+        {
+            "in_degree": np.asarray(matrix.sum(axis=0)).ravel().astype(np.int64),
+            "out_degree": np.diff(matrix.indptr).astype(np.int64),
+            "pagerank": pagerank(matrix, alpha),
+            "hub": hubs,
+            "authority": authorities,
+        }
+    )
+
+
+def graph_metrics(graph: CitationGraph, alpha: float = DEFAULT_ALPHA) -> tuple:
+    """
+    Metrics of the whole graph.
+
+    Returns:
+        tuple: (nodes, summary) where nodes is a DataFrame with one row per node
+        (doi, sub_area and the node_metrics columns) and summary a dict of graph totals.
+    """
+    matrix = graph_adjacency(graph)
+    nodes = node_metrics(matrix, alpha)
+    nodes.insert(0, "doi", graph.dois())
+    nodes.insert(1, "sub_area", [graph.area_name(code) for code in graph.node_area.tolist()])
+    summary = {
+        "nodes": graph.num_nodes,
+        "edges": graph.num_edges,
+        "reciprocity": reciprocity(matrix),
+    }
+    return nodes, summary
+
+
+def aggregate_by_area(nodes: pd.DataFrame) -> pd.DataFrame:
+    """Per-sub-area totals of a node metrics table (nodes grouped by their own sub-area)."""
+    return nodes.groupby("sub_area", sort=True).agg(
+        nodes=("doi", "size"),
+        in_degree_mean=("in_degree", "mean"),
+        out_degree_mean=("out_degree", "mean"),
+        pagerank_sum=("pagerank", "sum"),
+        pagerank_max=("pagerank", "max"),
+        hub_sum=("hub", "sum"),
+        authority_sum=("authority", "sum"),
+    )
+
+
+def area_metrics(graph: CitationGraph, area: str, edge_ids: np.ndarray, alpha: float = DEFAULT_ALPHA) -> dict:
+    """Metrics of one sub-area graph (the edges in edge_ids), with its top node by PageRank."""
+    nodes, src, dst = subgraph_arrays(graph, edge_ids)
+    matrix = adjacency(src, dst, len(nodes))
+    metrics = node_metrics(matrix, alpha)
+    num_nodes = len(nodes)
+    top = int(metrics["pagerank"].to_numpy().argmax()) if num_nodes else None
+    return {
+        "sub_area": area,
+        "nodes": num_nodes,
+        "edges": int(matrix.nnz),
+        "density": matrix.nnz / (num_nodes * (num_nodes - 1)) if num_nodes > 1 else 0.0,
+        "reciprocity": reciprocity(matrix),
+        "in_degree_max": int(metrics["in_degree"].max()) if num_nodes else 0,
+        "out_degree_max": int(metrics["out_degree"].max()) if num_nodes else 0,
+        "top_pagerank_doi": graph.doi(int(nodes[top])) if top is not None else None,
+        "top_pagerank": float(metrics["pagerank"].iloc[top]) if top is not None else None,
+    }
+
+
+def all_area_metrics(
+    graph: CitationGraph, areas: list = AREAS, alpha: float = DEFAULT_ALPHA, workers: int = 1
+) -> pd.DataFrame:
+    """Compute area_metrics for every sub-area graph, using `workers` threads."""
+    partitions = partition_edges(graph, areas)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        rows = list(
+            executor.map(lambda area: area_metrics(graph, area, partitions[area], alpha), areas)
+        )
+    return pd.DataFrame(rows).set_index("sub_area")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute citation graph metrics with sparse matrices.")
+    parser.add_argument("input", nargs="?", default=INPUT_FILE, help="Edge list (.csv or .parquet).")
+    parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA, help="PageRank damping factor.")
+    parser.add_argument(
+        "--per-area",
+        action="store_true",
+        help="Also compute the metrics of every sub-area graph.",
+    )
+    parser.add_argument("--workers", type=int, default=4, help="Threads used for --per-area.")
+    parser.add_argument("--nodes", default="node_metrics.csv", help="Per-node output CSV.")
+    parser.add_argument("--areas", default="area_metrics.csv", help="Per-area output CSV.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    graph = CitationGraph.from_file(args.input, AREAS)
+    loaded = time.perf_counter()
+    print(f"Loaded {graph.num_nodes} nodes and {graph.num_edges} edges in {loaded - start:.2f}s")
+
+    nodes, summary = graph_metrics(graph, args.alpha)
+    computed = time.perf_counter()
+    print(f"Computed node metrics in {computed - loaded:.2f}s (reciprocity {summary['reciprocity']:.4f})")
+    nodes.to_csv(args.nodes, index=False)
+
+    areas = aggregate_by_area(nodes)
+    if args.per_area:
+        per_area = all_area_metrics(graph, AREAS, args.alpha, args.workers)
+        areas = per_area.join(areas, how="left", rsuffix="_by_node_area")
+        print(f"Computed {len(per_area)} sub-area graph(s) in {time.perf_counter() - computed:.2f}s")
+    areas.to_csv(args.areas)
+    print(f"Node metrics saved to '{args.nodes}', sub-area metrics saved to '{args.areas}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""
+Level-of-detail Plotly rendering of citation graphs.
+
+The notebook's draw_graph_plotly added one arrow annotation per edge and
+draw_weighted_directed_graph recomputed spring_layout on every call, which made
+figures of a few thousand edges take minutes to build. Here a graph is first turned
+into a RenderGraph (int edge arrays plus one sub-area code per node) and then:
+
+    - all edges go into one Scattergl (WebGL) trace, with NaN gaps between segments,
+      and their direction into one marker trace of rotated arrow symbols
+    - sub-area filters are boolean node masks with the semantics of the notebook's
+      filter_graph_by_sub_areas (an edge is kept when both endpoints are kept), so
+      no subgraph is ever copied
+    - above `max_nodes` visible nodes, nodes are aggregated into super-nodes, one
+      per sub-area ("area") or per sub-area and degree range ("degree"), and the
+      edges between them are counted
+    - drill_down() shows a single sub-area, in full detail if it is small enough
+    - layouts (graph_layout.force_layout by default; spring_positions reproduces the
+      notebook's nx.spring_layout) are computed once per set of visible nodes and kept
+      on the RenderGraph; super-nodes are placed on a fixed circle
+
+Usage (notebook):
+    render_graph = RenderGraph.from_networkx(G)
+    draw(render_graph).show()
+    drill_down(render_graph, "ai").show()
+"""
+
+import hashlib
+import math
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from citation_graph import UNKNOWN, UNKNOWN_CODE, CitationGraph
+from graph_layout import force_layout
+
+DEFAULT_MAX_NODES = 2000
+# Position of the arrow marker along an edge (0 = origin, 1 = target).
+ARROW_POSITION = 0.8
+MIN_NODE_SIZE = 10
+MAX_NODE_SIZE = 50
+# Line widths of the super-edge weight classes (lightest to heaviest).
+EDGE_WIDTHS = [1, 2, 4, 8]
+
+COLOR_PALETTE = px.colors.qualitative.Alphabet
+AGGREGATIONS = ["area", "degree"]
+
+
+def spring_positions(num_nodes: int, src: np.ndarray, dst: np.ndarray, seed: int = 42) -> np.ndarray:
+    """(num_nodes, 2) spring layout of the given edges (as nx.spring_layout)."""
+    graph = nx.Graph()
+    graph.add_nodes_from(range(num_nodes))
+    graph.add_edges_from(zip(src.tolist(), dst.tolist()))
+    pos = nx.spring_layout(graph, seed=seed)
+    return np.array([pos[node] for node in range(num_nodes)], dtype=float).reshape(num_nodes, 2)
+
+
+def circle_positions(count: int) -> np.ndarray:
+    """(count, 2) points evenly spaced on the unit circle, starting at the top."""
+    angles = math.pi / 2 - 2 * math.pi * np.arange(count) / max(count, 1)
+    return np.column_stack([np.cos(angles), np.sin(angles)])
+
+
+def scale_sizes(values: np.ndarray, min_size: float = MIN_NODE_SIZE, max_size: float = MAX_NODE_SIZE) -> np.ndarray:
+    """Map values linearly onto [min_size, max_size] (all min_size when they are equal)."""
+    values = np.asarray(values, dtype=float)
+    if not len(values) or values.max() == values.min():
+        return np.full(len(values), float(min_size))
+    return min_size + (max_size - min_size) * (values - values.min()) / (values.max() - values.min())
+
+
+class RenderGraph:
+    """Array view of a citation graph for drawing: int edges and a sub-area code per node."""
+
+    def __init__(self, labels, areas: list, node_area: np.ndarray, src: np.ndarray, dst: np.ndarray, layout=force_layout):
+        """
+        Args:
+            labels (callable): labels(node_ids) -> list of node names (DOIs).
+            areas (list): Sub-area names; node_area holds positions in this list.
+            node_area (np.ndarray): Sub-area code of every node.
+            src, dst (np.ndarray): Edge endpoints (node ids).
+            layout (callable): layout(num_nodes, src, dst) -> (num_nodes, 2) positions.
+        """
+        self.labels = labels
+        self.areas = list(areas)
+        self.node_area = np.asarray(node_area)
+        self.src = np.asarray(src, dtype=np.int64)
+        self.dst = np.asarray(dst, dtype=np.int64)
+        self.layout = layout
+        self._positions = {}
+
+    @classmethod
+    def from_networkx(cls, graph: nx.DiGraph, attribute: str = "sub_area", **kwargs):
+        """Build from an nx graph (or a subgraph view); nodes without a sub-area are "unknown"."""
+        nodes = np.empty(graph.number_of_nodes(), dtype=object)
+        nodes[:] = list(graph)
+        index = {node: i for i, node in enumerate(nodes)}
+        values = pd.Series([graph.nodes[node].get(attribute) for node in nodes], dtype=object)
+        codes, areas = pd.factorize(values.fillna(UNKNOWN), sort=True)
+        edges = np.array(
+            [(index[u], index[v]) for u, v in graph.edges()], dtype=np.int64
+        ).reshape(-1, 2)
+        return cls(
+            lambda ids: nodes[ids].tolist(), list(areas), codes, edges[:, 0], edges[:, 1], **kwargs
+        )
+
+    @classmethod
+    def from_citation_graph(cls, graph: CitationGraph, **kwargs):
+        """Build from a CitationGraph without converting it to NetworkX."""
+        node_area = np.where(
+            graph.node_area == UNKNOWN_CODE, len(graph.areas), graph.node_area
+        ).astype(np.int64)
+        src, dst = graph.edges()
+        return cls(graph.dois, graph.areas + [UNKNOWN], node_area, src, dst, **kwargs)
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_area)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.src)
+
+    def sub_area_mask(self, sub_areas=None) -> np.ndarray:
+        """
+        Node mask of the nodes whose sub-area is in `sub_areas` (all nodes for None),
+        as filter_graph_by_sub_areas selects them; a single string is one sub-area.
+        """
+        if sub_areas is None:
+            return np.ones(self.num_nodes, dtype=bool)
+        if isinstance(sub_areas, str):
+            sub_areas = [sub_areas]
+        codes = [code for code, area in enumerate(self.areas) if area in sub_areas]
+        return np.isin(self.node_area, codes)
+
+    def edge_mask(self, node_mask: np.ndarray) -> np.ndarray:
+        """Edges whose two endpoints are in node_mask."""
+        return node_mask[self.src] & node_mask[self.dst]
+
+    def positions(self, nodes: np.ndarray, src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+        """
+        Layout of a node subset (src/dst index into `nodes`), computed once per subset.
+        """
+        key = hashlib.blake2b(np.ascontiguousarray(nodes, dtype=np.int64).tobytes(), digest_size=16).digest()
+        if key not in self._positions:
+            self._positions[key] = self.layout(len(nodes), src, dst)
+        return self._positions[key]
+
+    def area_color(self, code: int) -> str:
+        if self.areas[code] == UNKNOWN:
+            return "lightgray"
+        return COLOR_PALETTE[code % len(COLOR_PALETTE)]
+
+
+def _segments(pos: np.ndarray, src: np.ndarray, dst: np.ndarray) -> tuple:
+    """x and y arrays of all edge segments, separated by NaN gaps (one line trace)."""
+    xs = np.full((len(src), 3), np.nan)
+    ys = np.full((len(src), 3), np.nan)
+    xs[:, 0], xs[:, 1] = pos[src, 0], pos[dst, 0]
+    ys[:, 0], ys[:, 1] = pos[src, 1], pos[dst, 1]
+    return xs.ravel(), ys.ravel()
+
+
+def _arrow_trace(pos: np.ndarray, src: np.ndarray, dst: np.ndarray, size: float = 8) -> go.Scattergl:
+    """One marker trace with an arrow symbol along every edge, pointing to its target."""
+    delta = pos[dst] - pos[src]
+    tips = pos[src] + ARROW_POSITION * delta
+    # Marker angles are clockwise from "up".
+    angles = np.degrees(np.arctan2(delta[:, 0], delta[:, 1]))
+    return go.Scattergl(
+        x=tips[:, 0],
+        y=tips[:, 1],
+        mode="markers",
+        marker=dict(symbol="arrow", angle=angles, size=size, color="gray"),
+        hoverinfo="skip",
+        showlegend=False,
+    )
+
+
+def _layout(title: str, showlegend: bool = True) -> go.Layout:
+    return go.Layout(
+        title=title,
+        title_font_size=16,
+        showlegend=showlegend,
+        hovermode="closest",
+        margin=dict(b=20, l=5, r=5, t=40),
+        xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+        template="plotly_white",
+    )
+
+
+def _detail_figure(graph: RenderGraph, node_mask: np.ndarray, title: str) -> go.Figure:
+    """Every visible node and edge; node size follows the in-degree in the visible graph."""
+    nodes = np.flatnonzero(node_mask)
+    local = np.full(graph.num_nodes, -1, dtype=np.int64)
+    local[nodes] = np.arange(len(nodes))
+    edges = graph.edge_mask(node_mask)
+    src, dst = local[graph.src[edges]], local[graph.dst[edges]]
+    pos = graph.positions(nodes, src, dst)
+
+    in_degree = np.bincount(dst, minlength=len(nodes))
+    sizes = scale_sizes(in_degree)
+    edge_x, edge_y = _segments(pos, src, dst)
+    traces = [
+        go.Scattergl(
+            x=edge_x,
+            y=edge_y,
+            mode="lines",
+            line=dict(width=1, color="gray"),
+            hoverinfo="none",
+            showlegend=False,
+        ),
+        _arrow_trace(pos, src, dst),
+    ]
+    labels = np.array(graph.labels(nodes) if len(nodes) else [], dtype=object)
+    areas = graph.node_area[nodes]
+    # One node trace per sub-area, for the legend.
+    for code in np.unique(areas):
+        members = np.flatnonzero(areas == code)
+        area = graph.areas[code]
+        traces.append(
+            go.Scattergl(
+                x=pos[members, 0],
+                y=pos[members, 1],
+                mode="markers",
+                name=area,
+                text=[
+                    f"{label}<br>{area}<br>in-degree {degree}"
+                    for label, degree in zip(labels[members], in_degree[members].tolist())
+                ],
+                hoverinfo="text",
+                marker=dict(size=sizes[members], color=graph.area_color(code), line_width=1),
+            )
+        )
+    return go.Figure(data=traces, layout=_layout(title))
+
+
+def weighted_figure(
+    names: list,
+    colors: list,
+    sizes: np.ndarray,
+    pos: np.ndarray,
+    src: np.ndarray,
+    dst: np.ndarray,
+    weights: np.ndarray,
+    hover: list,
+    title: str,
+) -> go.Figure:
+    """
+    Figure of a small weighted graph (super-nodes or sub-areas).
+
+    Edges are split into at most len(EDGE_WIDTHS) weight classes (one line trace each,
+    thicker for heavier edges); their weights are shown when hovering the edge midpoints.
+    """
+    traces = []
+    weights = np.asarray(weights, dtype=float)
+    if len(weights):
+        # Weight classes by quantile of log-weight.
+        scaled = np.log1p(weights)
+        bounds = np.quantile(scaled, np.linspace(0, 1, len(EDGE_WIDTHS) + 1)[1:-1])
+        classes = np.searchsorted(bounds, scaled, side="left")
+        for level, width in enumerate(EDGE_WIDTHS):
+            selected = classes == level
+            if selected.any():
+                edge_x, edge_y = _segments(pos, src[selected], dst[selected])
+                traces.append(
+                    go.Scattergl(
+                        x=edge_x,
+                        y=edge_y,
+                        mode="lines",
+                        line=dict(width=width, color="gray"),
+                        hoverinfo="none",
+                        showlegend=False,
+                    )
+                )
+        traces.append(_arrow_trace(pos, src, dst, size=12))
+        middle = (pos[src] + pos[dst]) / 2
+        traces.append(
+            go.Scattergl(
+                x=middle[:, 0],
+                y=middle[:, 1],
+                mode="markers",
+                marker=dict(size=6, color="rgba(0,0,0,0)"),
+                text=[
+                    f"{names[s]} → {names[d]}: {int(w)}"
+                    for s, d, w in zip(src.tolist(), dst.tolist(), weights.tolist())
+                ],
+                hoverinfo="text",
+                showlegend=False,
+            )
+        )
+    traces.append(
+        go.Scatter(
+            x=pos[:, 0],
+            y=pos[:, 1],
+            mode="markers+text",
+            text=names,
+            textposition="top center",
+            hovertext=hover,
+            hoverinfo="text",
+            marker=dict(size=sizes, color=colors, line=dict(width=2)),
+            showlegend=False,
+        )
+    )
+    return go.Figure(data=traces, layout=_layout(title, showlegend=False))
+
+
+def area_clusters(graph: RenderGraph, node_mask: np.ndarray) -> tuple:
+    """One super-node per sub-area: (cluster of every node, names, sub-area code per cluster)."""
+    return graph.node_area, list(graph.areas), np.arange(len(graph.areas))
+
+
+def degree_clusters(graph: RenderGraph, node_mask: np.ndarray) -> tuple:
+    """
+    One super-node per sub-area and degree range (degree in the visible graph, in
+    powers of two: 0, 1, 2-3, 4-7, ...).
+    """
+    edges = graph.edge_mask(node_mask)
+    degree = np.bincount(graph.src[edges], minlength=graph.num_nodes) + np.bincount(
+        graph.dst[edges], minlength=graph.num_nodes
+    )
+    buckets = np.zeros(graph.num_nodes, dtype=np.int64)
+    positive = degree > 0
+    buckets[positive] = np.floor(np.log2(degree[positive])).astype(np.int64) + 1
+    num_buckets = int(buckets.max()) + 1 if len(buckets) else 1
+    clusters = graph.node_area * num_buckets + buckets
+    names = []
+    for area in graph.areas:
+        names.append(f"{area} deg 0")
+        for bucket in range(1, num_buckets):
+            low, high = 2 ** (bucket - 1), 2**bucket - 1
+            names.append(f"{area} deg {low}" if low == high else f"{area} deg {low}-{high}")
+    return clusters, names, np.repeat(np.arange(len(graph.areas)), num_buckets)
+
+
+def _cluster_figure(graph: RenderGraph, node_mask: np.ndarray, clusters: tuple, title: str) -> go.Figure:
+    """Super-nodes sized by their number of nodes, with the edges between them counted."""
+    labels, names, cluster_area = clusters
+    visible = np.flatnonzero(node_mask)
+    used, members = np.unique(labels[visible], return_counts=True)
+    local = np.full(len(names), -1, dtype=np.int64)
+    local[used] = np.arange(len(used))
+
+    edges = graph.edge_mask(node_mask)
+    src, dst = local[labels[graph.src[edges]]], local[labels[graph.dst[edges]]]
+    pairs, weights = np.unique(src * len(used) + dst, return_counts=True)
+    src, dst = pairs // len(used), pairs % len(used)
+    internal = np.zeros(len(used), dtype=np.int64)
+    loops = src == dst
+    internal[src[loops]] = weights[loops]
+    src, dst, weights = src[~loops], dst[~loops], weights[~loops]
+
+    cluster_names = [names[c] for c in used.tolist()]
+    hover = [
+        f"{name}<br>{count} node(s)<br>{inside} internal edge(s)"
+        for name, count, inside in zip(cluster_names, members.tolist(), internal.tolist())
+    ]
+    return weighted_figure(
+        cluster_names,
+        [graph.area_color(cluster_area[c]) for c in used.tolist()],
+        scale_sizes(np.sqrt(members), 15, 60),
+        circle_positions(len(used)),
+        src,
+        dst,
+        weights,
+        hover,
+        title,
+    )
+
+
+def draw(
+    graph: RenderGraph,
+    sub_areas=None,
+    max_nodes: int = DEFAULT_MAX_NODES,
+    aggregate: str = "area",
+    title: str = "Citation Network Graph",
+) -> go.Figure:
+    """
+    Figure of the graph, or of the sub-areas given (see RenderGraph.sub_area_mask).
+
+    Up to `max_nodes` visible nodes every node and edge is drawn; above it, nodes are
+    aggregated into super-nodes by sub-area ("area") or by sub-area and degree range
+    ("degree").
+    """
+    if aggregate not in AGGREGATIONS:
+        raise ValueError(f"aggregate must be one of {AGGREGATIONS}")
+    node_mask = graph.sub_area_mask(sub_areas)
+    visible = int(node_mask.sum())
+    if visible <= max_nodes:
+        return _detail_figure(graph, node_mask, title)
+    clusters = (area_clusters if aggregate == "area" else degree_clusters)(graph, node_mask)
+    return _cluster_figure(
+        graph, node_mask, clusters, f"{title} ({visible} nodes, aggregated by {aggregate})"
+    )
+
+
+def drill_down(graph: RenderGraph, sub_area: str, max_nodes: int = DEFAULT_MAX_NODES) -> go.Figure:
+    """Figure of one sub-area: every node if it has up to max_nodes, else its degree clusters."""
+    return draw(graph, [sub_area], max_nodes, aggregate="degree", title=f"Sub-area '{sub_area}'")
+
+
+def draw_weighted_graph(graph: nx.DiGraph, title: str = "Directed Weighted Citation Graph") -> go.Figure:
+    """
+    Figure of a weighted sub-area graph (see CitationMatrix.weighted_graph).
+
+    Nodes are placed on a fixed circle in their order in the graph and sized by in-degree;
+    edges are drawn by weight class.
+    """
+    names = list(graph.nodes())
+    index = {name: i for i, name in enumerate(names)}
+    edges = list(graph.edges(data="weight", default=1))
+    src = np.array([index[u] for u, _, _ in edges], dtype=np.int64)
+    dst = np.array([index[v] for _, v, _ in edges], dtype=np.int64)
+    weights = np.array([w for _, _, w in edges], dtype=float)
+    in_degree = np.bincount(dst, minlength=len(names))
+    hover = [f"{name}<br>in-degree {degree}" for name, degree in zip(names, in_degree.tolist())]
+    return weighted_figure(
+        [str(name) for name in names],
+        ["lightblue"] * len(names),
+        scale_sizes(in_degree),
+        circle_positions(len(names)),
+        src,
+        dst,
+        weights,
+        hover,
+        title,
+    )
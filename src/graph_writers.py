@@ -0,0 +1,256 @@
+"""
+Streaming graph writers for CitationGraph edge subsets.
+
+nx.write_gexf builds the whole XML tree in memory before writing anything. The writers
+here emit GEXF 1.2 (the format produced by NetworkX and read by Gephi) and GraphML
+directly from the node table and edge arrays, block by block, so no XML tree is built
+and the edge output stays bounded by the block size. The escaped node labels (needed to
+write the edges) and the layout positions are still held for every node, so memory
+grows with the node count. Output can optionally be gzip-compressed.
+
+The binary format is an uncompressed .npz holding the edge arrays (local int32 node
+ids) and the node table (UTF-8 buffer + offsets + sub-area codes); it loads in
+milliseconds with load_binary.
+
+Every writer takes an optional `layout` callable, layout(graph, nodes, src, dst) ->
+(len(nodes), 2) positions (see graph_layout.subgraph_layout). GEXF gets them as
+viz:position elements (scaled by POSITION_SCALE, as Gephi expects), GraphML as x/y
+node data and the binary format as a "positions" array.
+"""
+
+import gzip
+import json
+from datetime import date
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+FORMATS = ["gexf", "graphml", "binary"]
+EXTENSIONS = {"gexf": ".gexf", "graphml": ".graphml", "binary": ".npz"}
+
+BLOCK_SIZE = 50_000
+POSITION_SCALE = 1000.0
+
+_ATTR_ESCAPES = {'"': "&quot;", "\n": "&#10;", "\r": "&#13;", "\t": "&#9;"}
+
+
+def _attr(value: str) -> str:
+    return escape(value, _ATTR_ESCAPES)
+
+
+def _open_text(path: str, compress: bool):
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+    return open(path, "w", encoding="utf-8")
+
+
+def subgraph_arrays(graph, edge_ids=None) -> tuple:
+    """
+    Select edges of a CitationGraph and renumber their endpoints.
+
+    Returns:
+        tuple: (nodes, src, dst) where nodes are global node ids (sorted) and src/dst
+        are int32 positions into nodes.
+    """
+    src, dst = graph.edges()
+    if edge_ids is not None:
+        src, dst = src[edge_ids], dst[edge_ids]
+    nodes, inverse = np.unique(np.concatenate([src, dst]), return_inverse=True)
+    inverse = inverse.astype(np.int32)
+    return nodes, inverse[: len(src)], inverse[len(src) :]
+
+
+def gather_doi_bytes(graph, nodes) -> tuple:
+    """
+    Gather the DOIs of the given node ids with one fancy-indexing operation.
+
+    Returns:
+        tuple: (uint8 UTF-8 buffer, int64 offsets of len(nodes) + 1).
+    """
+    starts = graph.doi_offsets[nodes]
+    ends = graph.doi_offsets[nodes + 1]
+    lengths = ends - starts
+    doi_offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=doi_offsets[1:])
+    positions = np.repeat(starts - doi_offsets[:-1], lengths) + np.arange(doi_offsets[-1])
+    return np.asarray(graph.doi_bytes)[positions], doi_offsets
+
+
+def _positions(graph, nodes, src, dst, layout):
+    """Scaled (x, y) rows for the nodes, or None without a layout."""
+    if layout is None:
+        return None
+    return (np.asarray(layout(graph, nodes, src, dst), dtype=np.float64) * POSITION_SCALE).tolist()
+
+
+def _node_blocks(graph, nodes, positions=None):
+    """
+    Yield lists of (doi, sub_area, position) for the given node ids, BLOCK_SIZE at a
+    time (position is None without positions).
+    """
+    for start in range(0, len(nodes), BLOCK_SIZE):
+        block = nodes[start : start + BLOCK_SIZE]
+        coordinates = positions[start : start + BLOCK_SIZE] if positions is not None else [None] * len(block)
+        yield [
+            (graph.doi(node), graph.area_name(code), position)
+            for node, code, position in zip(block.tolist(), graph.node_area[block].tolist(), coordinates)
+        ]
+
+
+def _viz_position(position) -> str:
+    if position is None:
+        return ""
+    return f'        <viz:position x="{position[0]:.3f}" y="{position[1]:.3f}" z="0.0" />\n'
+
+
+def write_gexf(graph, path: str, edge_ids=None, compress: bool = False, layout=None) -> None:
+    """Stream the selected edges of a CitationGraph to a GEXF 1.2 file."""
+    nodes, src, dst = subgraph_arrays(graph, edge_ids)
+    positions = _positions(graph, nodes, src, dst, layout)
+    viz_namespace = 'xmlns:viz="http://www.gexf.net/1.2draft/viz" ' if positions is not None else ""
+    with _open_text(path, compress) as f:
+        f.write(
+            "<?xml version='1.0' encoding='utf-8'?>\n"
+            '<gexf xmlns="http://www.gexf.net/1.2draft" '
+            f"{viz_namespace}"
+            'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+            'xsi:schemaLocation="http://www.gexf.net/1.2draft http://www.gexf.net/1.2draft/gexf.xsd" '
+            'version="1.2">\n'
+            f'  <meta lastmodifieddate="{date.today().isoformat()}">\n'
+            "    <creator>br_citation_network_cs</creator>\n"
+            "  </meta>\n"
+            '  <graph defaultedgetype="directed" mode="static" name="">\n'
+            '    <attributes mode="static" class="node">\n'
+            '      <attribute id="0" title="sub_area" type="string" />\n'
+            "    </attributes>\n"
+            "    <nodes>\n"
+        )
+        labels = []
+        for block in _node_blocks(graph, nodes, positions):
+            escaped = [(_attr(doi), _attr(area), position) for doi, area, position in block]
+            labels.extend(doi for doi, _, _ in escaped)
+            f.write(
+                "".join(
+                    f'      <node id="{doi}" label="{doi}">\n'
+                    "        <attvalues>\n"
+                    f'          <attvalue for="0" value="{area}" />\n'
+                    "        </attvalues>\n"
+                    f"{_viz_position(position)}"
+                    "      </node>\n"
+                    for doi, area, position in escaped
+                )
+            )
+        f.write("    </nodes>\n    <edges>\n")
+        for start in range(0, len(src), BLOCK_SIZE):
+            f.write(
+                "".join(
+                    f'      <edge source="{labels[s]}" target="{labels[t]}" id="{start + i}" />\n'
+                    for i, (s, t) in enumerate(
+                        zip(
+                            src[start : start + BLOCK_SIZE].tolist(),
+                            dst[start : start + BLOCK_SIZE].tolist(),
+                        )
+                    )
+                )
+            )
+        f.write("    </edges>\n  </graph>\n</gexf>\n")
+
+
+def _graphml_position(position) -> str:
+    if position is None:
+        return ""
+    return f'      <data key="d1">{position[0]:.3f}</data>\n      <data key="d2">{position[1]:.3f}</data>\n'
+
+
+def write_graphml(graph, path: str, edge_ids=None, compress: bool = False, layout=None) -> None:
+    """Stream the selected edges of a CitationGraph to a GraphML file."""
+    nodes, src, dst = subgraph_arrays(graph, edge_ids)
+    positions = _positions(graph, nodes, src, dst, layout)
+    with _open_text(path, compress) as f:
+        f.write(
+            "<?xml version='1.0' encoding='utf-8'?>\n"
+            '<graphml xmlns="http://graphml.graphdrawing.org/xmlns" '
+            'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+            'xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns '
+            'http://graphml.graphdrawing.org/xmlns/1.0/graphml.xsd">\n'
+            '  <key id="d0" for="node" attr.name="sub_area" attr.type="string" />\n'
+        )
+        if positions is not None:
+            f.write(
+                '  <key id="d1" for="node" attr.name="x" attr.type="double" />\n'
+                '  <key id="d2" for="node" attr.name="y" attr.type="double" />\n'
+            )
+        f.write('  <graph edgedefault="directed">\n')
+        labels = []
+        for block in _node_blocks(graph, nodes, positions):
+            escaped = [(_attr(doi), escape(area), position) for doi, area, position in block]
+            labels.extend(doi for doi, _, _ in escaped)
+            f.write(
+                "".join(
+                    f'    <node id="{doi}">\n'
+                    f'      <data key="d0">{area}</data>\n'
+                    f"{_graphml_position(position)}"
+                    "    </node>\n"
+                    for doi, area, position in escaped
+                )
+            )
+        for start in range(0, len(src), BLOCK_SIZE):
+            f.write(
+                "".join(
+                    f'    <edge source="{labels[s]}" target="{labels[t]}" />\n'
+                    for s, t in zip(
+                        src[start : start + BLOCK_SIZE].tolist(),
+                        dst[start : start + BLOCK_SIZE].tolist(),
+                    )
+                )
+            )
+        f.write("  </graph>\n</graphml>\n")
+
+
+def write_binary(graph, path: str, edge_ids=None, compress: bool = False, layout=None) -> None:
+    """Write the selected edges and their node table (and positions) to a .npz archive."""
+    nodes, src, dst = subgraph_arrays(graph, edge_ids)
+    doi_bytes, doi_offsets = gather_doi_bytes(graph, nodes)
+    extra = {}
+    if layout is not None:
+        extra["positions"] = np.asarray(layout(graph, nodes, src, dst), dtype=np.float32)
+    save = np.savez_compressed if compress else np.savez
+    with open(path, "wb") as f:
+        save(
+            f,
+            src=src,
+            dst=dst,
+            doi_bytes=doi_bytes,
+            doi_offsets=doi_offsets,
+            node_area=np.asarray(graph.node_area)[nodes],
+            areas=np.frombuffer(json.dumps(graph.areas).encode("utf-8"), dtype=np.uint8),
+            **extra,
+        )
+
+
+def load_binary(path: str) -> dict:
+    """
+    Load a file written by write_binary.
+
+    Returns:
+        dict: src, dst, doi_bytes, doi_offsets, node_area (NumPy arrays), areas (list)
+        and dois (list of str), plus positions if the file was written with a layout.
+    """
+    with np.load(path) as archive:
+        data = {name: archive[name] for name in archive.files}
+    data["areas"] = json.loads(data["areas"].tobytes().decode("utf-8"))
+    buffer = data["doi_bytes"].tobytes()
+    offsets = data["doi_offsets"].tolist()
+    data["dois"] = [
+        buffer[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])
+    ]
+    return data
+
+
+WRITERS = {"gexf": write_gexf, "graphml": write_graphml, "binary": write_binary}
+
+
+def output_path(directory: str, area: str, fmt: str, compress: bool) -> str:
+    """Return "<directory>/<area>_open_citations<ext>" (".gz" appended for gzipped XML)."""
+    suffix = EXTENSIONS[fmt] + (".gz" if compress and fmt != "binary" else "")
+    return f"{directory}/{area}_open_citations{suffix}"
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Merge the OpenAlex records and the OpenCitations edge list into one DOI edge list.
+
+extraction_open_alex_selenium.py collects works keyed by OpenAlex id ("W123"), with the
+ids of their references and citing works; extraction_open_citations.py collects
+DOI-keyed edges. Neither sees all the citations of the other, so this stage joins them:
+
+    - OpenAlexDOIIndex maps OpenAlex ids to canonical DOIs. It is a pandas hash index
+      over the numeric part of the id, filled from the "doi" field of the collected
+      records and extended by batched `openalex:W1|W2|...` lookups for the referenced
+      and citing works that were not collected themselves; it is saved between runs,
+      so each id is looked up once
+    - the "referenced_works" (work -> reference) and "cited_by" (citing work -> work)
+      lists are flattened with Arrow list kernels into id edges, then translated to
+      DOI edges through the index
+    - the edges of both sources are deduplicated together; every merged edge carries
+      a provenance bitmask ("sources": OPENCITATIONS | OPENALEX)
+    - merge statistics report the overlap between the sources, over all edges and over
+      the works whose references both sources cover
+
+Edges of OpenAlex works without a DOI are dropped (they cannot be joined). OpenAlex-only
+edges take the CSIndex sub-areas their DOIs carry in the OpenCitations edge list.
+
+Usage:
+    python merge_sources.py [--openalex openalex_data.csv]
+        [--opencitations open_citations_edge_list.csv] [--output merged_edge_list.csv]
+        [--index openalex_doi_index.csv] [--stats merge_stats.json] [--offline]
+        [--workers 4]
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from columnar_io import (
+    ROW_GROUP_SIZE,
+    edges_to_table,
+    is_parquet,
+    read_edge_list,
+    read_openalex,
+)
+from doi_utils import canonicalize_array
+from openalex_client import CITES_BATCH_SIZE, OPENALEX_WORKS_URL, OpenAlexClient, load_email
+from pipeline_metrics import get_logger
+
+# Provenance bits of a merged edge.
+OPENCITATIONS = 1
+OPENALEX = 2
+
+DEFAULT_INDEX_FILE = "openalex_doi_index.csv"
+
+_ID_PATTERN = r"^(?:https?://openalex\.org/)?[Ww](\d+)$"
+
+log = get_logger("merge_sources")
+
+
+def work_keys(ids) -> np.ndarray:
+    """
+    Numeric keys of OpenAlex work ids ("W123" or "https://openalex.org/W123" -> 123).
+
+    Returns:
+        np.ndarray: int64 keys, -1 where the value is missing or not a work id.
+    """
+    ids = pa.array(ids, type=pa.string(), from_pandas=True) if not isinstance(ids, pa.Array) else ids
+    ids = pc.utf8_trim_whitespace(ids)
+    valid = pc.fill_null(pc.match_substring_regex(ids, _ID_PATTERN), False)
+    digits = pc.replace_substring_regex(ids, _ID_PATTERN, r"\1")
+    keys = pc.if_else(valid, digits, pa.scalar("-1")).cast(pa.int64())
+    return keys.to_numpy(zero_copy_only=False)
+
+
+def canonical_dois(values) -> np.ndarray:
+    """Canonical DOIs of raw DOI strings as an object array, "" where there is no valid DOI."""
+    canonical, _ = canonicalize_array(pa.array(values, type=pa.string(), from_pandas=True))
+    return pc.fill_null(canonical, "").to_numpy(zero_copy_only=False)
+
+
+class OpenAlexDOIIndex:
+    """
+    OpenAlex work key -> canonical DOI ("" for works known to have no DOI).
+
+    The DOIs are a pandas Series on an int64 Index, so lookups of whole key arrays are
+    hash-table probes (reindex) rather than Python dict accesses.
+    """
+
+    def __init__(self):
+        self.dois = pd.Series([], index=pd.Index([], dtype=np.int64), dtype=object)
+
+    def __len__(self) -> int:
+        return len(self.dois)
+
+    def add(self, keys, dois) -> int:
+        """
+        Record the DOIs of works; a known DOI is never replaced by a missing one.
+
+        Args:
+            keys (np.ndarray): Work keys (from work_keys; negative keys are ignored).
+            dois (array-like): Raw DOI strings (canonicalized here; invalid ones count as missing).
+
+        Returns:
+            int: Number of keys that gained a DOI.
+        """
+        keys = np.asarray(keys, dtype=np.int64)
+        keep = keys >= 0
+        new = pd.Series(canonical_dois(np.asarray(dois, dtype=object)[keep]), index=keys[keep])
+        before = int((self.dois != "").sum())
+        old = self.dois
+        # Known DOIs first, so dropping duplicate keys keeps them over missing ones.
+        merged = pd.concat([old[old != ""], new[new != ""], old[old == ""], new[new == ""]])
+        self.dois = merged[~merged.index.duplicated()]
+        return int((self.dois != "").sum()) - before
+
+    def lookup(self, keys) -> np.ndarray:
+        """Return the DOI of each key as an object array: "" without a DOI, None if the key is unknown."""
+        values = self.dois.reindex(np.asarray(keys, dtype=np.int64)).to_numpy(dtype=object, copy=True)
+        values[pd.isna(values)] = None
+        return values
+
+    def unknown(self, keys) -> np.ndarray:
+        """Distinct (non-negative) keys that are not in the index yet."""
+        keys = np.unique(np.asarray(keys, dtype=np.int64))
+        keys = keys[keys >= 0]
+        return keys[~pd.Index(keys).isin(self.dois.index)]
+
+    def save(self, path: str) -> None:
+        """Atomically write the index as a CSV of (id, doi)."""
+        tmp_path = path + ".tmp"
+        pd.DataFrame({"id": "W" + self.dois.index.astype(str), "doi": self.dois.to_numpy()}).to_csv(
+            tmp_path, index=False
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "OpenAlexDOIIndex":
+        """Read an index written by save(); an empty index if the file does not exist."""
+        index = cls()
+        if os.path.exists(path):
+            df = pd.read_csv(path, dtype=str, keep_default_na=False)
+            index.add(work_keys(df["id"]), df["doi"])
+        return index
+
+
+def openalex_edges(records: pd.DataFrame) -> tuple:
+    """
+    Flatten the reference and citing-work lists of OpenAlex records into id edges.
+
+    Args:
+        records (pd.DataFrame): Records as returned by read_openalex (list columns).
+
+    Returns:
+        tuple: (origin keys, target keys, number of edges dropped for an invalid id);
+        origins cite targets.
+    """
+    work = work_keys(records["id"])
+    origins, targets = [], []
+    for column, work_is_origin in (("referenced_works", True), ("cited_by", False)):
+        lists = pa.array(records[column].tolist(), type=pa.list_(pa.string()))
+        lengths = pc.fill_null(pc.list_value_length(lists), 0).to_numpy(zero_copy_only=False)
+        others = work_keys(lists.flatten())
+        owners = np.repeat(work, lengths)
+        origins.append(owners if work_is_origin else others)
+        targets.append(others if work_is_origin else owners)
+    origin = np.concatenate(origins)
+    target = np.concatenate(targets)
+    valid = (origin >= 0) & (target >= 0)
+    return origin[valid], target[valid], int((~valid).sum())
+
+
+def resolve_missing(index: OpenAlexDOIIndex, keys, client: OpenAlexClient, batch_size: int) -> int:
+    """
+    Look up the works of `keys` that the index does not know yet, in batches.
+
+    Works OpenAlex does not return are recorded without a DOI, so they are not looked
+    up again. Returns the number of works looked up.
+    """
+    missing = index.unknown(keys)
+    if len(missing) == 0:
+        return 0
+    ids = ["W" + str(key) for key in missing.tolist()]
+    found = client.lookup_dois(ids, batch_size=batch_size)
+    index.add(missing, [found.get(work_id, "") for work_id in ids])
+    log.debug("Looked up %d work(s): %d found", len(ids), len(found))
+    return len(ids)
+
+
+def merge_edges(opencitations: pd.DataFrame, openalex: pd.DataFrame) -> pd.DataFrame:
+    """
+    Deduplicate the DOI edges of both sources and record where each edge came from.
+
+    Args:
+        opencitations (pd.DataFrame): Edge list with EDGE_COLUMNS (canonical DOIs).
+        openalex (pd.DataFrame): origin_doi/target_doi edges (canonical DOIs).
+
+    Returns:
+        pd.DataFrame: EDGE_COLUMNS plus "sources" (uint8 bitmask), one row per distinct
+        edge, in order of first occurrence (OpenCitations edges first).
+    """
+    n_oc = len(opencitations)
+    codes, uniques = pd.factorize(
+        np.concatenate(
+            [
+                opencitations["origin_doi"].to_numpy(dtype=object),
+                openalex["origin_doi"].to_numpy(dtype=object),
+                opencitations["target_doi"].to_numpy(dtype=object),
+                openalex["target_doi"].to_numpy(dtype=object),
+            ]
+        )
+    )
+    rows = n_oc + len(openalex)
+    origin, target = codes[:rows].astype(np.int64), codes[rows:].astype(np.int64)
+    _, first, inverse = np.unique(origin * len(uniques) + target, return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+
+    sources = np.zeros(len(first), dtype=np.uint8)
+    for bit, part in ((OPENCITATIONS, slice(0, n_oc)), (OPENALEX, slice(n_oc, rows))):
+        seen = np.zeros(len(first), dtype=bool)
+        seen[inverse[part]] = True
+        sources[seen] |= bit
+
+    # Sub-area of every node: the first one it carries in the OpenCitations edges.
+    node_area = np.full(len(uniques), "", dtype=object)
+    oc_codes = np.concatenate([origin[:n_oc], target[:n_oc]])
+    oc_areas = np.concatenate(
+        [
+            opencitations["origin_sub_area"].astype(object).fillna("").to_numpy(dtype=object),
+            opencitations["target_sub_area"].astype(object).fillna("").to_numpy(dtype=object),
+        ]
+    )
+    known = oc_areas != ""
+    node_area[oc_codes[known][::-1]] = oc_areas[known][::-1]
+    origin_area = np.concatenate([oc_areas[:n_oc], node_area[origin[n_oc:]]])
+    target_area = np.concatenate([oc_areas[n_oc:], node_area[target[n_oc:]]])
+
+    order = np.argsort(first, kind="stable")
+    picks = first[order]
+    return pd.DataFrame(
+        {
+            "origin_doi": uniques[origin[picks]],
+            "target_doi": uniques[target[picks]],
+            "origin_sub_area": origin_area[picks],
+            "target_sub_area": target_area[picks],
+            "sources": sources[order],
+        }
+    )
+
+
+def overlap_stats(merged: pd.DataFrame) -> dict:
+    """Edge counts per provenance, overall and over origins that both sources cover."""
+
+    def counts(sources):
+        both = int((sources == OPENCITATIONS | OPENALEX).sum())
+        return {
+            "edges": len(sources),
+            "both": both,
+            "only_opencitations": int((sources == OPENCITATIONS).sum()),
+            "only_openalex": int((sources == OPENALEX).sum()),
+            "jaccard": round(both / len(sources), 4) if len(sources) else 0.0,
+        }
+
+    sources = merged["sources"].to_numpy()
+    origin, uniques = pd.factorize(merged["origin_doi"].to_numpy(dtype=object))
+    shared = np.ones(len(uniques), dtype=bool)
+    for bit in (OPENCITATIONS, OPENALEX):
+        covered = np.zeros(len(uniques), dtype=bool)
+        covered[origin[(sources & bit) != 0]] = True
+        shared &= covered
+    common = shared[origin]
+    return {
+        "all": counts(sources),
+        "common_origins": {"origins": int(shared.sum()), **counts(sources[common])},
+    }
+
+
+def write_merged(merged: pd.DataFrame, path: str) -> None:
+    """Write the merged edges to CSV or Parquet (sorted by sub-area, like write_edge_list)."""
+    if is_parquet(path):
+        merged = merged.sort_values(["origin_sub_area", "target_sub_area"], kind="stable")
+        table = edges_to_table(merged, sort=False).append_column(
+            "sources", pa.array(merged["sources"].to_numpy(), type=pa.uint8())
+        )
+        pq.write_table(table, path, row_group_size=ROW_GROUP_SIZE, write_statistics=True)
+    else:
+        merged.to_csv(path, index=False)
+
+
+def merge_sources(
+    openalex_path: str,
+    opencitations_path: str,
+    index_path: str = DEFAULT_INDEX_FILE,
+    client: OpenAlexClient = None,
+    batch_size: int = CITES_BATCH_SIZE,
+) -> tuple:
+    """
+    Build the merged edge list.
+
+    Args:
+        openalex_path (str): OpenAlex records (CSV or Parquet, as written by write_openalex).
+        opencitations_path (str): OpenCitations edge list (CSV or Parquet).
+        index_path (str): File of the id -> DOI index, read first and updated (None: no file).
+        client (OpenAlexClient): Client for the DOI lookups (None: ids missing from the
+            records and the index stay unresolved).
+        batch_size (int): Work ids per lookup request.
+
+    Returns:
+        tuple: (merged edge DataFrame, statistics dict).
+    """
+    records = read_openalex(openalex_path)
+    index = OpenAlexDOIIndex.load(index_path) if index_path else OpenAlexDOIIndex()
+    indexed = len(index)
+    from_records = index.add(work_keys(records["id"]), records["doi"])
+
+    origin, target, invalid_ids = openalex_edges(records)
+    looked_up = 0
+    if client is not None:
+        looked_up = resolve_missing(index, np.concatenate([origin, target]), client, batch_size)
+    if index_path:
+        index.save(index_path)
+
+    origin_doi, target_doi = index.lookup(origin), index.lookup(target)
+    unresolved = pd.isna(origin_doi) | pd.isna(target_doi)
+    joinable = ~unresolved & (origin_doi != "") & (target_doi != "")
+    openalex = pd.DataFrame({"origin_doi": origin_doi[joinable], "target_doi": target_doi[joinable]})
+
+    opencitations = read_edge_list(opencitations_path)
+    for name in ("origin_doi", "target_doi"):
+        canonical, _ = canonicalize_array(
+            pa.array(opencitations[name].to_numpy(dtype=object), type=pa.string(), from_pandas=True),
+            keep_invalid=True,
+        )
+        opencitations[name] = pc.fill_null(canonical, "").to_numpy(zero_copy_only=False)
+
+    merged = merge_edges(opencitations, openalex)
+    works = np.unique(np.concatenate([origin, target]))
+    work_dois = index.lookup(works)
+    stats = {
+        "openalex": {
+            "works": len(records),
+            "works_with_doi": int((index.lookup(work_keys(records["id"])) != "").sum()),
+            "edges": len(origin),
+            "invalid_id_edges": invalid_ids,
+            "distinct_works": len(works),
+            "indexed_before": indexed,
+            "resolved_from_records": from_records,
+            "looked_up": looked_up,
+            "works_without_doi": int((work_dois == "").sum()),
+            "unresolved_works": int(pd.isna(work_dois).sum()),
+            "dropped_edges": int((~joinable).sum()),
+            "doi_edges": int(joinable.sum()),
+        },
+        "opencitations": {"edges": len(opencitations)},
+        "merged": overlap_stats(merged),
+    }
+    return merged, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge OpenAlex and OpenCitations citation edges.")
+    parser.add_argument("--openalex", default="openalex_data.csv", help="OpenAlex records (CSV or Parquet).")
+    parser.add_argument(
+        "--opencitations", default="open_citations_edge_list.csv", help="OpenCitations edge list (CSV or Parquet)."
+    )
+    parser.add_argument(
+        "--output", default="merged_edge_list.csv", help="Merged edge list; a .parquet extension writes Parquet."
+    )
+    parser.add_argument(
+        "--index", default=DEFAULT_INDEX_FILE, help="OpenAlex id -> DOI index, reused and updated between runs."
+    )
+    parser.add_argument("--stats", default="merge_stats.json", help="JSON file for the merge statistics.")
+    parser.add_argument(
+        "--offline", action="store_true", help="Do not look up DOIs; use the records and the saved index only."
+    )
+    parser.add_argument("--base-url", default=OPENALEX_WORKS_URL, help="OpenAlex works endpoint.")
+    parser.add_argument("--workers", type=int, default=4, help="Lookup batches fetched concurrently.")
+    parser.add_argument("--batch-size", type=int, default=CITES_BATCH_SIZE, help="Work ids per lookup request.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    client = None
+    if not args.offline:
+        client = OpenAlexClient(args.base_url, mailto=load_email(), max_workers=args.workers)
+    merged, stats = merge_sources(args.openalex, args.opencitations, args.index, client, args.batch_size)
+    write_merged(merged, args.output)
+    with open(args.stats, "w") as f:
+        json.dump(stats, f, indent=2)
+
+    openalex, overlap = stats["openalex"], stats["merged"]
+    print(
+        f"[INFO] OpenAlex: {openalex['works']} work(s), {openalex['edges']} id edge(s) over "
+        f"{openalex['distinct_works']} work(s); {openalex['looked_up']} looked up, "
+        f"{openalex['works_without_doi']} without DOI, {openalex['unresolved_works']} unresolved"
+    )
+    print(
+        f"[INFO] {openalex['doi_edges']} OpenAlex DOI edge(s) joined, {openalex['dropped_edges']} dropped; "
+        f"{stats['opencitations']['edges']} OpenCitations edge(s)"
+    )
+    for label, counts in (("All edges", overlap["all"]), ("Common origins", overlap["common_origins"])):
+        print(
+            f"[SUMMARY] {label}: {counts['edges']} edge(s), {counts['both']} in both sources "
+            f"(Jaccard {counts['jaccard']:.3f}), {counts['only_opencitations']} only OpenCitations, "
+            f"{counts['only_openalex']} only OpenAlex"
+        )
+    print(f"[COMPLETE] Merged edge list written to {args.output} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
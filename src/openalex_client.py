@@ -0,0 +1,423 @@
+"""
+Pure-HTTP client for the OpenAlex works API.
+
+Replaces the Selenium page scraping of extraction_open_alex_selenium.py with a pooled
+requests.Session. Only the fields needed by parse_results are requested (`select`),
+pages hold 200 records, and pages are fetched concurrently whenever the result set is
+small enough for offset paging (<= 10,000 records). Larger result sets are walked
+with cursor pagination, where each next page is requested as soon as its cursor is
+known, overlapping the download with the parsing of the current page.
+
+Requests are retried with the RetryPolicy and per-host throttling breakers of
+retry_policy, like the OpenCitations and DBLP clients.
+"""
+
+import json
+import logging
+import concurrent.futures
+from functools import partial
+from math import ceil
+from time import perf_counter
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from pipeline_metrics import PipelineMetrics
+from rate_limit import TokenBucket
+from retry_policy import (
+    OK,
+    Breakers,
+    Outcome,
+    RequestFailed,
+    RetryPolicy,
+    classify,
+    parse_retry_after,
+)
+
+OPENALEX_WORKS_URL = "https://api.openalex.org/works"
+
+# Fields read by parse_results (plus cited_by_count, used to skip cited_by lookups);
+# everything else is left out of the response.
+WORK_FIELDS = [
+    "id",
+    "doi",
+    "title",
+    "primary_topic",
+    "referenced_works_count",
+    "referenced_works",
+    "cited_by_count",
+]
+
+# OpenAlex accepts at most 50 values in one OR filter (cites:W1|W2|...).
+CITES_BATCH_SIZE = 50
+
+MAX_PER_PAGE = 200
+# OpenAlex only allows offset (page=N) paging for the first 10,000 results.
+MAX_OFFSET_RESULTS = 10_000
+
+
+def load_email(email_file: str = "../.config/email.json"):
+    """Load the contact e-mail used for the OpenAlex polite pool, if configured."""
+    try:
+        with open(email_file) as f:
+            return json.load(f).get("email")
+    except Exception as e:
+        logging.warning("No contact e-mail loaded from %s: %s", email_file, e)
+        return None
+
+
+def failure_outcome(error: Exception) -> Outcome:
+    """Outcome of a request that raised, using the HTTP status when there is a response."""
+    if isinstance(error, RequestFailed):
+        return error.outcome
+    response = getattr(error, "response", None)
+    if response is not None:
+        return Outcome(classify(response.status_code), status=response.status_code, message=str(error))
+    return Outcome(classify(error=error), message=str(error))
+
+
+def request_endpoint(params: dict) -> str:
+    """Metrics name of a /works query: "cites" for citation lookups, "works" otherwise."""
+    return "cites" if str(params.get("filter", "")).startswith("cites:") else "works"
+
+
+def parse_results(json_data):
+    """
+    Parses the JSON data to extract specific fields for each work.
+    Returns a list of dictionaries containing selected fields.
+    """
+    logging.debug("Parsing JSON results.")
+    results = []
+    works = json_data.get("results", []) if isinstance(json_data, dict) else []
+
+    for work in works:
+        # Remove the prefix from the id and doi strings
+        work_id = work.get("id", "").removeprefix("https://openalex.org/")
+        doi = (work.get("doi") or "").removeprefix("https://doi.org/")
+        title = work.get("title", "")
+        primary_topic = work.get("primary_topic", {})
+        subfield = primary_topic.get("subfield", {})
+        subfield_display_name = subfield.get("display_name", "")
+        referenced_works_count = work.get("referenced_works_count", 0)
+        referenced_works = work.get("referenced_works", [])
+        referenced_works = [
+            ref_work.removeprefix("https://openalex.org/")
+            for ref_work in referenced_works
+        ]
+
+        results.append(
+            {
+                "id": work_id,
+                "doi": doi,
+                "title": title,
+                "subfield_display_name": subfield_display_name,
+                "referenced_works_count": referenced_works_count,
+                "referenced_works": referenced_works,
+                # This field will be populated later.
+                "cited_by": []
+            }
+        )
+    logging.debug("Parsed %s records from JSON data.", len(results))
+    return results
+
+
+class OpenAlexClient:
+    """Pooled HTTP client for /works queries with projection and concurrent paging."""
+
+    def __init__(
+        self,
+        base_url: str = OPENALEX_WORKS_URL,
+        mailto: str = None,
+        max_workers: int = 4,
+        rate: float = 10.0,
+        cache=None,
+        timeout: float = 30,
+        metrics: PipelineMetrics = None,
+        retry_policy: RetryPolicy = None,
+    ):
+        """
+        Args:
+            base_url (str): Works endpoint (override to point at a mock server).
+            mailto (str): Contact e-mail for the OpenAlex polite pool.
+            max_workers (int): Pages fetched concurrently (also the connection pool size).
+            rate (float): Maximum requests per second (OpenAlex allows 10).
+            cache (ResponseCache): Optional on-disk response cache.
+            timeout (float): Per-request timeout in seconds.
+            metrics (PipelineMetrics): Request metrics (default: a new one, unit "work").
+            retry_policy (RetryPolicy): Retry settings (defaults to RetryPolicy()).
+        """
+        self.base_url = base_url
+        self.mailto = mailto
+        self.max_workers = max_workers
+        self.cache = cache
+        self.timeout = timeout
+        self.metrics = metrics or PipelineMetrics(unit="work")
+        self.limiter = TokenBucket(rate, burst=max_workers)
+        self.retry_policy = retry_policy or RetryPolicy()
+        # A breaker per host; 429 bursts pause the workers and slow the shared limiter.
+        self.breakers = Breakers(limiter=self.limiter)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get_json(self, params: dict) -> dict:
+        """
+        GET the works endpoint with the given query parameters and return the JSON body.
+
+        Throttling, server, timeout, connection and parse errors are retried as set by
+        retry_policy.
+
+        Raises:
+            RequestFailed: If the request still fails after the retries.
+            LookupError: On a cache miss in offline mode.
+        """
+        if self.mailto:
+            params = {**params, "mailto": self.mailto}
+        url = requests.Request("GET", self.base_url, params=params).prepare().url
+        endpoint = request_endpoint(params)
+        if self.cache is not None:
+            data = self.cache.get("openalex", url)
+            self.metrics.record_cache(endpoint, data is not None)
+            if data is not None:
+                logging.debug("Cache hit for URL: %s", url)
+                return data
+            if self.cache.offline:
+                raise LookupError(f"Offline mode: no cached response for {url}")
+
+        logging.debug("Fetching API data from URL: %s", url)
+
+        def attempt() -> Outcome:
+            self.limiter.acquire()
+            started = perf_counter()
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+            except Exception as e:
+                self.metrics.record_request(endpoint, "error", perf_counter() - started)
+                return failure_outcome(e)
+            self.metrics.record_request(
+                endpoint, response.status_code, perf_counter() - started, len(response.content)
+            )
+            kind = classify(response.status_code)
+            if kind != OK:
+                return Outcome(
+                    kind,
+                    status=response.status_code,
+                    retry_after=parse_retry_after(response.headers.get("Retry-After")),
+                    message=f"HTTP {response.status_code}",
+                )
+            try:
+                return Outcome(OK, response.json(), response.status_code)
+            except ValueError as e:
+                return failure_outcome(e)
+
+        outcome = self.retry_policy.run(
+            attempt, self.breakers.get(url), partial(self._on_retry, endpoint, url)
+        )
+        if outcome.kind != OK:
+            raise RequestFailed(outcome, url)
+        data = outcome.data
+        if self.cache is not None:
+            self.cache.put("openalex", url, data)
+        return data
+
+    def _on_retry(self, endpoint: str, url: str, outcome: Outcome, attempt: int, delay: float) -> None:
+        self.metrics.record_retry(endpoint)
+        logging.warning(
+            "Attempt %s for %s failed (%s: %s); retrying in %.1fs",
+            attempt,
+            url,
+            outcome.kind,
+            outcome.message,
+            delay,
+        )
+
+    def iter_pages(self, filter: str, select: list = WORK_FIELDS, sort: str = None):
+        """
+        Yield the raw JSON pages of a /works query, in result order.
+
+        The first page (offset paging) reveals the total count. If every result is
+        reachable with offset paging, the remaining pages are fetched concurrently;
+        otherwise the query is walked with a cursor, prefetching each next page while
+        the caller consumes the current one.
+        """
+        params = {"filter": filter, "select": ",".join(select), "per_page": MAX_PER_PAGE}
+        if sort:
+            params["sort"] = sort
+
+        first = self.get_json({**params, "page": 1})
+        total = first.get("meta", {}).get("count", 0) or 0
+        total_pages = ceil(total / MAX_PER_PAGE) if total else 1
+        logging.debug("Total count: %s, Total pages: %s", total, total_pages)
+
+        if total <= MAX_OFFSET_RESULTS:
+            yield first
+            if total_pages > 1:
+                with concurrent.futures.ThreadPoolExecutor(self.max_workers) as executor:
+                    pages = executor.map(
+                        lambda page: self.get_json({**params, "page": page}),
+                        range(2, total_pages + 1),
+                    )
+                    yield from pages
+            return
+
+        # Too many results for offset paging: follow the cursor chain.
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            future = executor.submit(self.get_json, {**params, "cursor": "*"})
+            while future is not None:
+                page = future.result()
+                next_cursor = page.get("meta", {}).get("next_cursor")
+                future = (
+                    executor.submit(self.get_json, {**params, "cursor": next_cursor})
+                    if next_cursor and page.get("results")
+                    else None
+                )
+                yield page
+
+    def fetch_works(
+        self, filter: str, sort: str = None, cited_by_counts: dict = None
+    ) -> list:
+        """
+        Fetch every work matching the filter, parsed exactly as parse_results does.
+
+        If a dict is passed as cited_by_counts, it is filled with each work's
+        cited_by_count (which parse_results does not keep).
+        """
+        results = []
+        for page in self.iter_pages(filter, WORK_FIELDS, sort):
+            works = parse_results(page)
+            for work in works:
+                self.metrics.record_item(len(work["referenced_works"]))
+            results.extend(works)
+            if cited_by_counts is not None:
+                for work in page.get("results", []):
+                    work_id = work.get("id", "").removeprefix("https://openalex.org/")
+                    cited_by_counts[work_id] = work.get("cited_by_count")
+        logging.debug("Completed fetching all data. Total records: %s", len(results))
+        return results
+
+    def fetch_cited_by(self, work_id: str) -> list:
+        """Return the ids of all works citing the given work."""
+        cited_by_list = []
+        for page in self.iter_pages(f"cites:https://openalex.org/{work_id}", ["id"]):
+            for item in page.get("results", []):
+                cited_by_list.append(item.get("id", "").removeprefix("https://openalex.org/"))
+        logging.debug("Found %s citing works for work %s", len(cited_by_list), work_id)
+        return cited_by_list
+
+    def resolve_cited_by(
+        self,
+        works: list,
+        cited_by_counts: dict = None,
+        batch_size: int = CITES_BATCH_SIZE,
+        dead_letters=None,
+    ) -> dict:
+        """
+        Fill the "cited_by" list of every work, batching the network lookups.
+
+        Citations between collected works are taken from a reverse index over their
+        referenced_works, without any request. When cited_by_counts is given, works whose
+        citations are all accounted for locally (including works never cited) are not
+        looked up at all. The remaining works are queried in groups of up to `batch_size`
+        with one `cites:W1|W2|...` filter; each citing work is attributed back to the
+        cited works of the batch that appear in its referenced_works.
+
+        A batch that still fails after the adapter's retries keeps the citing works found
+        so far; each of its works is added to `dead_letters` (a DeadLetterQueue, endpoint
+        "cited_by") when one is given, and the remaining batches are still sent.
+
+        Returns:
+            dict: Request statistics (works resolved locally, looked up, batches sent and
+            batches failed).
+        """
+        reverse_index = build_reverse_index(works)
+        cited_by = {
+            work["id"]: list(reverse_index.get(work["id"], []))
+            for work in works
+            if work.get("id")
+        }
+
+        pending = [
+            work_id
+            for work_id, citers in cited_by.items()
+            if cited_by_counts is None
+            or cited_by_counts.get(work_id) is None
+            or cited_by_counts[work_id] > len(citers)
+        ]
+        seen = {work_id: set(citers) for work_id, citers in cited_by.items()}
+
+        batches = 0
+        failed = 0
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start : start + batch_size]
+            batch_ids = set(batch)
+            batches += 1
+            try:
+                for page in self.iter_pages(f"cites:{'|'.join(batch)}", ["id", "referenced_works"]):
+                    for item in page.get("results", []):
+                        citing_id = item.get("id", "").removeprefix("https://openalex.org/")
+                        for ref in item.get("referenced_works") or []:
+                            cited_id = ref.removeprefix("https://openalex.org/")
+                            if cited_id in batch_ids and citing_id not in seen[cited_id]:
+                                seen[cited_id].add(citing_id)
+                                cited_by[cited_id].append(citing_id)
+            except Exception as e:
+                logging.exception("Error fetching cited_by data for batch of %s work(s): %s", len(batch), e)
+                failed += 1
+                if dead_letters is not None:
+                    outcome = failure_outcome(e)
+                    for work_id in batch:
+                        dead_letters.add("cited_by", work_id, outcome)
+
+        for work in works:
+            if work.get("id"):
+                work["cited_by"] = cited_by[work["id"]]
+        stats = {
+            "works": len(cited_by),
+            "resolved_locally": len(cited_by) - len(pending),
+            "looked_up": len(pending),
+            "batches": batches,
+            "failed_batches": failed,
+        }
+        logging.debug("cited_by resolution: %s", stats)
+        return stats
+
+    def lookup_dois(self, work_ids: list, batch_size: int = CITES_BATCH_SIZE) -> dict:
+        """
+        Look up the DOIs of works by OpenAlex id.
+
+        Ids are sent `batch_size` at a time in one `openalex:W1|W2|...` filter, and the
+        batches run concurrently (within the rate limit).
+
+        Returns:
+            dict: Work id -> DOI without the https://doi.org/ prefix ("" for works without
+            a DOI). Ids that OpenAlex does not return are left out.
+        """
+
+        def fetch(batch):
+            found = {}
+            for page in self.iter_pages(f"openalex:{'|'.join(batch)}", ["id", "doi"]):
+                for item in page.get("results", []):
+                    work_id = item.get("id", "").removeprefix("https://openalex.org/")
+                    found[work_id] = (item.get("doi") or "").removeprefix("https://doi.org/")
+            return found
+
+        batches = [work_ids[start : start + batch_size] for start in range(0, len(work_ids), batch_size)]
+        dois = {}
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers) as executor:
+            for found in executor.map(fetch, batches):
+                dois.update(found)
+        logging.debug("DOI lookup: %s of %s work(s) found in %s batch(es)", len(dois), len(work_ids), len(batches))
+        return dois
+
+
+def build_reverse_index(works: list) -> dict:
+    """Map each referenced work id to the collected works that reference it."""
+    reverse_index = {}
+    for work in works:
+        citing_id = work.get("id")
+        if not citing_id:
+            continue
+        for cited_id in dict.fromkeys(work.get("referenced_works") or []):
+            reverse_index.setdefault(cited_id, []).append(citing_id)
+    return reverse_index
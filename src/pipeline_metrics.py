@@ -0,0 +1,275 @@
+"""
+Instrumentation shared by the harvesting scripts.
+
+PipelineMetrics collects, from any number of threads (or one event loop):
+
+    - request counters per endpoint and status code ("error" for requests that raised)
+    - request latency histograms per endpoint
+    - bytes received per endpoint
+    - retries and cache hits/misses per endpoint
+    - items (DOIs or works) completed, failed, and a histogram of edges per item
+
+All updates are a few integer operations under one lock, so they cost far less than
+the per-request print() lines they replace. Per-request and per-DOI messages go through
+get_logger() at DEBUG level: with the default INFO level they are dropped before being
+formatted. Instead, progress() prints a periodic throughput line, and report()/save()
+give the final metrics as JSON.
+"""
+
+import bisect
+import json
+import logging
+import sys
+import threading
+import time
+
+LOG_LEVELS = ["debug", "info", "warning", "error"]
+
+# Upper bounds of the histogram buckets (a last bucket takes everything above).
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+EDGE_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Handler writing to the current sys.stdout (so redirected output is followed)."""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+_root = logging.getLogger("pipeline")
+_root.addHandler(_StdoutHandler())
+_root.handlers[0].setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+_root.setLevel(logging.INFO)
+# The OpenAlex script sends the root logger to debug.log; keep these lines on stdout only.
+_root.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger printing "[LEVEL] message" lines to stdout, at the level set by set_log_level."""
+    return _root.getChild(name)
+
+
+def set_log_level(level: str, *loggers: logging.Logger) -> None:
+    """
+    Set the level of every pipeline logger ("debug", "info", "warning" or "error"),
+    and of any other logger given (e.g. the root logger of the OpenAlex script).
+    """
+    for logger in (_root, *loggers):
+        logger.setLevel(level.upper())
+
+
+class Histogram:
+    """Fixed-bucket histogram; percentiles are reported as bucket upper bounds."""
+
+    def __init__(self, bounds: list):
+        self.bounds = list(bounds)
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = None
+
+    def observe(self, value: float) -> None:
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, q: float):
+        """Upper bound of the bucket holding the q-th quantile (the maximum for the last bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        labels = [f"<={bound:g}" for bound in self.bounds] + [f">{self.bounds[-1]:g}"]
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+            "buckets": dict(zip(labels, self.buckets)),
+        }
+
+
+class PipelineMetrics:
+    """Thread-safe request and throughput metrics of one harvesting run."""
+
+    def __init__(self, total: int = None, unit: str = "DOI"):
+        """
+        Args:
+            total (int): Items expected in this run (enables the percentage and ETA).
+            unit (str): Name of an item in the progress line ("DOI", "work", ...).
+        """
+        self.total = total
+        self.unit = unit
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.requests = {}
+        self.latency = {}
+        self.bytes = {}
+        self.retries = {}
+        self.cache = {}
+        self.items = 0
+        self.failed = 0
+        self.edges = Histogram(EDGE_BUCKETS)
+        self._last = (self.started, 0, 0, 0)
+
+    def record_request(self, endpoint: str, status, seconds: float, nbytes: int = 0) -> None:
+        """Count one request to an endpoint with its status code (or "error"), duration and size."""
+        with self.lock:
+            counts = self.requests.setdefault(endpoint, {})
+            counts[str(status)] = counts.get(str(status), 0) + 1
+            if endpoint not in self.latency:
+                self.latency[endpoint] = Histogram(LATENCY_BUCKETS)
+            self.latency[endpoint].observe(seconds)
+            self.bytes[endpoint] = self.bytes.get(endpoint, 0) + nbytes
+
+    def record_retry(self, endpoint: str, count: int = 1) -> None:
+        if count:
+            with self.lock:
+                self.retries[endpoint] = self.retries.get(endpoint, 0) + count
+
+    def record_cache(self, endpoint: str, hit: bool) -> None:
+        with self.lock:
+            counts = self.cache.setdefault(endpoint, {"hits": 0, "misses": 0})
+            counts["hits" if hit else "misses"] += 1
+
+    def record_item(self, edges: int = 0, failed: bool = False) -> None:
+        """Count one completed item (DOI, work) and the number of edges it produced."""
+        with self.lock:
+            self.items += 1
+            if failed:
+                self.failed += 1
+            else:
+                self.edges.observe(edges)
+
+    def _totals(self) -> tuple:
+        requests = sum(sum(counts.values()) for counts in self.requests.values())
+        return self.items, requests, sum(self.bytes.values())
+
+    def progress_line(self) -> str:
+        """
+        One-line progress summary.
+
+        Rates are measured since the previous call (or the start), the ETA from the
+        average rate of the whole run.
+        """
+        now = time.perf_counter()
+        with self.lock:
+            items, requests, nbytes = self._totals()
+            errors = sum(
+                count
+                for counts in self.requests.values()
+                for status, count in counts.items()
+                if status != "200"
+            )
+            edges = int(self.edges.sum)
+            last_time, last_items, last_requests, last_bytes = self._last
+            self._last = (now, items, requests, nbytes)
+        interval = max(now - last_time, 1e-9)
+        done = f"{items}/{self.total} {self.unit}(s)" if self.total else f"{items} {self.unit}(s)"
+        if self.total:
+            done += f" ({100.0 * items / self.total:.1f}%)"
+        line = (
+            f"[PROGRESS] {done} | "
+            f"{(items - last_items) / interval:.1f} {self.unit}/s, "
+            f"{(requests - last_requests) / interval:.1f} req/s, "
+            f"{(nbytes - last_bytes) / interval / 1e6:.2f} MB/s | "
+            f"{edges} edge(s), {errors} failed attempt(s)"
+        )
+        elapsed = now - self.started
+        if self.total and items:
+            remaining = (self.total - items) * elapsed / items
+            line += f" | ETA {remaining:.0f}s"
+        return line
+
+    def progress(self, interval: float = 10.0):
+        """
+        Return a ProgressReporter printing progress_line() every `interval` seconds
+        from a background thread, and once more when stopped. Use it as a context
+        manager or call start()/stop(). An interval of 0 disables it.
+        """
+        return ProgressReporter(self, interval)
+
+    def report(self) -> dict:
+        """Return all metrics as a JSON-serializable dict."""
+        with self.lock:
+            elapsed = time.perf_counter() - self.started
+            items, requests, nbytes = self._totals()
+            return {
+                "elapsed_seconds": elapsed,
+                "items": {
+                    "unit": self.unit,
+                    "total": self.total,
+                    "completed": items,
+                    "failed": self.failed,
+                    "per_second": items / elapsed if elapsed else None,
+                },
+                "requests": {
+                    "total": requests,
+                    "per_second": requests / elapsed if elapsed else None,
+                    "by_endpoint": {endpoint: dict(counts) for endpoint, counts in self.requests.items()},
+                },
+                "latency_seconds": {
+                    endpoint: histogram.to_dict() for endpoint, histogram in self.latency.items()
+                },
+                "bytes_received": {"total": nbytes, "by_endpoint": dict(self.bytes)},
+                "retries": dict(self.retries),
+                "cache": {endpoint: dict(counts) for endpoint, counts in self.cache.items()},
+                "edges_per_item": self.edges.to_dict(),
+            }
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+class ProgressReporter:
+    """Background thread printing the progress line of a PipelineMetrics periodically."""
+
+    def __init__(self, metrics: PipelineMetrics, interval: float = 10.0):
+        self.metrics = metrics
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            print(self.metrics.progress_line(), flush=True)
+
+    def start(self):
+        if self.interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the thread and print a last progress line."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            print(self.metrics.progress_line(), flush=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Read-only citation queries over a memory-mapped CitationGraph snapshot.
+
+A snapshot is a CitationGraph saved with CitationGraph.save (the node table and the
+in/out CSR adjacency) plus the query indexes written by write_indexes:
+
+    doi_order        node ids sorted by DOI (DOI lookups are a binary search)
+    rank_indptr      offsets of every sub-area (then "unknown") in the rankings
+    rank_in_nodes    nodes of each sub-area by in-degree (times cited), descending
+    rank_out_nodes   nodes of each sub-area by out-degree (references), descending
+    area_counts      (areas + 1) x (areas + 1) edge counts, origin area x target area
+
+Everything is memory-mapped, so the service starts without reading the graph, and
+results are kept in an LRU cache. The queries:
+
+    cited-by     works citing a DOI        references   works a DOI cites
+    neighbors    both lists                top          degree ranking of a sub-area
+    area-counts  citations between sub-areas           stats        sizes and cache info
+
+The neighbour queries take an `area` filter: a sub-area, "unknown", or "csindex" for
+any CSIndex sub-area ("who in CSIndex cites this DOI").
+
+Usage:
+    python query_service.py build [edges.csv] [--snapshot DIR]
+    python query_service.py serve [--snapshot DIR] [--port 8900] [--cache-size 65536]
+    python query_service.py cited-by DOI [--area csindex] [--limit 100] [--offset 0]
+    python query_service.py top [--area ai] [--degree in] [--limit 10]
+    python query_service.py area-counts [--area ai]
+
+HTTP (GET, JSON): /cited-by?doi=...&area=csindex, /references?doi=..., /neighbors?doi=...,
+/top?area=ai&degree=in&limit=10, /area-counts?area=ai, /stats
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from citation_graph import UNKNOWN, UNKNOWN_CODE, CitationGraph
+from doi_utils import canonicalize_doi
+from pipeline_metrics import get_logger
+
+DEFAULT_SNAPSHOT_DIR = "../data/citation_graph"
+DEFAULT_PORT = 8900
+DEFAULT_CACHE_SIZE = 65_536
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 10_000
+
+# Area filter matching every CSIndex sub-area (any node whose sub-area is known).
+CSINDEX = "csindex"
+DEGREES = ["in", "out"]
+NEIGHBOR_QUERIES = ["cited-by", "references", "neighbors"]
+QUERIES = NEIGHBOR_QUERIES + ["top", "area-counts", "stats"]
+
+INDEX_ARRAYS = ["doi_order", "rank_indptr", "rank_in_nodes", "rank_out_nodes", "area_counts"]
+
+log = get_logger("query_service")
+
+
+def build_indexes(graph: CitationGraph) -> dict:
+    """Compute the query index arrays (see the module docstring) of a graph."""
+    dois = np.array(graph.dois(), dtype=object)
+    doi_order = np.argsort(dois, kind="stable").astype(np.int32)
+
+    # Area positions: 0..len(areas)-1, then len(areas) for unknown.
+    position = np.minimum(np.asarray(graph.node_area, dtype=np.int64), len(graph.areas))
+    nodes = np.arange(graph.num_nodes)
+    rank_indptr = np.zeros(len(graph.areas) + 2, dtype=np.int64)
+    np.cumsum(np.bincount(position, minlength=len(graph.areas) + 1), out=rank_indptr[1:])
+    indexes = {"doi_order": doi_order, "rank_indptr": rank_indptr}
+    for degree, values in (("in", graph.in_degree()), ("out", graph.out_degree())):
+        # Grouped by area, highest degree first, ties by node id.
+        indexes[f"rank_{degree}_nodes"] = np.lexsort((nodes, -values, position)).astype(np.int32)
+
+    src, dst = graph.edges()
+    size = len(graph.areas) + 1
+    indexes["area_counts"] = np.bincount(
+        position[src] * size + position[dst], minlength=size * size
+    ).reshape(size, size)
+    return indexes
+
+
+def write_indexes(graph: CitationGraph, directory: str) -> None:
+    """Save the query indexes of a graph next to its snapshot arrays."""
+    os.makedirs(directory, exist_ok=True)
+    for name, array in build_indexes(graph).items():
+        np.save(os.path.join(directory, f"{name}.npy"), array)
+
+
+def build_snapshot(graph: CitationGraph, directory: str) -> None:
+    """Save a graph and its query indexes as a snapshot directory."""
+    graph.save(directory)
+    write_indexes(graph, directory)
+
+
+class CitationQueries:
+    """Query engine over a snapshot directory, with an LRU cache of results."""
+
+    def __init__(self, snapshot_dir: str = DEFAULT_SNAPSHOT_DIR, cache_size: int = DEFAULT_CACHE_SIZE):
+        """
+        Args:
+            snapshot_dir (str): Directory written by build_snapshot.
+            cache_size (int): Number of query results kept in the LRU cache.
+        """
+        self.graph = CitationGraph.load(snapshot_dir)
+        if not all(os.path.exists(os.path.join(snapshot_dir, f"{name}.npy")) for name in INDEX_ARRAYS):
+            log.warning("Snapshot '%s' has no query indexes; building them in memory", snapshot_dir)
+            self.index = build_indexes(self.graph)
+        else:
+            self.index = {
+                name: np.load(os.path.join(snapshot_dir, f"{name}.npy"), mmap_mode="r")
+                for name in INDEX_ARRAYS
+            }
+        self.area_names = self.graph.areas + [UNKNOWN]
+        self._run = lru_cache(maxsize=cache_size)(self._execute)
+
+    def node_id(self, doi: str) -> int:
+        """
+        Return the id of a DOI (canonicalized first when it is a valid DOI).
+
+        Raises:
+            KeyError: If the DOI is not in the graph.
+        """
+        doi = canonicalize_doi(doi) or doi.strip()
+        order = self.index["doi_order"]
+        position = bisect_left(order, doi, key=self.graph.doi)
+        if position == len(order) or self.graph.doi(order[position]) != doi:
+            raise KeyError(doi)
+        return int(order[position])
+
+    def _area_filter(self, area):
+        if area is None:
+            return None
+        if area == CSINDEX:
+            return lambda codes: codes != UNKNOWN_CODE
+        code = self.graph.area_code(area) if area != UNKNOWN else UNKNOWN_CODE
+        return lambda codes: codes == code
+
+    def _works(self, nodes: np.ndarray) -> list:
+        areas = np.asarray(self.graph.node_area)[nodes]
+        return [
+            {"doi": self.graph.doi(node), "sub_area": self.graph.area_name(code)}
+            for node, code in zip(nodes.tolist(), areas.tolist())
+        ]
+
+    def _neighbor_list(self, nodes: np.ndarray, area, limit: int, offset: int) -> dict:
+        nodes = np.sort(np.asarray(nodes))
+        keep = self._area_filter(area)
+        if keep is not None:
+            nodes = nodes[keep(np.asarray(self.graph.node_area)[nodes])]
+        return {"count": len(nodes), "results": self._works(nodes[offset : offset + limit])}
+
+    def _execute(self, query: str, doi=None, area=None, degree="in", limit=DEFAULT_LIMIT, offset=0) -> dict:
+        graph = self.graph
+        if query in NEIGHBOR_QUERIES:
+            node = self.node_id(doi)
+            result = {"doi": graph.doi(node), "sub_area": graph.area_name(graph.node_area[node])}
+            if query in ("cited-by", "neighbors"):
+                result["cited_by"] = self._neighbor_list(graph.predecessors(node), area, limit, offset)
+            if query in ("references", "neighbors"):
+                result["references"] = self._neighbor_list(graph.successors(node), area, limit, offset)
+            return result
+        if query == "top":
+            indptr = np.asarray(graph.in_indptr if degree == "in" else graph.out_indptr)
+            if area is None:
+                values = np.diff(indptr)
+                count = min(offset + limit, len(values))
+                best = np.argpartition(-values, count - 1)[:count] if count else np.arange(0)
+                ranked = best[np.lexsort((best, -values[best]))][offset:]
+            else:
+                position = self.area_names.index(area)
+                start, end = self.index["rank_indptr"][position : position + 2]
+                ranked = np.asarray(
+                    self.index[f"rank_{degree}_nodes"][start + offset : min(start + offset + limit, end)]
+                )
+            results = self._works(ranked)
+            for work, value in zip(results, (indptr[ranked + 1] - indptr[ranked]).tolist()):
+                work[f"{degree}_degree"] = value
+            return {"area": area, "degree": degree, "results": results}
+        if query == "area-counts":
+            counts = np.asarray(self.index["area_counts"])
+            rows = [self.area_names.index(area)] if area is not None else range(len(self.area_names))
+            return {
+                self.area_names[row]: {
+                    target: int(count) for target, count in zip(self.area_names, counts[row]) if count
+                }
+                for row in rows
+            }
+        if query == "stats":
+            info = self._run.cache_info()
+            return {
+                "nodes": graph.num_nodes,
+                "edges": graph.num_edges,
+                "areas": graph.areas,
+                "cache": {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize},
+            }
+        raise ValueError(f"Unknown query '{query}'")
+
+    def run(self, query: str, doi=None, area=None, degree="in", limit=DEFAULT_LIMIT, offset=0) -> dict:
+        """
+        Validate the parameters of a query and return its (cached) result.
+
+        Raises:
+            ValueError: If the query or a parameter is invalid.
+            KeyError: If the DOI is not in the graph.
+        """
+        if query not in QUERIES:
+            raise ValueError(f"Unknown query '{query}' (expected one of {', '.join(QUERIES)})")
+        if query in NEIGHBOR_QUERIES and not doi:
+            raise ValueError(f"Query '{query}' needs a doi")
+        areas = self.area_names + [CSINDEX] if query in NEIGHBOR_QUERIES else self.area_names
+        if area is not None and area not in areas:
+            raise ValueError(f"Unknown area '{area}' (expected one of {', '.join(areas)})")
+        if degree not in DEGREES:
+            raise ValueError(f"degree must be one of {', '.join(DEGREES)}")
+        limit, offset = int(limit), int(offset)
+        if not 0 <= limit <= MAX_LIMIT or offset < 0:
+            raise ValueError(f"limit must be between 0 and {MAX_LIMIT} and offset not negative")
+        if query == "stats":
+            # Never cached: it reports the cache itself.
+            return self._execute(query)
+        if doi is not None:
+            doi = canonicalize_doi(doi) or doi.strip()
+        return self._run(query, doi, area, degree, limit, offset)
+
+
+class QueryServer(ThreadingHTTPServer):
+    """Threaded HTTP server answering CitationQueries as JSON."""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, queries: CitationQueries):
+        super().__init__(address, QueryHandler)
+        self.queries = queries
+
+    def handle_error(self, request, client_address):
+        # Clients closing keep-alive connections are expected; anything else is logged.
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        log.exception("Error while handling a request from %s", client_address[0])
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, data) -> None:
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        try:
+            self.send_json(200, self.server.queries.run(url.path.strip("/"), **params))
+        except KeyError as e:
+            self.send_json(404, {"error": f"Unknown DOI {e.args[0]}"})
+        except (TypeError, ValueError) as e:
+            self.send_json(400, {"error": str(e)})
+        except (ConnectionResetError, BrokenPipeError):
+            raise
+        except Exception as e:
+            log.exception("Query %s failed", self.path)
+            self.send_json(500, {"error": f"Internal error ({type(e).__name__})"})
+
+
+def start_server(queries: CitationQueries, port: int = DEFAULT_PORT) -> QueryServer:
+    """Start a QueryServer in a background thread and return it (call shutdown() to stop)."""
+    server = QueryServer(("127.0.0.1", port), queries)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a citation graph snapshot.")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--snapshot", default=DEFAULT_SNAPSHOT_DIR, help="Snapshot directory.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", parents=[common], help="Build a snapshot from an edge list.")
+    build.add_argument("input", nargs="?", default="../data/open_citations_edge_list.csv", help="Edge list file (.csv or .parquet).")
+
+    serve = commands.add_parser("serve", parents=[common], help="Serve the queries over HTTP.")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on.")
+    serve.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, help="LRU cache entries.")
+
+    for name in NEIGHBOR_QUERIES:
+        command = commands.add_parser(name, parents=[common], help=f"Run a {name} query.")
+        command.add_argument("doi", help="DOI to look up.")
+        command.add_argument("--area", help=f"Only list works of this sub-area ('{CSINDEX}': any CSIndex sub-area).")
+        command.add_argument("--limit", type=int, default=DEFAULT_LIMIT, help="Maximum number of works listed.")
+        command.add_argument("--offset", type=int, default=0, help="Number of works skipped.")
+    top = commands.add_parser("top", parents=[common], help="Rank works by degree.")
+    top.add_argument("--area", help="Sub-area to rank (default: all works).")
+    top.add_argument("--degree", choices=DEGREES, default="in", help="in: times cited, out: references.")
+    top.add_argument("--limit", type=int, default=10, help="Number of works listed.")
+    top.add_argument("--offset", type=int, default=0, help="Number of works skipped.")
+    counts = commands.add_parser("area-counts", parents=[common], help="Citations between sub-areas.")
+    counts.add_argument("--area", help="Only the citations from this sub-area.")
+    commands.add_parser("stats", parents=[common], help="Snapshot sizes.")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from csindex_areas import AREAS
+
+        start = time.perf_counter()
+        graph = CitationGraph.from_file(args.input, AREAS)
+        build_snapshot(graph, args.snapshot)
+        print(
+            f"[COMPLETE] Snapshot of {graph.num_nodes} node(s) and {graph.num_edges} edge(s) "
+            f"saved to '{args.snapshot}' in {time.perf_counter() - start:.2f}s."
+        )
+        return
+
+    start = time.perf_counter()
+    queries = CitationQueries(args.snapshot, getattr(args, "cache_size", DEFAULT_CACHE_SIZE))
+    if args.command == "serve":
+        server = QueryServer(("127.0.0.1", args.port), queries)
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        print(
+            f"[INFO] Serving '{args.snapshot}' ({queries.graph.num_nodes} node(s)) on "
+            f"http://127.0.0.1:{args.port} (started in {time.perf_counter() - start:.2f}s)",
+            flush=True,
+        )
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+        return
+
+    params = {name: getattr(args, name) for name in ("doi", "area", "degree", "limit", "offset") if hasattr(args, name)}
+    try:
+        print(json.dumps(queries.run(args.command, **params), indent=2))
+    except KeyError as e:
+        print(f"[ERROR] Unknown DOI {e.args[0]}")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Token-bucket rate limiter shared by the harvesting scripts.
+
+The bucket refills at `rate` tokens per second up to `burst` tokens. Each request
+takes one token; when the bucket is empty the caller waits until its token is due.
+The same bucket can be used from worker threads (`acquire`) and from asyncio
+coroutines (`acquire_async`), so both harvesting engines honour the same budget.
+"""
+
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket usable from both threads and coroutines."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Args:
+            rate (float): Tokens added per second. A value <= 0 disables limiting.
+            burst (int): Maximum number of tokens that can accumulate.
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """
+        Take one token and return how many seconds the caller must wait for it.
+
+        Tokens may go negative: every caller reserves its own slot in the future,
+        so concurrent callers are spread out at exactly `rate` requests per second.
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        """Block the calling thread until a token is available."""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        """Suspend the calling coroutine until a token is available."""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
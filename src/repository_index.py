@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Resolve edge endpoints against the CSIndex repository index.
+
+The harvester only knows the sub-area of the publication it was processing, so each
+edge arrives with one of origin_sub_area/target_sub_area empty. This module fills
+both sides from the repository index (DOI -> sub-area) with a vectorized,
+dictionary-encoded join: DOIs are looked up once per block with a hash index and
+the sub-areas are gathered from categorical codes, with no per-row Python.
+
+With repository_only=True only edges whose two endpoints are CSIndex publications
+are kept, which is the network stored in repository_edge_list.csv.
+
+Usage:
+    python repository_index.py edges.csv repository_index.csv output.csv [--repository-only]
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from edge_store import EDGE_COLUMNS
+
+INDEX_FILE = "repository_index.csv"
+
+# Column order used by repository_edge_list.csv.
+REPOSITORY_COLUMNS = ["origin_doi", "origin_sub_area", "target_doi", "target_sub_area"]
+
+
+def build_repository_index(publications: list) -> pd.Series:
+    """
+    Build the repository index from (doi, sub_area) pairs.
+
+    As with a plain dict, a DOI listed under several sub-areas keeps the last one.
+
+    Returns:
+        pd.Series: Categorical sub-areas indexed by (unique) DOI.
+    """
+    df = pd.DataFrame(publications, columns=["doi", "sub_area"])
+    df = df.drop_duplicates("doi", keep="last")
+    return pd.Series(
+        pd.Categorical(df["sub_area"]), index=pd.Index(df["doi"]), name="sub_area"
+    )
+
+
+def save_repository_index(index: pd.Series, path: str = INDEX_FILE) -> None:
+    index.rename_axis("doi").reset_index().to_csv(path, index=False)
+
+
+def load_repository_index(path: str = INDEX_FILE) -> pd.Series:
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    return build_repository_index(df.itertuples(index=False, name=None))
+
+
+def resolve_sub_areas(
+    edges: pd.DataFrame, index: pd.Series, repository_only: bool = False
+) -> pd.DataFrame:
+    """
+    Fill missing origin/target sub-areas from the repository index.
+
+    Sub-areas already present on an edge are kept (they record the area under which the
+    publication was harvested); only empty values are resolved. Endpoints that are not
+    in the repository stay empty.
+
+    Args:
+        edges (pd.DataFrame): Edge block with the origin/target DOI and sub-area columns.
+        index (pd.Series): Repository index as returned by build_repository_index.
+        repository_only (bool): Keep only edges whose two endpoints are in the repository.
+
+    Returns:
+        pd.DataFrame: The resolved (and possibly filtered) edge block.
+    """
+    # Position -1 (DOI not in the repository) picks the trailing code -1,
+    # and code -1 picks the trailing empty string.
+    area_codes = np.append(index.cat.codes.to_numpy(), -1)
+    lookup = np.append(index.cat.categories.to_numpy(dtype=object), "")
+    edges = edges.copy()
+    in_repository = np.ones(len(edges), dtype=bool)
+    for side in ("origin", "target"):
+        positions = index.index.get_indexer(edges[f"{side}_doi"])
+        in_repository &= positions >= 0
+        codes = area_codes[positions]
+        current = edges[f"{side}_sub_area"].fillna("").to_numpy(dtype=object)
+        edges[f"{side}_sub_area"] = np.where(current != "", current, lookup[codes])
+    if repository_only:
+        edges = edges[in_repository]
+    return edges
+
+
+def resolve_edge_file(
+    input_file: str,
+    output_file: str,
+    index: pd.Series,
+    repository_only: bool = False,
+    chunksize: int = 500_000,
+) -> int:
+    """Resolve an edge CSV block by block and return the number of edges written."""
+    written = 0
+    header = True
+    for block in pd.read_csv(
+        input_file, dtype=str, keep_default_na=False, chunksize=chunksize
+    ):
+        block = resolve_sub_areas(block, index, repository_only)
+        if repository_only:
+            block = block[REPOSITORY_COLUMNS]
+        block.to_csv(output_file, mode="w" if header else "a", header=header, index=False)
+        header = False
+        written += len(block)
+    if header:
+        columns = REPOSITORY_COLUMNS if repository_only else EDGE_COLUMNS
+        pd.DataFrame(columns=columns).to_csv(output_file, index=False)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fill edge sub-areas from the CSIndex repository index."
+    )
+    parser.add_argument("edges", help="Edge list CSV produced by extraction_open_citations.py")
+    parser.add_argument("index", help="Repository index CSV (doi,sub_area)")
+    parser.add_argument("output", help="Destination CSV")
+    parser.add_argument(
+        "--repository-only",
+        action="store_true",
+        help="Keep only edges between two CSIndex publications.",
+    )
+    args = parser.parse_args()
+
+    index = load_repository_index(args.index)
+    written = resolve_edge_file(args.edges, args.output, index, args.repository_only)
+    print(f"[COMPLETE] {written} edge(s) saved to '{args.output}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Persistent on-disk cache for API responses (OpenCitations and OpenAlex).
+
+Responses are stored in a single SQLite file keyed by (endpoint, identifier), e.g.
+("references", "10.1145/123") or ("openalex", "<full request URL>"). Bodies are
+stored as zlib-compressed JSON. Each entry carries its own expiry time, and the
+file is kept under a size budget by evicting the least recently used entries. Cache
+hits do not write to the file: their access times are batched (see ACCESS_FLUSH_SIZE).
+
+In offline mode the cache is the only source of data: lookups also return expired
+entries, and callers are expected to skip the network on a miss.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+DEFAULT_CACHE_PATH = "../cache/responses.sqlite"
+DEFAULT_TTL_DAYS = 30
+DEFAULT_MAX_MB = 2048
+# Access times of cache hits are kept in memory and written in one batch once this
+# many are pending (or on the next put, eviction or close).
+ACCESS_FLUSH_SIZE = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    endpoint   TEXT NOT NULL,
+    identifier TEXT NOT NULL,
+    body       BLOB NOT NULL,
+    size       INTEGER NOT NULL,
+    expires    REAL,
+    accessed   REAL NOT NULL,
+    PRIMARY KEY (endpoint, identifier)
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+"""
+
+
+class ResponseCache:
+    """SQLite-backed response cache with per-entry TTL and size-bounded LRU eviction."""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        ttl: float = DEFAULT_TTL_DAYS * 86400,
+        max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+        offline: bool = False,
+    ):
+        """
+        Args:
+            path (str): SQLite file to open (created if missing).
+            ttl (float): Default time-to-live in seconds for new entries (None = never expires).
+            max_bytes (int): Upper bound on the total size of the stored (compressed) bodies.
+            offline (bool): Serve only from the cache, including expired entries.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # (endpoint, identifier) -> time of the last hit not yet written to the file.
+        self._accessed = {}
+        # One connection shared by all worker threads; access is serialized by _lock.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    def get(self, endpoint: str, identifier: str):
+        """
+        Return the cached JSON body for (endpoint, identifier), or None on a miss.
+
+        Expired entries count as misses unless the cache is in offline mode.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, expires FROM responses WHERE endpoint = ? AND identifier = ?",
+                (endpoint, identifier),
+            ).fetchone()
+            if row is None or (
+                not self.offline and row[1] is not None and row[1] < now
+            ):
+                self.misses += 1
+                return None
+            # A hit is a read only; its access time is written later in a batch.
+            self._accessed[(endpoint, identifier)] = now
+            if len(self._accessed) >= ACCESS_FLUSH_SIZE:
+                self._flush_accessed()
+                self._conn.commit()
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def _flush_accessed(self) -> None:
+        """Write the pending access times of cache hits (the caller commits)."""
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE responses SET accessed = ? WHERE endpoint = ? AND identifier = ?",
+                [(accessed, *key) for key, accessed in self._accessed.items()],
+            )
+            self._accessed.clear()
+
+    def put(self, endpoint: str, identifier: str, data, ttl: float = None) -> None:
+        """Store a JSON-serializable body, evicting old entries if the size budget is exceeded."""
+        body = zlib.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires = now + ttl if ttl is not None else None
+        with self._lock:
+            self._flush_accessed()
+            previous = self._conn.execute(
+                "SELECT size FROM responses WHERE endpoint = ? AND identifier = ?",
+                (endpoint, identifier),
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (endpoint, identifier, body, len(body), expires, now),
+            )
+            self._total_bytes += len(body) - (previous[0] if previous else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache is at 90% of its budget."""
+        self._flush_accessed()
+        target = int(self.max_bytes * 0.9)
+        cursor = self._conn.execute(
+            "SELECT endpoint, identifier, size FROM responses ORDER BY accessed"
+        )
+        victims = []
+        for endpoint, identifier, size in cursor:
+            if self._total_bytes <= target:
+                break
+            victims.append((endpoint, identifier))
+            self._total_bytes -= size
+        self._conn.executemany(
+            "DELETE FROM responses WHERE endpoint = ? AND identifier = ?", victims
+        )
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size of the cache."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": self._total_bytes,
+        }
+
+    def report(self) -> str:
+        """One-line human-readable summary of the cache statistics."""
+        s = self.stats()
+        return (
+            f"Response cache: {s['hits']} hit(s), {s['misses']} miss(es) "
+            f"(hit rate {s['hit_rate']:.1%}), {s['entries']} entries, "
+            f"{s['bytes'] / 1024 / 1024:.1f} MB"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_accessed()
+            self._conn.commit()
+            self._conn.close()
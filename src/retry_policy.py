@@ -0,0 +1,363 @@
+"""
+Failure handling for the harvesting scripts.
+
+A failed lookup used to be logged and turned into an empty result, so throttling or
+a flaky connection silently removed edges from the network. This module provides:
+
+    - classify(): maps a status code or exception to an error kind ("throttled",
+      "server", "timeout", "connection", "parse", "not_found", "client", "error")
+    - RetryPolicy: retries the retryable kinds with exponential backoff and full
+      jitter, waiting at least as long as a Retry-After header asks
+    - CircuitBreaker: per-host breaker that, when the share of 429 responses in a
+      sliding window spikes, pauses every worker talking to that host and halves
+      the shared token bucket rate (restored gradually once requests succeed)
+    - DeadLetterQueue: JSONL file of the (endpoint, identifier) pairs that still
+      failed after all retries, so they can be replayed later
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import NamedTuple
+from urllib.parse import urlparse
+
+import aiohttp
+import requests
+
+DEAD_LETTER_FILE = "dead_letters.jsonl"
+
+OK = "ok"
+# Kinds worth retrying; anything else (404, other 4xx, unknown exceptions) fails at once.
+RETRYABLE = {"throttled", "server", "timeout", "connection", "parse"}
+
+
+def classify(status: int = None, error: Exception = None) -> str:
+    """Return the error kind of a response status or of the exception a request raised."""
+    if error is not None:
+        if isinstance(error, (requests.Timeout, TimeoutError, asyncio.TimeoutError)):
+            return "timeout"
+        if isinstance(
+            error,
+            (
+                requests.ConnectionError,
+                aiohttp.ClientConnectionError,
+                aiohttp.ClientPayloadError,
+                ConnectionError,
+            ),
+        ):
+            return "connection"
+        if isinstance(error, ValueError):
+            # json.JSONDecodeError (and the requests/aiohttp wrappers) derive from ValueError.
+            return "parse"
+        return "error"
+    if status == 200:
+        return OK
+    if status == 429:
+        return "throttled"
+    if status == 404:
+        return "not_found"
+    if status is not None and status >= 500:
+        return "server"
+    return "client"
+
+
+def parse_retry_after(value) -> float:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class Outcome(NamedTuple):
+    """Result of one request attempt (and, once returned by RetryPolicy.run, of all of them)."""
+
+    kind: str
+    data: object = None
+    status: int = None
+    retry_after: float = None
+    message: str = ""
+    attempts: int = 1
+
+
+class RequestFailed(Exception):
+    """Raised by callers that cannot return None when a request fails after all retries."""
+
+    def __init__(self, outcome: Outcome, url: str = ""):
+        super().__init__(f"{url}: {outcome.kind} after {outcome.attempts} attempt(s) ({outcome.message})")
+        self.outcome = outcome
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, honouring Retry-After."""
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        seed: int = None,
+    ):
+        """
+        Args:
+            max_attempts (int): Attempts per request, including the first one.
+            base_delay (float): Backoff before the first retry (doubled for each retry).
+            max_delay (float): Upper bound of any single wait, Retry-After included.
+            seed (int): Seed of the jitter (for reproducible runs).
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.random = random.Random(seed)
+
+    def should_retry(self, kind: str, attempt: int) -> bool:
+        return kind in RETRYABLE and attempt < self.max_attempts
+
+    def delay(self, attempt: int, retry_after: float = None) -> float:
+        """Seconds to wait after the given (1-based) failed attempt."""
+        backoff = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        delay = self.random.uniform(0, backoff)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def run(self, attempt, breaker=None, on_retry=None) -> Outcome:
+        """
+        Call attempt() (which returns an Outcome) until it succeeds or must give up.
+
+        Args:
+            attempt (callable): Performs one request and returns its Outcome.
+            breaker (CircuitBreaker): Optional breaker consulted before every attempt.
+            on_retry (callable): Called as on_retry(outcome, attempt_number, delay)
+                before each wait.
+
+        Returns:
+            Outcome: The last outcome, with `attempts` set.
+        """
+        for number in itertools.count(1):
+            if breaker is not None:
+                breaker.wait()
+            outcome = attempt()
+            if breaker is not None:
+                breaker.record(outcome.kind, outcome.retry_after)
+            if outcome.kind == OK or not self.should_retry(outcome.kind, number):
+                return outcome._replace(attempts=number)
+            delay = self.delay(number, outcome.retry_after)
+            if on_retry is not None:
+                on_retry(outcome, number, delay)
+            time.sleep(delay)
+
+    async def run_async(self, attempt, breaker=None, on_retry=None) -> Outcome:
+        """Asynchronous counterpart of run(); attempt() is a coroutine function."""
+        for number in itertools.count(1):
+            if breaker is not None:
+                await breaker.wait_async()
+            outcome = await attempt()
+            if breaker is not None:
+                breaker.record(outcome.kind, outcome.retry_after)
+            if outcome.kind == OK or not self.should_retry(outcome.kind, number):
+                return outcome._replace(attempts=number)
+            delay = self.delay(number, outcome.retry_after)
+            if on_retry is not None:
+                on_retry(outcome, number, delay)
+            await asyncio.sleep(delay)
+
+
+class CircuitBreaker:
+    """
+    Throttling breaker for one host.
+
+    The outcome of every request is kept in a sliding window. When at least
+    `threshold` of the last `window` responses were 429s, the breaker opens: all
+    callers of wait() are held for `cooldown` seconds (or the Retry-After, if longer)
+    and the rate of the shared limiter is halved. Every `window` successful requests
+    after that raise the rate by a quarter, up to its original value.
+    """
+
+    def __init__(
+        self,
+        window: int = 50,
+        threshold: float = 0.2,
+        cooldown: float = 5.0,
+        limiter=None,
+        min_rate: float = 0.5,
+    ):
+        """
+        Args:
+            window (int): Number of recent responses considered.
+            threshold (float): Share of 429s in the window that opens the breaker.
+            cooldown (float): Minimum pause, in seconds, when the breaker opens.
+            limiter (TokenBucket): Shared rate limiter slowed down while throttled.
+            min_rate (float): Lowest rate the limiter is reduced to.
+        """
+        self.window = window
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.limiter = limiter
+        self.min_rate = min_rate
+        self.full_rate = limiter.rate if limiter is not None else 0
+        self.open_until = 0.0
+        self.trips = 0
+        self._recent = deque(maxlen=window)
+        self._successes = 0
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, retry_after: float = None) -> None:
+        """Record the outcome kind of one request (only throttling and successes count)."""
+        if kind not in (OK, "throttled"):
+            return
+        with self._lock:
+            self._recent.append(kind == "throttled")
+            if kind == OK:
+                self._successes += 1
+                if self._successes >= self.window:
+                    self._successes = 0
+                    self._speed_up()
+                return
+            self._successes = 0
+            if len(self._recent) >= min(10, self.window) and (
+                sum(self._recent) / len(self._recent) >= self.threshold
+            ):
+                self._trip(max(self.cooldown, retry_after or 0.0))
+
+    def _trip(self, pause: float) -> None:
+        self.open_until = max(self.open_until, time.monotonic() + pause)
+        self.trips += 1
+        self._recent.clear()
+        if self.limiter is not None and self.limiter.rate > 0:
+            self.limiter.rate = max(self.min_rate, self.limiter.rate / 2)
+
+    def _speed_up(self) -> None:
+        if self.limiter is not None and 0 < self.limiter.rate < self.full_rate:
+            self.limiter.rate = min(self.full_rate, self.limiter.rate * 1.25)
+
+    def remaining(self) -> float:
+        """Seconds until the breaker closes again (0 when closed)."""
+        return max(0.0, self.open_until - time.monotonic())
+
+    def wait(self) -> None:
+        pause = self.remaining()
+        if pause > 0:
+            time.sleep(pause)
+
+    async def wait_async(self) -> None:
+        pause = self.remaining()
+        if pause > 0:
+            await asyncio.sleep(pause)
+
+
+class Breakers:
+    """CircuitBreaker per host, created on first use with the same settings."""
+
+    def __init__(self, **settings):
+        """
+        Args:
+            settings: Keyword arguments passed to every CircuitBreaker.
+        """
+        self.settings = settings
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> CircuitBreaker:
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(**self.settings)
+            return self._breakers[host]
+
+    def trips(self) -> dict:
+        """Number of times each host's breaker opened."""
+        with self._lock:
+            return {host: breaker.trips for host, breaker in self._breakers.items()}
+
+
+class DeadLetterQueue:
+    """Append-only JSONL file of requests that failed after all retries."""
+
+    def __init__(self, path: str = DEAD_LETTER_FILE):
+        self.path = path
+        self.replay_path = path + ".replay"
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def add(self, endpoint: str, identifier: str, outcome: Outcome) -> None:
+        """Record a failed (endpoint, identifier) pair with the outcome of its last attempt."""
+        entry = {
+            "endpoint": endpoint,
+            "id": identifier,
+            "kind": outcome.kind,
+            "status": outcome.status,
+            "attempts": outcome.attempts,
+            "message": outcome.message,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self.count += 1
+
+    @staticmethod
+    def _read(path: str) -> dict:
+        entries = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        entry = json.loads(line)
+                        entries[(entry["endpoint"], entry["id"])] = entry
+        return entries
+
+    def entries(self) -> list:
+        """Return the recorded failures, one (the latest) per (endpoint, identifier) pair."""
+        return list(self._read(self.path).values())
+
+    def take(self, endpoints=None) -> list:
+        """
+        Move the recorded failures aside for a replay and return them.
+
+        Only entries of the given endpoints are taken (all of them by default); the
+        others stay in the file for the script that owns them. Failures recorded during
+        the replay go to a fresh file. Entries of a replay that did not finish (see
+        finish_replay) are taken again.
+        """
+        with self._lock:
+            entries = self._read(self.replay_path)
+            entries.update(self._read(self.path))
+            taken = {
+                key: entry
+                for key, entry in entries.items()
+                if endpoints is None or entry["endpoint"] in endpoints
+            }
+            kept = [entry for key, entry in entries.items() if key not in taken]
+            self._write(self.replay_path, taken.values())
+            if kept:
+                self._write(self.path, kept)
+            elif os.path.exists(self.path):
+                os.remove(self.path)
+        return list(taken.values())
+
+    @staticmethod
+    def _write(path: str, entries) -> None:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(entry) + "\n" for entry in entries)
+        os.replace(tmp_path, path)
+
+    def finish_replay(self) -> None:
+        """Drop the entries taken for a replay once its results are merged."""
+        if os.path.exists(self.replay_path):
+            os.remove(self.replay_path)
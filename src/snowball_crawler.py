@@ -0,0 +1,375 @@
+"""
+Multi-hop snowball crawl over the OpenCitations network.
+
+process_doi collects one hop: the references and citations of each CSIndex
+publication. SnowballCrawler repeats that expansion from the DOIs it discovers, up to
+`depth` hops from the seeds and at most `budget` expanded nodes:
+
+    - NodeTable interns every DOI that may still be expanded into a dense int id;
+      its hop, degree and state live in compact arrays indexed by that id
+    - the Frontier is a heap ordered by hop, then by degree (the number of expanded
+      neighbours linked to the node, in either direction), so under a budget each
+      hop is expanded best-connected nodes first
+    - nodes at the last hop are never expanded; with a BloomFilter they are only
+      counted (approximately) instead of being interned
+    - a node is scheduled once: its state goes FRONTIER -> IN_FLIGHT -> DONE, so two
+      concurrent expansions never request the same DOI
+    - every `checkpoint_interval` seconds the table, the frontier and the filter are
+      saved next to the edge chunks, so a crawl can be stopped and resumed
+
+The crawler is the --depth mode of extraction_open_citations.py. It only needs an
+expand(doi) -> edges function; the edges go to an EdgeStore.
+"""
+
+import concurrent.futures
+import csv
+import hashlib
+import math
+import os
+from array import array
+from heapq import heapify, heappop, heappush
+from time import monotonic
+
+import numpy as np
+
+from edge_store import EdgeStore
+from pipeline_metrics import get_logger
+
+CHECKPOINT_FILE = "crawl_checkpoint.npz"
+NODES_FILE = "snowball_nodes.csv"
+
+# Node states.
+FRONTIER, IN_FLIGHT, DONE, FAR = 0, 1, 2, 3
+STATE_NAMES = {FRONTIER: "frontier", IN_FLIGHT: "frontier", DONE: "expanded", FAR: "far"}
+
+log = get_logger("snowball")
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter of strings (double hashing over one BLAKE2b digest)."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        """
+        Args:
+            capacity (int): Number of items the filter is sized for.
+            error_rate (float): False-positive rate at that capacity.
+        """
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str) -> bool:
+        """Add an item; return True if it was (certainly) not in the filter yet."""
+        new = False
+        for position in self._positions(item):
+            byte, bit = position >> 3, 1 << (position & 7)
+            if not self.bits[byte] & bit:
+                self.bits[byte] |= bit
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+
+class NodeTable:
+    """DOI -> dense int id, with the hop, degree and state of every id in flat arrays."""
+
+    def __init__(self):
+        self.ids = {}
+        self.dois = []
+        self.depth = array("B")
+        self.degree = array("I")
+        self.state = bytearray()
+
+    def __len__(self) -> int:
+        return len(self.dois)
+
+    def add(self, doi: str, depth: int, state: int = FRONTIER) -> tuple:
+        """Return (id, added): the id of the DOI, interning it first if it is new."""
+        node = self.ids.get(doi)
+        if node is not None:
+            return node, False
+        node = len(self.dois)
+        self.ids[doi] = node
+        self.dois.append(doi)
+        self.depth.append(depth)
+        self.degree.append(0)
+        self.state.append(state)
+        return node, True
+
+
+class Frontier:
+    """
+    Heap of nodes to expand, lowest hop first and highest degree first within a hop.
+
+    Updates are lazy: a node whose degree grows is pushed again, and entries that no
+    longer match the table (an old degree, or a node already scheduled) are skipped
+    when popped and dropped by compact().
+    """
+
+    def __init__(self, table: NodeTable):
+        self.table = table
+        self.heap = []
+
+    def push(self, node: int) -> None:
+        heappush(self.heap, (self.table.depth[node], -self.table.degree[node], node))
+
+    def _current(self, entry: tuple) -> bool:
+        depth, negative_degree, node = entry
+        table = self.table
+        return (
+            table.state[node] == FRONTIER
+            and table.depth[node] == depth
+            and table.degree[node] == -negative_degree
+        )
+
+    def pop(self):
+        """Return the next node to expand, or None when the frontier is empty."""
+        while self.heap:
+            entry = heappop(self.heap)
+            if self._current(entry):
+                return entry[2]
+        return None
+
+    def compact(self, live: int) -> None:
+        """Drop stale entries once they outnumber the `live` frontier nodes."""
+        if len(self.heap) > 2 * live + 1024:
+            self.heap = [entry for entry in self.heap if self._current(entry)]
+            heapify(self.heap)
+
+    def rebuild(self) -> None:
+        """Rebuild the heap from the FRONTIER nodes of the table (after loading it)."""
+        table = self.table
+        self.heap = [
+            (table.depth[node], -table.degree[node], node)
+            for node in range(len(table))
+            if table.state[node] == FRONTIER
+        ]
+        heapify(self.heap)
+
+
+class SnowballCrawler:
+    """Budgeted, checkpointed k-hop expansion from a set of seed DOIs."""
+
+    def __init__(
+        self,
+        expand,
+        store: EdgeStore,
+        depth: int = 2,
+        budget: int = None,
+        workers: int = 10,
+        far_bloom_capacity: int = 0,
+        checkpoint_path: str = None,
+        checkpoint_interval: float = 300.0,
+    ):
+        """
+        Args:
+            expand (callable): expand(doi) -> list of edge dicts (origin_doi, target_doi, ...).
+            store (EdgeStore): Receives the edges of every expanded node.
+            depth (int): Hops from the seeds; nodes closer than `depth` hops are expanded.
+            budget (int): Maximum number of expanded nodes (None: no limit).
+            workers (int): Expansions running concurrently.
+            far_bloom_capacity (int): Size a Bloom filter for this many last-hop nodes
+                and count them with it instead of interning them (0: intern them).
+            checkpoint_path (str): File the crawl state is saved to (None: no checkpoints).
+            checkpoint_interval (float): Seconds between checkpoints.
+        """
+        if not 1 <= depth <= 255:
+            raise ValueError("depth must be between 1 and 255")
+        self.expand = expand
+        self.store = store
+        self.depth = depth
+        self.budget = budget
+        self.workers = workers
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.table = NodeTable()
+        self.frontier = Frontier(self.table)
+        self.far_bloom = BloomFilter(far_bloom_capacity) if far_bloom_capacity else None
+        self.pending = 0
+        self.expanded = 0
+        self.failed = 0
+        self.far = 0
+
+    def seed(self, dois) -> None:
+        """Add the hop-0 nodes (the CSIndex publications)."""
+        for doi in dois:
+            node, added = self.table.add(doi, 0)
+            if added:
+                self.pending += 1
+                self.frontier.push(node)
+
+    def discover(self, doi: str, depth: int) -> None:
+        """Record a neighbour found `depth` hops from the seeds."""
+        table = self.table
+        node = table.ids.get(doi)
+        if node is None:
+            if depth >= self.depth:
+                if self.far_bloom is not None:
+                    if self.far_bloom.add(doi):
+                        self.far += 1
+                    return
+                node, _ = table.add(doi, depth, FAR)
+                self.far += 1
+            else:
+                node, _ = table.add(doi, depth)
+                self.pending += 1
+        elif table.state[node] == FAR and depth < self.depth:
+            # Reached again through a shorter path while the previous hop was still running.
+            table.state[node] = FRONTIER
+            table.depth[node] = depth
+            self.pending += 1
+            self.far -= 1
+        table.degree[node] += 1
+        if table.state[node] == FRONTIER:
+            table.depth[node] = min(table.depth[node], depth)
+            self.frontier.push(node)
+
+    def _done(self, node: int, edges: list) -> None:
+        table = self.table
+        doi = table.dois[node]
+        table.state[node] = DONE
+        self.expanded += 1
+        self.store.add(doi, "", edges)
+        depth = table.depth[node] + 1
+        for edge in edges:
+            neighbor = edge["target_doi"] if edge["origin_doi"] == doi else edge["origin_doi"]
+            self.discover(neighbor, depth)
+
+    def run(self) -> None:
+        """
+        Expand nodes until the frontier is empty or the budget is spent.
+
+        The state is checkpointed periodically and when the crawl stops (also on
+        KeyboardInterrupt); expansions still running then are redone on resume.
+        """
+        in_flight = {}
+        last_checkpoint = monotonic()
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+                while True:
+                    while len(in_flight) < self.workers and (
+                        self.budget is None or self.expanded + len(in_flight) < self.budget
+                    ):
+                        node = self.frontier.pop()
+                        if node is None:
+                            break
+                        self.table.state[node] = IN_FLIGHT
+                        self.pending -= 1
+                        in_flight[executor.submit(self.expand, self.table.dois[node])] = node
+                    if not in_flight:
+                        break
+                    finished, _ = concurrent.futures.wait(
+                        in_flight, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for future in finished:
+                        node = in_flight.pop(future)
+                        try:
+                            edges = future.result()
+                        except Exception as e:
+                            self.failed += 1
+                            log.error("Error expanding %s: %s", self.table.dois[node], e)
+                            edges = []
+                        self._done(node, edges)
+                    self.frontier.compact(self.pending)
+                    if self.checkpoint_path and monotonic() - last_checkpoint >= self.checkpoint_interval:
+                        self.save_checkpoint()
+                        last_checkpoint = monotonic()
+        finally:
+            for node in in_flight.values():
+                self.table.state[node] = FRONTIER
+                self.pending += 1
+            if self.checkpoint_path:
+                self.frontier.rebuild()
+                self.save_checkpoint()
+
+    def save_checkpoint(self) -> None:
+        """Flush the edge store, then atomically save the crawl state."""
+        self.store.flush()
+        table = self.table
+        bloom = self.far_bloom
+        tmp_path = self.checkpoint_path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            dois=np.frombuffer("\n".join(table.dois).encode("utf-8"), dtype=np.uint8),
+            depth=np.frombuffer(table.depth, dtype=np.uint8),
+            degree=np.array(table.degree, dtype=np.uint32),
+            state=np.frombuffer(bytes(table.state), dtype=np.uint8),
+            bloom=np.frombuffer(bloom.bits, dtype=np.uint8) if bloom else np.zeros(0, np.uint8),
+            bloom_shape=np.array([bloom.size, bloom.hashes, bloom.count] if bloom else [], np.int64),
+            counters=np.array([self.depth, self.expanded, self.failed, self.far], np.int64),
+        )
+        os.replace(tmp_path, self.checkpoint_path)
+        log.debug("Checkpoint saved: %d node(s), %d expanded", len(table), self.expanded)
+
+    def load_checkpoint(self) -> bool:
+        """Restore the state saved by save_checkpoint(); return False if there is none."""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return False
+        with np.load(self.checkpoint_path) as saved:
+            depth_limit, self.expanded, self.failed, self.far = (int(v) for v in saved["counters"])
+            if depth_limit != self.depth:
+                raise ValueError(
+                    f"Checkpoint '{self.checkpoint_path}' was saved with depth {depth_limit}, not {self.depth}"
+                )
+            table = NodeTable()
+            text = saved["dois"].tobytes().decode("utf-8")
+            table.dois = text.split("\n") if text else []
+            table.ids = {doi: node for node, doi in enumerate(table.dois)}
+            table.depth = array("B", saved["depth"].tobytes())
+            table.degree = array("I", saved["degree"].astype(np.uint32).tolist())
+            table.state = bytearray(saved["state"].tobytes())
+            if len(saved["bloom_shape"]):
+                self.far_bloom = BloomFilter(1)
+                self.far_bloom.size, self.far_bloom.hashes, self.far_bloom.count = (
+                    int(v) for v in saved["bloom_shape"]
+                )
+                self.far_bloom.bits = bytearray(saved["bloom"].tobytes())
+        table.state = table.state.replace(bytes([IN_FLIGHT]), bytes([FRONTIER]))
+        self.table = table
+        self.frontier = Frontier(table)
+        self.frontier.rebuild()
+        self.pending = len(self.frontier.heap)
+        return True
+
+    def remove_checkpoint(self) -> None:
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def summary(self) -> dict:
+        """Node counts per hop and crawl totals."""
+        depths = np.frombuffer(self.table.depth, dtype=np.uint8)
+        states = np.frombuffer(bytes(self.table.state), dtype=np.uint8)
+        near = states != FAR
+        return {
+            "expanded": self.expanded,
+            "failed": self.failed,
+            "frontier": self.pending,
+            "far": self.far,
+            "far_counted_by": "bloom filter" if self.far_bloom is not None else "node table",
+            "nodes_per_hop": {
+                int(hop): int(count)
+                for hop, count in zip(*np.unique(depths[near], return_counts=True))
+            },
+        }
+
+    def write_nodes(self, path: str = NODES_FILE) -> None:
+        """Write the interned nodes (doi, hop, degree, state) to a CSV."""
+        table = self.table
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["doi", "hop", "degree", "state"])
+            for node, doi in enumerate(table.dois):
+                writer.writerow(
+                    [doi, table.depth[node], table.degree[node], STATE_NAMES[table.state[node]]]
+                )
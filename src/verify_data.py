@@ -1,35 +1,204 @@
-import csv
+#!/usr/bin/env python3
+"""
+Integrity checker for citation edge lists.
+
+The edge list is streamed in blocks. Every DOI is interned to an integer id, and each
+edge is stored as a single int64 key (origin_id << 32 | target_id). After one pass over
+the file the keys are sorted once, and all checks run as vectorized operations over
+the sorted array:
+
+    - reciprocal citations (A cites B and B cites A)
+    - self-loops (A cites A)
+    - duplicate edges
+    - dangling nodes (nodes that never cite anything, i.e. out-degree 0)
+    - DOI variants (distinct strings that only differ by case, URL encoding or a
+      doi:/https://doi.org/ prefix)
+
+The results are written to a JSON report. If any count exceeds its --max-* threshold,
+the script exits with status 1, so pipeline runs can be gated on it.
+
+Usage:
+    python verify_data.py [edges.csv|edges.parquet] [--report report.json]
+        [--max-reciprocal N] [--max-self-loops N] [--max-duplicates N]
+        [--max-dangling N] [--max-variants N]
+"""
+
+import argparse
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from columnar_io import is_parquet
+from doi_utils import canonical_keys
 
 # File name of your CSV data
-csv_file = "./citations_edgelist.csv"
-
-# A set to hold all citation edges as (origin_doi, target_doi)
-edges = set()
-
-# Open the CSV file and read each row
-with open(csv_file, mode="r", newline="", encoding="utf-8") as file:
-    reader = csv.DictReader(file)
-    for row in reader:
-        origin = row["origin_doi"].strip()  # Remove any surrounding whitespace
-        target = row["target_doi"].strip()
-        # Add the edge to the set
-        edges.add((origin, target))
-
-# A set to store two-way citation pairs.
-# We'll use a sorted tuple (min_doi, max_doi) to avoid duplicate printing.
-two_way_edges = set()
-
-# Iterate over each edge to check if its reverse exists
-for origin, target in edges:
-    if (target, origin) in edges:
-        # Use sorted tuple so that each bidirectional pair is only added once
-        pair = tuple(sorted([origin, target]))
-        two_way_edges.add(pair)
-
-# Print the results
-if two_way_edges:
-    print("Two-way (bidirectional) citations found:")
-    for pair in two_way_edges:
-        print(pair)
-else:
-    print("No two-way citations were detected.")
+INPUT_FILE = "../data/repository_edge_list.csv"
+
+CHECKS = ["reciprocal", "self_loops", "duplicates", "dangling", "variants"]
+SAMPLE_SIZE = 20
+
+
+def iter_edge_blocks(path: str, chunksize: int):
+    """Yield (origin, target) string arrays from a CSV or Parquet edge list."""
+    if is_parquet(path):
+        for batch in pq.ParquetFile(path).iter_batches(
+            batch_size=chunksize, columns=["origin_doi", "target_doi"]
+        ):
+            block = batch.to_pandas()
+            yield block["origin_doi"].astype(str), block["target_doi"].astype(str)
+        return
+    for block in pd.read_csv(
+        path,
+        usecols=["origin_doi", "target_doi"],
+        dtype=str,
+        keep_default_na=False,
+        chunksize=chunksize,
+    ):
+        yield block["origin_doi"].str.strip(), block["target_doi"].str.strip()
+
+
+class DOITable:
+    """Interns DOI strings to consecutive integer ids."""
+
+    def __init__(self):
+        self.ids = {}
+        self.dois = []
+
+    def intern(self, values: pd.Series) -> np.ndarray:
+        """Return the ids of a block of DOIs, adding unseen DOIs to the table."""
+        codes, uniques = pd.factorize(values)
+        block_ids = np.empty(len(uniques), dtype=np.int64)
+        for i, doi in enumerate(uniques):
+            doi_id = self.ids.get(doi)
+            if doi_id is None:
+                doi_id = self.ids[doi] = len(self.dois)
+                self.dois.append(doi)
+            block_ids[i] = doi_id
+        return block_ids[codes]
+
+
+def load_edge_keys(path: str, chunksize: int = 500_000) -> tuple:
+    """Stream the edge list into a sorted array of int64 edge keys and a DOI table."""
+    table = DOITable()
+    blocks = []
+    for origin, target in iter_edge_blocks(path, chunksize):
+        blocks.append((table.intern(origin) << 32) | table.intern(target))
+    keys = np.concatenate(blocks) if blocks else np.empty(0, dtype=np.int64)
+    keys.sort()
+    return keys, table
+
+
+def doi_variants(dois: list) -> list:
+    """Group DOIs that share a normalized form (doi_utils.canonical_keys); returns groups of 2+ strings."""
+    raw = pd.Series(dois, dtype=object)
+    groups = raw.groupby(canonical_keys(raw)).agg(list)
+    return [group for group in groups if len(group) > 1]
+
+
+def check_edges(keys: np.ndarray, table: DOITable) -> dict:
+    """Run every check over the sorted edge keys and return the report."""
+    mask32 = (1 << 32) - 1
+    duplicate_mask = np.zeros(len(keys), dtype=bool)
+    duplicate_mask[1:] = keys[1:] == keys[:-1]
+    unique_keys = keys[~duplicate_mask]
+    origins = unique_keys >> 32
+    targets = unique_keys & mask32
+
+    self_loop_mask = origins == targets
+
+    # An edge is reciprocal if its reversed key is also present; report each pair once.
+    reversed_keys = (targets << 32) | origins
+    positions = np.searchsorted(unique_keys, reversed_keys)
+    positions[positions == len(unique_keys)] = 0
+    reciprocal_mask = (
+        (unique_keys[positions] == reversed_keys) & (origins < targets)
+        if len(unique_keys)
+        else np.zeros(0, dtype=bool)
+    )
+
+    num_nodes = len(table.dois)
+    out_degree = np.bincount(origins, minlength=num_nodes)
+    dangling = np.flatnonzero(out_degree == 0)
+
+    variants = doi_variants(table.dois)
+
+    def pairs(mask):
+        return [
+            [table.dois[o], table.dois[t]]
+            for o, t in zip(origins[mask][:SAMPLE_SIZE].tolist(), targets[mask][:SAMPLE_SIZE].tolist())
+        ]
+
+    duplicate_keys = np.unique(keys[duplicate_mask])
+    return {
+        "edges": int(len(keys)),
+        "unique_edges": int(len(unique_keys)),
+        "nodes": int(num_nodes),
+        "counts": {
+            "reciprocal": int(reciprocal_mask.sum()),
+            "self_loops": int(self_loop_mask.sum()),
+            "duplicates": int(duplicate_mask.sum()),
+            "dangling": int(len(dangling)),
+            "variants": len(variants),
+        },
+        "samples": {
+            "reciprocal": pairs(reciprocal_mask),
+            "self_loops": [pair[0] for pair in pairs(self_loop_mask)],
+            "duplicates": [
+                [table.dois[key >> 32], table.dois[key & mask32]]
+                for key in duplicate_keys[:SAMPLE_SIZE].tolist()
+            ],
+            "dangling": [table.dois[i] for i in dangling[:SAMPLE_SIZE].tolist()],
+            "variants": variants[:SAMPLE_SIZE],
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check a citation edge list for integrity problems.")
+    parser.add_argument("input", nargs="?", default=INPUT_FILE, help="Edge list (.csv or .parquet).")
+    parser.add_argument("--report", default="integrity_report.json", help="JSON report path.")
+    parser.add_argument("--chunksize", type=int, default=500_000, help="Rows read per block.")
+    for check in CHECKS:
+        parser.add_argument(
+            f"--max-{check.replace('_', '-')}",
+            type=int,
+            default=None,
+            help=f"Fail if the number of {check.replace('_', ' ')} exceeds this value.",
+        )
+    args = parser.parse_args()
+
+    keys, table = load_edge_keys(args.input, args.chunksize)
+    report = check_edges(keys, table)
+    report["input"] = args.input
+
+    thresholds = {check: getattr(args, f"max_{check}") for check in CHECKS}
+    report["thresholds"] = thresholds
+    report["failed"] = [
+        check
+        for check, limit in thresholds.items()
+        if limit is not None and report["counts"][check] > limit
+    ]
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(
+        f"Checked {report['edges']} edge(s) ({report['unique_edges']} unique) between {report['nodes']} node(s)."
+    )
+    for check in CHECKS:
+        status = "FAIL" if check in report["failed"] else "ok"
+        print(f"  {check:<12}{report['counts'][check]:>10}  {status}")
+    if report["samples"]["reciprocal"]:
+        print("Two-way (bidirectional) citations found (sample):")
+        for pair in report["samples"]["reciprocal"]:
+            print(tuple(pair))
+    else:
+        print("No two-way citations were detected.")
+    print(f"Report saved to {args.report}")
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())